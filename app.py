@@ -1,111 +1,617 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g, abort, make_response
+from flask import send_from_directory
+from flask import before_render_template, template_rendered
+from werkzeug.datastructures import FileStorage
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from datetime import date, datetime, timedelta, timezone
 import sqlite3
 import requests
+import base64
+import cProfile
+import csv
+import gzip
 import hashlib
+import hmac
+import io
+import itertools
 import json
+import math
+import mimetypes
+import multiprocessing
 import os
+import queue
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
 from functools import wraps
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+import click
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # thumbnails are skipped without Pillow
+    Image = ImageOps = None
+
+try:
+    import brotli
+except ImportError:  # assets are precompressed with gzip only
+    brotli = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas as pdf_canvas
+except ImportError:  # receipts are rendered as HTML only
+    A4 = pdf_canvas = None
+
+from migrations import (SEARCH_KINDS, migrate, rebuild_fund_utilization, rebuild_ngo_stats, rebuild_search_index,
+                        verify_ngo_stats)
+from storage import DATABASE_ERRORS, INTEGRITY_ERRORS, SQLITE, backend_for, request_timer
 
 app = Flask(__name__)
 app.secret_key = 'your-super-secret-key-change-in-production'
-@app.route('/')
-def home():
-    return render_template('index.html')
+# A SQLite file, or a postgresql:// URL (see storage.py)
+app.config['DATABASE'] = os.environ.get('DATABASE', 'donation_platform.db')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')
+app.config['CACHE_PATH'] = os.environ.get('CACHE_PATH', 'cache.db')
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+app.config['LISTING_MAX_AGE'] = int(os.environ.get('LISTING_MAX_AGE', 30))
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+app.config['JOB_RETRY_BASE'] = float(os.environ.get('JOB_RETRY_BASE', 30))
+app.config['JOB_LEASE'] = float(os.environ.get('JOB_LEASE', 600))
+app.config['NITI_AAYOG_API_URL'] = os.environ.get('NITI_AAYOG_API_URL')
+app.config['NITI_AAYOG_TIMEOUT'] = float(os.environ.get('NITI_AAYOG_TIMEOUT', 10))
+app.config['NITI_CACHE_TTL'] = int(os.environ.get('NITI_CACHE_TTL', 7 * 24 * 3600))
+app.config['INGEST_TOKEN'] = os.environ.get('INGEST_TOKEN')
+app.config['EXPORT_TOKEN'] = os.environ.get('EXPORT_TOKEN')
+app.config['OPS_TOKEN'] = os.environ.get('OPS_TOKEN')
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+app.config['LOGIN_MAX_FAILURES'] = int(os.environ.get('LOGIN_MAX_FAILURES', 5))
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 50))
+app.config['LOGIN_FAILURE_WINDOW'] = int(os.environ.get('LOGIN_FAILURE_WINDOW', 900))
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+app.config['UPLOAD_DIR'] = os.environ.get('UPLOAD_DIR', os.path.join(app.root_path, 'static', 'uploads'))
+app.config['UPLOAD_MAX_BYTES'] = int(os.environ.get('UPLOAD_MAX_BYTES', 5 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+app.config['THUMBNAIL_SIZES'] = tuple(int(size) for size in os.environ.get('THUMBNAIL_SIZES', '320,960').split(','))
+app.config['ASSET_DIR'] = os.environ.get('ASSET_DIR', os.path.join(app.root_path, 'static', 'dist'))
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR',
+                                                  os.path.join(tempfile.gettempdir(), 'donatesecure-templates'))
+app.config['EVENT_POLL_INTERVAL'] = float(os.environ.get('EVENT_POLL_INTERVAL', 0.5))
+app.config['EVENT_HEARTBEAT'] = float(os.environ.get('EVENT_HEARTBEAT', 15))
+app.config['EVENT_STREAM_LIFETIME'] = float(os.environ.get('EVENT_STREAM_LIFETIME', 300))
+app.config['EVENT_MAX_STREAMS'] = int(os.environ.get('EVENT_MAX_STREAMS', 100))
+app.config['EVENT_RETENTION'] = float(os.environ.get('EVENT_RETENTION', 300))
+app.config['RECEIPT_DIR'] = os.environ.get('RECEIPT_DIR', 'receipts')
+app.config['RECEIPT_FORMATS'] = tuple(os.environ.get('RECEIPT_FORMATS', 'html,pdf').split(','))
+app.config['RECEIPT_WORKERS'] = int(os.environ.get('RECEIPT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+app.config['RECEIPT_TIMEOUT'] = float(os.environ.get('RECEIPT_TIMEOUT', 30))
+app.config['GROUP_COMMIT'] = bool(int(os.environ.get('GROUP_COMMIT', 0)))
+app.config['GROUP_COMMIT_WINDOW'] = float(os.environ.get('GROUP_COMMIT_WINDOW', 0.002))
+app.config['GROUP_COMMIT_MAX_BATCH'] = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 200))
+app.config['GROUP_COMMIT_TIMEOUT'] = float(os.environ.get('GROUP_COMMIT_TIMEOUT', 30))
+app.config['TRANSACTION_NODE_ID'] = os.environ.get('TRANSACTION_NODE_ID')
+
+# Instrumentation
+# Every connection from connect_db(), whatever its backend, times its
+# statements. While a request is being handled the time and count are charged
+# to it, together with template
+# rendering, and reported in a Server-Timing header and on /metrics. Request
+# statements slower than SLOW_QUERY_MS are logged with their query plan.
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.template_starts = []
+        self.slow_query_ms = app.config['SLOW_QUERY_MS']
+
+    def slow_query(self, conn, sql, params, elapsed):
+        log_slow_query(conn, sql, params, elapsed)
+
+def log_slow_query(conn, sql, params, elapsed):
+    plan = []
+    if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        try:
+            plan = conn.backend.explain(conn, sql, params)
+        except DATABASE_ERRORS:
+            pass
+    app.logger.warning('Slow query (%.1f ms) in %s: %s %s%s', elapsed * 1000, request.endpoint,
+                       ' '.join(sql.split()), params if params is not None else '',
+                       ''.join('\n    ' + step for step in plan))
+    with _metrics_lock:
+        _metrics['slow_queries'] += 1
+
+@before_render_template.connect_via(app)
+def _template_started(sender, template, context, **extra):
+    timer = getattr(request_timer, 'current', None)
+    if timer is not None:
+        timer.template_starts.append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _template_finished(sender, template, context, **extra):
+    timer = getattr(request_timer, 'current', None)
+    if timer is not None and timer.template_starts:
+        started = timer.template_starts.pop()
+        # Only the outermost render counts; nested ones are inside it
+        if not timer.template_starts:
+            timer.template += time.perf_counter() - started
+
+@app.before_request
+def start_request_timer():
+    request_timer.current = RequestTimer()
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def finish_request_timer(response):
+    timer = getattr(request_timer, 'current', None)
+    if timer is None:
+        return response
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        save_profile(profiler)
+    total = time.perf_counter() - timer.started
+    python = max(total - timer.db - timer.template, 0.0)
+    response.headers['Server-Timing'] = (
+        f'db;dur={timer.db * 1000:.2f};desc="{timer.queries} queries", '
+        f'tpl;dur={timer.template * 1000:.2f}, app;dur={python * 1000:.2f}, total;dur={total * 1000:.2f}')
+    record_request_metrics(request.endpoint or 'unmatched', request.method, response.status_code,
+                           total, timer)
+    return response
+
+@app.teardown_request
+def clear_request_timer(exception):
+    request_timer.current = None
+
+def save_profile(profiler):
+    """Write a sampled request's profile as <endpoint>-<time>.prof, for pstats or snakeviz."""
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    name = f"{request.endpoint or 'unmatched'}-{time.time_ns()}.prof"
+    profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+
+# Metrics
+# Kept in memory per process. With METRICS_DIR set, each process also writes its
+# totals there (at most once a second) and /metrics adds up every process's file,
+# so any gunicorn worker can answer a scrape for the whole server.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+COMMIT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _empty_metrics():
+    return {'routes': {}, 'responses': {}, 'slow_queries': 0, 'group_commits': _empty_commit_metrics()}
+
+def _empty_commit_metrics():
+    return {'count': 0, 'donations': 0, 'seconds': 0.0,
+            'size_buckets': [0] * len(BATCH_SIZE_BUCKETS), 'latency_buckets': [0] * len(COMMIT_LATENCY_BUCKETS)}
+
+def _bucket(buckets, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[i] += 1
+            break
+
+_metrics = _empty_metrics()
+_metrics_lock = threading.Lock()
+_metrics_flushed = [0.0]
+
+def record_request_metrics(endpoint, method, status, total, timer):
+    key = f'{endpoint} {method}'
+    with _metrics_lock:
+        route = _metrics['routes'].get(key)
+        if route is None:
+            route = _metrics['routes'][key] = {
+                'count': 0, 'seconds': 0.0, 'db_seconds': 0.0, 'template_seconds': 0.0, 'queries': 0,
+                'buckets': [0] * len(LATENCY_BUCKETS)}
+        route['count'] += 1
+        route['seconds'] += total
+        route['db_seconds'] += timer.db
+        route['template_seconds'] += timer.template
+        route['queries'] += timer.queries
+        _bucket(route['buckets'], LATENCY_BUCKETS, total)
+        status_key = f'{key} {status}'
+        _metrics['responses'][status_key] = _metrics['responses'].get(status_key, 0) + 1
+        if app.config['METRICS_DIR'] and time.monotonic() - _metrics_flushed[0] >= 1:
+            _metrics_flushed[0] = time.monotonic()
+            snapshot = json.dumps(_metrics)
+        else:
+            snapshot = None
+    if snapshot:
+        write_metrics_snapshot(snapshot)
+
+def record_commit_metrics(size, seconds):
+    """Count one group commit of size donations that took seconds."""
+    with _metrics_lock:
+        commits = _metrics['group_commits']
+        commits['count'] += 1
+        commits['donations'] += size
+        commits['seconds'] += seconds
+        _bucket(commits['size_buckets'], BATCH_SIZE_BUCKETS, size)
+        _bucket(commits['latency_buckets'], COMMIT_LATENCY_BUCKETS, seconds)
+
+def group_commit_metrics():
+    """A copy of this process's group commit totals: count, donations, seconds and the histograms."""
+    with _metrics_lock:
+        return json.loads(json.dumps(_metrics['group_commits']))
+
+def write_metrics_snapshot(snapshot):
+    os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+    path = os.path.join(app.config['METRICS_DIR'], f'metrics-{os.getpid()}.json')
+    fd, tmp = tempfile.mkstemp(dir=app.config['METRICS_DIR'], suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(snapshot)
+    os.replace(tmp, path)
+
+def collect_metrics():
+    """This process's metrics, plus every other process's latest snapshot."""
+    with _metrics_lock:
+        snapshots = [json.loads(json.dumps(_metrics))]
+    directory = app.config['METRICS_DIR']
+    if directory and os.path.isdir(directory):
+        own = f'metrics-{os.getpid()}.json'
+        for name in os.listdir(directory):
+            if name.startswith('metrics-') and name.endswith('.json') and name != own:
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    merged = _empty_metrics()
+    for snapshot in snapshots:
+        merged['slow_queries'] += snapshot['slow_queries']
+        for key, count in snapshot['responses'].items():
+            merged['responses'][key] = merged['responses'].get(key, 0) + count
+        for key, route in snapshot['routes'].items():
+            total = merged['routes'].setdefault(key, {
+                'count': 0, 'seconds': 0.0, 'db_seconds': 0.0, 'template_seconds': 0.0, 'queries': 0,
+                'buckets': [0] * len(LATENCY_BUCKETS)})
+            for field in ('count', 'seconds', 'db_seconds', 'template_seconds', 'queries'):
+                total[field] += route[field]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], route['buckets'])]
+        commits = snapshot.get('group_commits')
+        if commits:
+            total = merged['group_commits']
+            for field in ('count', 'donations', 'seconds'):
+                total[field] += commits[field]
+            for field in ('size_buckets', 'latency_buckets'):
+                total[field] = [a + b for a, b in zip(total[field], commits[field])]
+    return merged
+
+def render_metrics(metrics):
+    """Prometheus text exposition format."""
+    lines = ['# HELP http_request_duration_seconds Time spent handling requests.',
+             '# TYPE http_request_duration_seconds histogram']
+    for key, route in sorted(metrics['routes'].items()):
+        endpoint, method = key.rsplit(' ', 1)
+        labels = f'route="{endpoint}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, route['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {route["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {route["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {route["count"]}')
+    for name, field, help_text in (
+        ('http_request_db_seconds_total', 'db_seconds', 'Time spent in SQL statements.'),
+        ('http_request_template_seconds_total', 'template_seconds', 'Time spent rendering templates.'),
+        ('http_request_sql_statements_total', 'queries', 'SQL statements executed.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for key, route in sorted(metrics['routes'].items()):
+            endpoint, method = key.rsplit(' ', 1)
+            value = route[field]
+            lines.append(f'{name}{{route="{endpoint}",method="{method}"}} '
+                         f'{value if isinstance(value, int) else round(value, 6)}')
+    lines += ['# HELP http_responses_total Responses by status code.', '# TYPE http_responses_total counter']
+    for key, count in sorted(metrics['responses'].items()):
+        endpoint, method, status = key.rsplit(' ', 2)
+        lines.append(f'http_responses_total{{route="{endpoint}",method="{method}",status="{status}"}} {count}')
+    lines += ['# HELP sql_slow_queries_total Statements slower than SLOW_QUERY_MS.',
+              '# TYPE sql_slow_queries_total counter', f'sql_slow_queries_total {metrics["slow_queries"]}']
+    commits = metrics['group_commits']
+    for name, help_text, bounds, field, total in (
+        ('donation_group_commit_size', 'Donations committed per group commit.',
+         BATCH_SIZE_BUCKETS, 'size_buckets', commits['donations']),
+        ('donation_group_commit_duration_seconds', 'Time spent writing and committing a group.',
+         COMMIT_LATENCY_BUCKETS, 'latency_buckets', round(commits['seconds'], 6)),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        cumulative = 0
+        for bound, count in zip(bounds, commits[field]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f'{name}_bucket{{le="+Inf"}} {commits["count"]}', f'{name}_sum {total}',
+                  f'{name}_count {commits["count"]}']
+    return '\n'.join(lines) + '\n'
+
+def bearer_token_matches(token):
+    """Whether the request carries `Authorization: Bearer <token>`; never true while token is unset."""
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+def ops_only(view):
+    """
+    Operational endpoints (metrics, pool, cache and event stats) describe the
+    server's internals, so they answer 404 unless the request carries OPS_TOKEN.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if not bearer_token_matches(app.config['OPS_TOKEN']):
+            abort(404)
+        return view(*args, **kwargs)
+    return decorated
+
+@app.route('/metrics')
+@ops_only
+def metrics():
+    return app.response_class(render_metrics(collect_metrics()), mimetype='text/plain; version=0.0.4')
+
+# Database connections
+def connect_db(database=None):
+    """Open a connection to database (default: DATABASE) through its backend."""
+    database = database or app.config['DATABASE']
+    return backend_for(database).connect(database)
+
+class ConnectionPool:
+    """
+    Thread-safe pool of open connections for one worker process.
+    Connections are created lazily up to `size` and reused across requests.
+    """
+    def __init__(self, database, size=8, timeout=30.0):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self):
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        conn = None
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise sqlite3.OperationalError('timed out waiting for a database connection')
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1
+        if conn is None:
+            try:
+                conn = connect_db(self.database)
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+        waited = time.perf_counter() - start
+        with self._cond:
+            self._acquired += 1
+            if waited > 0.001:
+                self._waits += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn):
+        try:
+            # Never hand an open transaction to the next request
+            conn.rollback()
+        except DATABASE_ERRORS:
+            conn.close()
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            for conn in self._idle:
+                conn.close()
+            self._created -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'size': self.size,
+                'open': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'wait_time_total': round(self._wait_time, 6),
+                'wait_time_max': round(self._max_wait, 6),
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return this process's pool, recreating it after a gunicorn fork."""
+    global _pool
+    with _pool_lock:
+        if (_pool is None or _pool.pid != os.getpid()
+                or _pool.database != app.config['DATABASE']):
+            _pool = ConnectionPool(app.config['DATABASE'],
+                                   app.config['DB_POOL_SIZE'],
+                                   app.config['DB_POOL_TIMEOUT'])
+        return _pool
+
+def get_db():
+    """Connection bound to the current request, returned to the pool on teardown."""
+    if 'db' not in g:
+        g.db_pool = get_pool()
+        g.db = g.db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        g.pop('db_pool').release(conn)
+
+@app.route('/db_stats')
+@ops_only
+def db_stats():
+    return jsonify(get_pool().stats())
 
 # Database initialization
 def init_db():
-    conn = sqlite3.connect('donation_platform.db')
-    c = conn.cursor()
-    
-    # Users table (for both donors and receivers)
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        user_type TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # NGOs table
-    c.execute('''CREATE TABLE IF NOT EXISTS ngos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        org_name TEXT NOT NULL,
-        location TEXT NOT NULL,
-        contact_number TEXT NOT NULL,
-        email TEXT NOT NULL,
-        website TEXT,
-        bank_name TEXT NOT NULL,
-        account_number TEXT NOT NULL,
-        upi_id TEXT,
-        qr_code_path TEXT,
-        niti_aayog_id TEXT NOT NULL,
-        tax_certificate_path TEXT,
-        is_verified BOOLEAN DEFAULT FALSE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )''')
-    
-    # Donations table
-    c.execute('''CREATE TABLE IF NOT EXISTS donations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        donor_email TEXT NOT NULL,
-        ngo_id INTEGER,
-        amount REAL NOT NULL,
-        payment_method TEXT NOT NULL,
-        transaction_id TEXT UNIQUE NOT NULL,
-        status TEXT DEFAULT 'pending',
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (ngo_id) REFERENCES ngos (id)
-    )''')
-    
-    # Stories table
-    c.execute('''CREATE TABLE IF NOT EXISTS stories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ngo_id INTEGER,
-        title TEXT NOT NULL,
-        content TEXT NOT NULL,
-        image_path TEXT,
-        is_approved BOOLEAN DEFAULT FALSE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (ngo_id) REFERENCES ngos (id)
-    )''')
-    
-    # Urgent requirements table
-    c.execute('''CREATE TABLE IF NOT EXISTS urgent_requirements (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ngo_id INTEGER,
-        title TEXT NOT NULL,
-        description TEXT NOT NULL,
-        amount_needed REAL NOT NULL,
-        amount_raised REAL DEFAULT 0,
-        deadline DATE,
-        is_active BOOLEAN DEFAULT TRUE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (ngo_id) REFERENCES ngos (id)
-    )''')
-    
-    # Money usage tracking
-    c.execute('''CREATE TABLE IF NOT EXISTS money_usage (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        donation_id INTEGER,
-        ngo_id INTEGER,
-        description TEXT NOT NULL,
-        amount_used REAL NOT NULL,
-        receipt_path TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (donation_id) REFERENCES donations (id),
-        FOREIGN KEY (ngo_id) REFERENCES ngos (id)
-    )''')
-    
+    conn = connect_db()
+    migrate(conn)
+    conn.close()
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations to DATABASE."""
+    conn = connect_db()
+    old, new = migrate(conn)
+    conn.close()
+    if old == new:
+        print(f"Schema already at version {new}")
+    else:
+        print(f"Migrated schema from version {old} to {new}")
+
+@app.cli.command('rebuild-ngo-stats')
+def rebuild_ngo_stats_command():
+    """Recompute the per-NGO donation and expenditure aggregates from scratch."""
+    conn = connect_db()
+    conn.execute('BEGIN IMMEDIATE')
+    rebuild_ngo_stats(conn)
+    rebuild_fund_utilization(conn)
     conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM ngo_stats').fetchone()[0]
+    conn.close()
+    print(f"Rebuilt aggregates for {count} NGOs")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Repopulate the full-text search index from the source tables."""
+    conn = connect_db()
+    conn.execute('BEGIN IMMEDIATE')
+    rebuild_search_index(conn)
+    conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]
+    conn.close()
+    print(f"Indexed {count} documents")
+
+@app.cli.command('verify-ngo-stats')
+def verify_ngo_stats_command():
+    """Check the per-NGO aggregates against the donations and money_usage tables."""
+    conn = connect_db()
+    drifted = verify_ngo_stats(conn)
     conn.close()
+    if drifted:
+        raise SystemExit(f"Aggregates out of date for NGO ids: {', '.join(map(str, drifted))}")
+    print("NGO aggregates match the donations and money_usage tables")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """
+    Drive the read routes against a scratch database and fail if any statement
+    they run has to fall back to a full table scan.
+    """
+
+    statements = []
+    failures = []
+    saved = app.config['DATABASE']
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'plans.db')
+        try:
+            init_db()
+            create_sample_data()
+            # Test requests reuse an already pushed app context, so every route
+            # below runs on this one traced connection
+            with app.app_context():
+                conn = get_db()
+                conn.set_trace_callback(statements.append)
+                client = app.test_client()
+                deep = {'cursor': encode_cursor('9999-12-31', 1)}
+                for path in ['/', '/stories', '/urgent_requirements', '/api/stories', '/api/urgent_requirements']:
+                    client.get(path)
+                    client.get(path, query_string=deep)
+                for path in ['/api/ngos/1/money_usage', '/api/ngos/1/utilization']:
+                    client.get(path)
+                client.get('/api/ngos/1/money_usage', query_string=deep)
+                client.get('/api/ngos/1/utilization', query_string={'period': 'year', 'start': '2024-01-01',
+                                                                    'end': '2030-12-31'})
+                for path in ['/search', '/api/search']:
+                    client.get(path, query_string={'q': 'water', 'location': 'mumbai'})
+                    client.get(path, query_string={'q': 'food', 'type': 'urgent', 'cursor': encode_cursor(-99.0, 1)})
+                client.get('/urgent_requirements', query_string={'cursor': encode_cursor(None, 1)})
+                with client.session_transaction() as sess:
+                    sess.update(user_id=1, email='donor@example.com', user_type='donor')
+                for path in ['/donor_dashboard', '/ngo_details/1', '/donate/1']:
+                    client.get(path)
+                client.get('/donor_dashboard', query_string={'location': 'Mumbai, Maharashtra',
+                                                             'cursor': encode_cursor('A', 1)})
+                client.get('/donor_dashboard', query_string={'q': 'hope'})
+                client.get('/receipts')
+                client.get('/receipts', query_string={'year': 2024, 'cursor': encode_cursor('9999-12-31', 1)})
+                client.get('/receipts/annual/2024')
+                with client.session_transaction() as sess:
+                    sess.update(user_id=2, email='ngo@example.com', user_type='receiver')
+                for path in ['/ngo_dashboard', '/api/donations']:
+                    client.get(path)
+                    client.get(path, query_string=deep)
+                client.get('/ngo_dashboard', query_string={'usage_cursor': deep['cursor']})
+                conn.set_trace_callback(None)
+
+                for sql in dict.fromkeys(statements):
+                    # FTS5 reads its own shadow tables through the same connection
+                    if not sql.lstrip().upper().startswith('SELECT') or "'search_index_" in sql:
+                        continue
+                    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+                    # A full-text MATCH shows as a virtual table scan with an M index, and
+                    # a SELECT without FROM as a scan of its one constant row
+                    scans = [step for step in plan if step.startswith('SCAN ') and 'USING' not in step
+                             and 'VIRTUAL TABLE INDEX 0:M' not in step and step != 'SCAN CONSTANT ROW']
+                    print(f"[{'FULL SCAN' if scans else 'ok'}] {' '.join(sql.split())}")
+                    for step in plan:
+                        print(f"    {step}")
+                    if scans:
+                        failures.append(sql)
+            get_pool().close()
+        finally:
+            app.config['DATABASE'] = saved
+    if failures:
+        raise SystemExit(f"{len(failures)} route queries need a full table scan")
+    print("All route queries use an index")
 
 # Create some sample data
 def create_sample_data():
-    conn = sqlite3.connect('donation_platform.db')
+    conn = connect_db()
     c = conn.cursor()
     
     # Check if data already exists
@@ -115,8 +621,8 @@ def create_sample_data():
         return
     
     # Create sample users
-    donor_password = generate_password_hash('password123')
-    ngo_password = generate_password_hash('password123')
+    donor_password = generate_password_hash('password123', app.config['PASSWORD_HASH_METHOD'])
+    ngo_password = generate_password_hash('password123', app.config['PASSWORD_HASH_METHOD'])
     
     c.execute('INSERT INTO users (email, password, user_type) VALUES (?, ?, ?)', 
              ('donor@example.com', donor_password, 'donor'))
@@ -157,31 +663,2129 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Process pools
+# CPU-bound work (password hashing, receipt rendering) runs in per-process pools
+# of worker processes, each with an admission semaphore of four queued tasks per
+# worker, so a burst queues briefly and is then shed instead of piling up.
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+def bounded_process_pool(name, workers):
+    """
+    Return this process's pool called name, with its admission semaphore, or
+    None when workers is 0 and the work runs inline.
+    """
+    if not workers:
+        return None
+    key = (name, os.getpid())
+    if key not in _process_pools:
+        with _process_pools_lock:
+            if key not in _process_pools:
+                # spawn, not fork: the parent has database and worker threads running
+                _process_pools[key] = (
+                    ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')),
+                    threading.BoundedSemaphore(workers * 4),
+                )
+    return _process_pools[key]
+
+def submit_bounded(pool, fn, *args, timeout=None, block=True):
+    """
+    Queue fn on a bounded_process_pool(). When the pool stays full for timeout
+    (or at once, unless block is set) the call returns None.
+    """
+    executor, slots = pool
+    admitted = slots.acquire(timeout=timeout) if block else slots.acquire(blocking=False)
+    if not admitted:
+        return None
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+    return future
+
+# Password hashing
+# The password KDF runs in a small process pool so a burst of logins cannot pin
+# the request workers: at most PASSWORD_HASH_WORKERS hashes run at once and the
+# rest of the site keeps its CPU. A stored hash made with other parameters than
+# PASSWORD_HASH_METHOD is replaced after the next successful login.
+def get_hash_pool():
+    return bounded_process_pool('hash', app.config['PASSWORD_HASH_WORKERS'])
+
+def _submit_kdf(fn, *args, block=True):
+    return submit_bounded(get_hash_pool(), fn, *args, timeout=app.config['PASSWORD_HASH_TIMEOUT'], block=block)
+
+def _run_kdf(fn, *args):
+    if get_hash_pool() is None:
+        return fn(*args)
+    future = _submit_kdf(fn, *args)
+    if future is None:
+        # Shed load rather than let requests pile up behind the pool
+        abort(503)
+    return future.result(timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+
+def hash_password(password):
+    return _run_kdf(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+def full_hash_method(method):
+    """
+    A hash method with Werkzeug's defaults filled in, as it is written into a
+    stored hash: 'scrypt' is 'scrypt:32768:8:1', 'pbkdf2' is 'pbkdf2:sha256:600000'.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        return ':'.join(['pbkdf2', *(args or ['sha256']), str(DEFAULT_PBKDF2_ITERATIONS)])
+    return method
+
+def needs_rehash(stored):
+    return full_hash_method(stored.split('$', 1)[0]) != full_hash_method(app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(user_id, stored, password):
+    """
+    Check a password against its stored hash. On success an outdated hash is
+    replaced in the background with one made using PASSWORD_HASH_METHOD.
+    """
+    if not _run_kdf(check_password_hash, stored, password):
+        return False
+    if needs_rehash(stored):
+        def store(new_hash):
+            """Store new_hash(); a failure is logged and the old hash kept for the next login."""
+            try:
+                new_hash = new_hash()
+                conn = connect_db()
+                try:
+                    # Skip if the password changed in the meantime
+                    conn.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                                 (new_hash, user_id, stored))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception:
+                app.logger.exception('Rehashing the password of user %s failed', user_id)
+        method = app.config['PASSWORD_HASH_METHOD']
+        if get_hash_pool() is None:
+            store(lambda: generate_password_hash(password, method))
+        else:
+            # Best effort: with the pool busy, the rehash waits for a later login
+            future = _submit_kdf(generate_password_hash, password, method, block=False)
+            if future:
+                future.add_done_callback(lambda f: store(f.result))
+    return True
+
+# Login throttling
+# Failed logins are counted per email and per client address in login_failures,
+# so every worker process shares the same counts. A throttled attempt is refused
+# before any hashing happens.
+def login_throttle_keys(email):
+    return {f'email:{email.strip().lower()}': app.config['LOGIN_MAX_FAILURES'],
+            f'ip:{request.remote_addr}': app.config['LOGIN_MAX_FAILURES_PER_IP']}
+
+def login_retry_after(conn, keys):
+    """Seconds until these keys may try again, or 0 if they are not throttled."""
+    window = app.config['LOGIN_FAILURE_WINDOW']
+    now = time.time()
+    rows = conn.execute(f'''SELECT key, failures, window_start FROM login_failures
+                           WHERE key IN ({', '.join('?' * len(keys))}) AND window_start > ?''',
+                        list(keys) + [now - window]).fetchall()
+    waits = [window_start + window - now for key, failures, window_start in rows if failures >= keys[key]]
+    return max(waits, default=0)
+
+def record_login_failure(conn, keys):
+    now, window = time.time(), app.config['LOGIN_FAILURE_WINDOW']
+    conn.executemany('''INSERT INTO login_failures (key, failures, window_start) VALUES (?, 1, ?)
+                        ON CONFLICT (key) DO UPDATE SET
+                            failures = CASE WHEN login_failures.window_start <= ? THEN 1
+                                            ELSE login_failures.failures + 1 END,
+                            window_start = CASE WHEN login_failures.window_start <= ? THEN excluded.window_start
+                                                ELSE login_failures.window_start END''',
+                     [(key, now, now - window, now - window) for key in keys])
+    conn.commit()
+
+def clear_login_failures(conn, email):
+    conn.execute('DELETE FROM login_failures WHERE key = ?', (f'email:{email.strip().lower()}',))
+    conn.commit()
+
+# Row records
+# Each view selects only the columns it shows and gets its rows back as a
+# namedtuple for that projection. A record is a tuple underneath, so it costs no
+# more memory than the raw row and no per-row dict is built, but Python code and
+# templates read it by name (ngo.org_name, not ngo[2]). The cursor builds the
+# records itself through the type's row_factory.
+def record_type(name, fields):
+    """A namedtuple type with a row_factory that builds it from a result row."""
+    cls = namedtuple(name, fields)
+    new = tuple.__new__
+    cls.row_factory = staticmethod(lambda cursor, row: new(cls, row))
+    return cls
+
+def fetch_records(c, record, sql, params=()):
+    """Run sql on cursor c and return all rows as record instances."""
+    c.row_factory = record.row_factory
+    try:
+        return c.execute(sql, params).fetchall()
+    finally:
+        c.row_factory = None
+
+def fetch_record(c, record, sql, params=()):
+    """Run sql on cursor c and return the first row as a record, or None."""
+    c.row_factory = record.row_factory
+    try:
+        return c.execute(sql, params).fetchone()
+    finally:
+        c.row_factory = None
+
+StoryCard = record_type('StoryCard', 'id title content org_name created_at image_path')
+NgoStory = record_type('NgoStory', 'title content created_at image_path')
+UrgentCard = record_type('UrgentCard', 'id title description amount_needed amount_raised deadline org_name ngo_id')
+RequirementSummary = record_type('RequirementSummary', 'id title amount_needed amount_raised')
+NgoCard = record_type('NgoCard', 'id org_name location website donation_count')
+NgoProfile = record_type('NgoProfile', 'id org_name location contact_number email website bank_name '
+                                       'account_number upi_id qr_code_path niti_aayog_id tax_certificate_path')
+NgoContact = record_type('NgoContact', 'id org_name location contact_number email qr_code_path')
+NgoAccount = record_type('NgoAccount', 'id org_name location email is_verified')
+DonationRow = record_type('DonationRow', 'id donor_email amount created_at status payment_method transaction_id')
+PaymentTotal = record_type('PaymentTotal', 'payment_method total_amount donation_count')
+ExpenseRow = record_type('ExpenseRow', 'id description amount_used created_at transaction_id receipt_path')
+SearchHit = record_type('SearchHit', 'kind ref_id title snippet org_name location ngo_id rank rowid')
+DonorDonation = record_type('DonorDonation', 'id transaction_id amount created_at org_name')
+ReceiptLine = record_type('ReceiptLine', 'transaction_id donor_email amount payment_method created_at '
+                                         'org_name location ngo_email contact_number niti_aayog_id')
+UtilizationPeriod = namedtuple('UtilizationPeriod', 'period received donations used expenses utilization balance')
+
+# Keyset pagination
+# Listings are paged on their sort key plus id rather than OFFSET, so every page
+# is an index range scan no matter how deep the client has paged.
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DASHBOARD_DONATIONS = 10
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(token, key_types=(str, int, float, type(None))):
+    """
+    Decode a [sort key, id] cursor from the query string. A malformed cursor, or
+    one whose values cannot be bound to the listing's query (a key that is not
+    one of key_types, an id that is not a 64-bit integer), is a 400.
+    """
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        abort(400)
+    if not isinstance(values, list) or len(values) != 2:
+        abort(400)
+    key, last_id = values
+    if (isinstance(key, bool) or not isinstance(key, key_types) or isinstance(last_id, bool)
+            or not isinstance(last_id, int) or not -2 ** 63 <= last_id < 2 ** 63):
+        abort(400)
+    return values
+
+def page_size(default=PAGE_SIZE):
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+def _page(rows, limit, key):
+    """Trim the look-ahead row and build the cursor for the next page."""
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(*key(rows[limit - 1]))
+    return rows, None
+
+def fetch_stories_page(c, cursor=None, limit=PAGE_SIZE):
+    """Approved stories, newest first. Returns (rows, next_cursor)."""
+    where, params = '', ()
+    if cursor:
+        where, params = 'AND (s.created_at, s.id) < (?, ?)', tuple(cursor)
+    rows = fetch_records(c, StoryCard, f'''SELECT s.id, s.title, s.content, n.org_name, s.created_at, s.image_path
+                 FROM stories s
+                 JOIN ngos n ON s.ngo_id = n.id
+                 WHERE s.is_approved = TRUE {where}
+                 ORDER BY s.created_at DESC, s.id DESC LIMIT ?''', params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.created_at, row.id))
+
+def fetch_urgent_page(c, cursor=None, limit=PAGE_SIZE):
+    """
+    Active requirements, nearest deadline first. Open-ended requirements have a
+    NULL deadline and sort ahead of dated ones, so they need their own predicate.
+    """
+    where, params = '', ()
+    if cursor:
+        deadline, last_id = cursor
+        if deadline is None:
+            where, params = 'AND (ur.deadline IS NOT NULL OR ur.id > ?)', (last_id,)
+        else:
+            where, params = 'AND (ur.deadline, ur.id) > (?, ?)', (deadline, last_id)
+    rows = fetch_records(c, UrgentCard, f'''SELECT ur.id, ur.title, ur.description, ur.amount_needed,
+                 ur.amount_raised, ur.deadline, n.org_name, n.id as ngo_id
+                 FROM urgent_requirements ur 
+                 JOIN ngos n ON ur.ngo_id = n.id 
+                 WHERE ur.is_active = TRUE {where}
+                 ORDER BY ur.deadline ASC NULLS FIRST, ur.id ASC LIMIT ?''', params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.deadline, row.id))
+
+def fetch_donations_page(c, ngo_id, cursor=None, limit=PAGE_SIZE):
+    """Donations received by one NGO, newest first."""
+    where, params = '', ()
+    if cursor:
+        where, params = 'AND (created_at, id) < (?, ?)', tuple(cursor)
+    rows = fetch_records(c, DonationRow, f'''SELECT id, donor_email, amount, created_at, status, payment_method,
+                 transaction_id
+                 FROM donations WHERE ngo_id = ? {where}
+                 ORDER BY created_at DESC, id DESC LIMIT ?''', (ngo_id,) + params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.created_at, row.id))
+
+def fetch_usage_page(c, ngo_id, cursor=None, limit=PAGE_SIZE):
+    """Money recorded as spent by one NGO, newest first."""
+    where, params = '', ()
+    if cursor:
+        where, params = 'AND (mu.created_at, mu.id) < (?, ?)', tuple(cursor)
+    rows = fetch_records(c, ExpenseRow, f'''SELECT mu.id, mu.description, mu.amount_used, mu.created_at,
+                 d.transaction_id, mu.receipt_path
+                 FROM money_usage mu LEFT JOIN donations d ON d.id = mu.donation_id
+                 WHERE mu.ngo_id = ? {where}
+                 ORDER BY mu.created_at DESC, mu.id DESC LIMIT ?''', (ngo_id,) + params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.created_at, row.id))
+
+def fetch_donor_donations_page(c, donor_email, year, cursor=None, limit=PAGE_SIZE):
+    """One donor's completed donations in a calendar year, newest first."""
+    where, params = '', ()
+    if cursor:
+        where, params = 'AND (d.created_at, d.id) < (?, ?)', tuple(cursor)
+    rows = fetch_records(c, DonorDonation, f'''SELECT d.id, d.transaction_id, d.amount, d.created_at, n.org_name
+                 FROM donations d JOIN ngos n ON n.id = d.ngo_id
+                 WHERE d.donor_email = ? AND d.status = 'completed' AND d.created_at >= ? AND d.created_at < ?
+                 {where}
+                 ORDER BY d.created_at DESC, d.id DESC LIMIT ?''',
+                 (donor_email, f'{year}-01-01', f'{year + 1}-01-01') + params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.created_at, row.id))
+
+def search_terms(text, location=None):
+    """
+    Split free text and a location into (words, places) for the backend's
+    search_match(). Returns None when there is nothing to search for.
+    """
+    words = re.findall(r'\w+', text or '')
+    places = re.findall(r'\w+', location or '')
+    if not words and not places:
+        return None
+    return words, places
+
+def fetch_search_page(c, terms, kinds=None, cursor=None, limit=PAGE_SIZE):
+    """
+    Visible documents matching search_terms(), best match first, as SearchHit
+    records. The snippet marks matched terms with \\x02 and \\x03 (see highlight()).
+    """
+    if not terms:
+        return [], None
+    backend = c.connection.backend
+    where, params = '', ()
+    if kinds:
+        where += f" AND si.kind IN ({', '.join('?' * len(kinds))})"
+        params += tuple(kinds)
+    if cursor:
+        where += ' AND (si.rank, si.rowid) > (?, ?)'
+        params += tuple(cursor)
+    rows = fetch_records(c, SearchHit, backend.search_sql.format(where=where),
+                         (backend.search_match(*terms),) + params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.rank, row.rowid))
+
+@app.template_filter()
+def highlight(snippet):
+    """Escape a search snippet and turn its match markers into <mark> tags."""
+    return Markup(str(escape(snippet)).replace('\x02', '<mark>').replace('\x03', '</mark>'))
+
+def fetch_ngos_page(c, location=None, cursor=None, limit=PAGE_SIZE):
+    """Verified NGOs in name order, optionally in one location."""
+    where, params = '', ()
+    if location:
+        where, params = 'AND n.location = ?', (location,)
+    if cursor:
+        where, params = where + ' AND (n.org_name, n.id) > (?, ?)', params + tuple(cursor)
+    rows = fetch_records(c, NgoCard, f'''SELECT n.id, n.org_name, n.location, n.website,
+                 COALESCE(s.completed_count, 0) as donation_count
+                 FROM ngos n LEFT JOIN ngo_stats s ON s.ngo_id = n.id
+                 WHERE n.is_verified = TRUE {where}
+                 ORDER BY n.org_name, n.id LIMIT ?''', params + (limit + 1,))
+    return _page(rows, limit, lambda row: (row.org_name, row.id))
+
+# Caching
+# Cached entries are keyed on the versions of the tags they depend on. Write
+# routes bump a tag inside their own transaction (invalidate_tags), so every
+# worker stops seeing the old entries as soon as the write commits and stale
+# ones simply age out of the backend.
+class LRUCache:
+    """In-process cache bounded by entry count, with a per-entry TTL."""
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._data), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class SQLiteCache:
+    """
+    Cache shared by every worker on a host, kept in its own SQLite file.
+    Values must be JSON-serialisable. Eviction is approximately least recently
+    used: a hit refreshes an entry's used_at only once it is TOUCH_INTERVAL
+    seconds old, so hot reads stay reads instead of write transactions.
+    """
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path, max_entries=1024, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = connect_db(path)
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            used_at REAL NOT NULL
+        )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_used ON cache (used_at)')
+        self._conn.commit()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, used_at FROM cache WHERE key = ? AND expires_at > ?',
+                                     (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] >= self.TOUCH_INTERVAL:
+                self._conn.execute('UPDATE cache SET used_at = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+                               (key, json.dumps(value), now + (ttl or self.ttl), now))
+            self._conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+            evicted = self._conn.execute('''DELETE FROM cache WHERE key IN (
+                SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)''', (self.max_entries,)).rowcount
+            self._conn.commit()
+            self.evictions += evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'max_entries': self.max_entries,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Return this process's cache backend, chosen by CACHE_BACKEND."""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.pid != os.getpid():
+            if app.config['CACHE_BACKEND'] == 'sqlite':
+                _cache = SQLiteCache(app.config['CACHE_PATH'], app.config['CACHE_MAX_ENTRIES'],
+                                     app.config['CACHE_TTL'])
+            else:
+                _cache = LRUCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_TTL'])
+            _cache.pid = os.getpid()
+        return _cache
+
+def invalidate_tags(conn, *tags):
+    """Bump the given tags; call inside the write's transaction before commit."""
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany('''INSERT INTO cache_tags (tag, version, updated_at) VALUES (?, 1, ?)
+                        ON CONFLICT (tag) DO UPDATE SET version = cache_tags.version + 1,
+                                                        updated_at = excluded.updated_at''',
+                     [(tag, now) for tag in tags])
+
+def tag_state(conn, tags):
+    """Return the combined version string and latest change time (UTC) of the tags."""
+    placeholders = ', '.join('?' * len(tags))
+    rows = conn.execute(f'SELECT tag, version, updated_at FROM cache_tags WHERE tag IN ({placeholders})',
+                        tags).fetchall()
+    versions = {tag: version for tag, version, _ in rows}
+    changed = [updated_at for _, _, updated_at in rows if updated_at]
+    last_modified = None
+    if changed:
+        last_modified = datetime.strptime(max(changed), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return '.'.join(str(versions.get(tag, 0)) for tag in tags), last_modified
+
+def tag_versions(conn, tags):
+    return tag_state(conn, tags)[0]
+
+def cached(key, tags, producer, ttl=None):
+    """Return the cached value for key, calling producer() on a miss."""
+    cache = get_cache()
+    full_key = f'{key}@{tag_versions(get_db(), tags)}'
+    value = cache.get(full_key)
+    if value is None:
+        value = producer()
+        cache.set(full_key, value, ttl)
+    return value
+
+@app.route('/cache_stats')
+@ops_only
+def cache_stats():
+    return jsonify(get_cache().stats())
+
+# Conditional responses
+# Listing views answer If-None-Match / If-Modified-Since from the cache tag
+# versions alone, before their query or template runs. The request itself is
+# checked first: a malformed cursor, or whatever validate(*args, **kwargs)
+# aborts on, gets the error the view would give rather than a 304.
+# Last-Modified has one-second resolution, so it cannot tell apart writes made
+# within the second it names: while that second is still current the response
+# carries only the ETag, and If-Modified-Since is not answered from it.
+def conditional(*tags, validate=None):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            decode_cursor(request.args.get('cursor'))
+            if validate:
+                validate(*args, **kwargs)
+            # Pending flash messages make this render one-off
+            if session.get('_flashes'):
+                return f(*args, **kwargs)
+            versions, last_modified = tag_state(get_db(), tags)
+            if last_modified is not None and last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+                last_modified = None
+            user_id = session.get('user_id')
+            etag = hashlib.sha1(f"{request.full_path}|{versions}|{user_id}".encode()).hexdigest()
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since)
+            response = app.response_class(status=304) if not_modified else make_response(f(*args, **kwargs))
+            if response.status_code not in (200, 304):
+                return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            if user_id is None:
+                response.cache_control.public = True
+                response.cache_control.max_age = app.config['LISTING_MAX_AGE']
+            else:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
+# Background jobs
+# Jobs are rows in the jobs table, so they survive restarts and can be drained
+# either by worker threads inside each web process (JOB_WORKERS) or by a
+# dedicated `flask run-jobs` process. Failed jobs are retried with exponential
+# backoff; a job left 'running' past JOB_LEASE (crashed worker) is picked up again.
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """Register f(conn, payload) as the handler for jobs of this kind."""
+    def decorator(f):
+        JOB_HANDLERS[kind] = f
+        return f
+    return decorator
+
+def enqueue_job(conn, kind, payload, delay=0):
+    """Queue a job; workers see it once conn commits (then call notify_job_workers)."""
+    conn.execute('INSERT INTO jobs (kind, payload, run_after) VALUES (?, ?, ?)',
+                 (kind, json.dumps(payload), time.time() + delay))
+
+def claim_job(conn):
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.backend.lock(conn, 'jobs')
+        job = conn.execute('''SELECT id, kind, payload, attempts FROM jobs
+                              WHERE (status = 'queued' AND run_after <= ?)
+                                 OR (status = 'running' AND updated_at < ?)
+                              ORDER BY run_after LIMIT 1''', (now, now - app.config['JOB_LEASE'])).fetchone()
+        if job:
+            conn.execute('''UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+                            WHERE id = ?''', (now, job[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return job
+
+def run_job(conn, job):
+    """Run a claimed job and record its outcome. Returns True on success."""
+    job_id, kind, payload, attempts = job
+    attempts += 1
+    try:
+        JOB_HANDLERS[kind](conn, json.loads(payload))
+    except Exception as e:
+        conn.rollback()
+        if attempts >= app.config['JOB_MAX_ATTEMPTS']:
+            status, run_after = 'failed', time.time()
+        else:
+            backoff = app.config['JOB_RETRY_BASE'] * 2 ** (attempts - 1)
+            status, run_after = 'queued', time.time() + backoff * random.uniform(1, 1.5)
+        conn.execute('UPDATE jobs SET status = ?, run_after = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                     (status, run_after, repr(e), time.time(), job_id))
+        conn.commit()
+        app.logger.warning('Job %s (%s) attempt %s failed: %r', job_id, kind, attempts, e)
+        return False
+    conn.execute("UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE id = ?",
+                 (time.time(), job_id))
+    conn.commit()
+    return True
+
+_job_wakeup = threading.Event()
+_job_workers = {}
+_job_workers_lock = threading.Lock()
+
+def work_jobs(stop=None, burst=False, poll_interval=1.0):
+    """Claim and run jobs until stopped, or until the queue is empty when burst is set."""
+    conn = connect_db()
+    done = failed = 0
+    try:
+        while stop is None or not stop.is_set():
+            job = claim_job(conn)
+            if job is None:
+                if burst:
+                    break
+                _job_wakeup.wait(poll_interval)
+                _job_wakeup.clear()
+                continue
+            if run_job(conn, job):
+                done += 1
+            else:
+                failed += 1
+    finally:
+        conn.close()
+    return done, failed
+
+def notify_job_workers():
+    """Start this process's worker threads if needed and wake them up."""
+    pid = os.getpid()
+    if app.config['JOB_WORKERS'] and pid not in _job_workers:
+        with _job_workers_lock:
+            if pid not in _job_workers:
+                _job_workers[pid] = [threading.Thread(target=work_jobs, daemon=True, name=f'job-worker-{i}')
+                                     for i in range(app.config['JOB_WORKERS'])]
+                for worker in _job_workers[pid]:
+                    worker.start()
+    _job_wakeup.set()
+
+@app.cli.command('run-jobs')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+def run_jobs_command(burst):
+    """Run background jobs in this process."""
+    done, failed = work_jobs(burst=burst)
+    print(f"Processed {done + failed} jobs ({failed} failed)")
+
+# Bulk donation ingestion
+# Offline and partner-channel donations arrive as CSV or NDJSON streams. Rows are
+# validated and written in chunked transactions; a transaction_id that is already
+# stored (or repeated in the stream) is skipped, so re-running an import is safe.
+DONATION_IMPORT_FIELDS = ('donor_email', 'ngo_id', 'amount', 'payment_method', 'transaction_id',
+                          'status', 'created_at', 'urgent_requirement_id')
+DONATION_STATUSES = ('pending', 'completed', 'failed')
+MAX_REPORTED_REJECTS = 100
+
+def read_donation_records(stream, fmt):
+    """Yield one dict per record from a text stream of CSV (with header) or NDJSON."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'_error': 'invalid JSON'}
+    else:
+        raise ValueError(f'unsupported format: {fmt}')
+
+def validate_donation_record(record):
+    """Return (row tuple, None) for a valid record or (None, reason)."""
+    if not isinstance(record, dict):
+        return None, 'not an object'
+    if '_error' in record:
+        return None, record['_error']
+    email = str(record.get('donor_email') or '').strip()
+    if '@' not in email:
+        return None, 'invalid donor_email'
+    transaction_id = str(record.get('transaction_id') or '').strip()
+    if not transaction_id:
+        return None, 'missing transaction_id'
+    payment_method = str(record.get('payment_method') or '').strip()
+    if not payment_method:
+        return None, 'missing payment_method'
+    try:
+        ngo_id = int(record.get('ngo_id'))
+        amount = round(float(record.get('amount')), 2)
+        urgent_id = record.get('urgent_requirement_id')
+        urgent_id = int(urgent_id) if urgent_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, 'ngo_id, amount and urgent_requirement_id must be numeric'
+    if not (math.isfinite(amount) and amount > 0):
+        return None, 'amount must be a positive number'
+    status = str(record.get('status') or 'completed').strip().lower()
+    if status not in DONATION_STATUSES:
+        return None, f'status must be one of {", ".join(DONATION_STATUSES)}'
+    created_at = record.get('created_at') or None
+    if created_at:
+        try:
+            created_at = datetime.fromisoformat(str(created_at).strip())
+        except ValueError:
+            return None, 'created_at must be an ISO date/time'
+        # Stored times are UTC; a time without an offset is taken to be UTC already
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        created_at = created_at.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return (email, ngo_id, amount, payment_method, transaction_id, status, created_at, urgent_id), None
+
+def _ingest_chunk(conn, chunk, report):
+    """Write one chunk of (record number, row) pairs in a single transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Concurrent imports would otherwise both pass the duplicate check
+        conn.backend.lock(conn, 'donations:import')
+        ngo_ids = {row[1] for _, row in chunk}
+        urgent_ids = {row[7] for _, row in chunk if row[7] is not None}
+        known_ngos = {r[0] for r in conn.execute(
+            f"SELECT id FROM ngos WHERE id IN ({', '.join('?' * len(ngo_ids))})", list(ngo_ids))}
+        urgent_owner = dict(conn.execute(
+            f"SELECT id, ngo_id FROM urgent_requirements WHERE id IN ({', '.join('?' * len(urgent_ids))})",
+            list(urgent_ids))) if urgent_ids else {}
+        tx_ids = [row[4] for _, row in chunk]
+        existing = {r[0] for r in conn.execute(
+            f"SELECT transaction_id FROM donations WHERE transaction_id IN ({', '.join('?' * len(tx_ids))})", tx_ids)}
+
+        rows, raised = [], {}
+        for number, row in chunk:
+            if row[4] in existing:
+                report['duplicates'] += 1
+                continue
+            if row[1] not in known_ngos:
+                _reject(report, number, 'unknown ngo_id')
+                continue
+            if row[7] is not None and urgent_owner.get(row[7]) != row[1]:
+                _reject(report, number, 'urgent_requirement_id does not belong to ngo_id')
+                continue
+            existing.add(row[4])
+            rows.append(row)
+            if row[7] is not None and row[5] == 'completed':
+                raised[row[7]] = raised.get(row[7], 0) + row[2]
+
+        conn.executemany(f'''INSERT INTO donations ({', '.join(DONATION_IMPORT_FIELDS)})
+                             VALUES ({', '.join('?' * len(DONATION_IMPORT_FIELDS))})''', rows)
+        conn.executemany(FUND_URGENT_REQUIREMENT_SQL,
+                         [(amount, amount, urgent_id, urgent_owner[urgent_id])
+                          for urgent_id, amount in raised.items()])
+        if rows:
+            # Only a credited requirement changes what the urgent listings show
+            invalidate_tags(conn, 'donations', *(['urgent'] if raised else []))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    report['inserted'] += len(rows)
+
+def _reject(report, number, reason):
+    report['rejected'] += 1
+    if len(report['rejects']) < MAX_REPORTED_REJECTS:
+        report['rejects'].append({'record': number, 'reason': reason})
+
+def ingest_donations(conn, records, chunk_size=1000):
+    """
+    Validate and insert donation records in chunks of chunk_size.
+    Returns a report with counts, the first rejects and throughput.
+    """
+    started = time.perf_counter()
+    report = {'read': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0, 'rejects': []}
+    chunk = []
+    for number, record in enumerate(records, start=1):
+        report['read'] += 1
+        row, error = validate_donation_record(record)
+        if error:
+            _reject(report, number, error)
+            continue
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            _ingest_chunk(conn, chunk, report)
+            chunk = []
+    if chunk:
+        _ingest_chunk(conn, chunk, report)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(report['read'] / report['seconds']) if report['seconds'] else report['read']
+    return report
+
+@app.route('/api/donations/bulk', methods=['POST'])
+def api_bulk_donations():
+    if not bearer_token_matches(app.config['INGEST_TOKEN']):
+        abort(403)
+    fmt = request.args.get('format') or ('ndjson' if 'ndjson' in (request.mimetype or '') else 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        abort(400)
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    chunk_size = min(request.args.get('chunk_size', 1000, type=int), 10000)
+    report = ingest_donations(get_db(), read_donation_records(stream, fmt), max(chunk_size, 1))
+    return jsonify(report)
+
+@app.cli.command('import-donations')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to ndjson for .ndjson/.jsonl files, csv otherwise.')
+@click.option('--chunk-size', default=1000, show_default=True)
+def import_donations_command(source, fmt, chunk_size):
+    """Import donations from a CSV or NDJSON file ('-' for stdin)."""
+    fmt = fmt or ('ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+    conn = connect_db()
+    report = ingest_donations(conn, read_donation_records(source, fmt), chunk_size)
+    conn.close()
+    for reject in report['rejects']:
+        print(f"  record {reject['record']}: {reject['reason']}")
+    print(f"Read {report['read']} rows in {report['seconds']}s ({report['rows_per_second']} rows/s): "
+          f"{report['inserted']} inserted, {report['duplicates']} duplicates, {report['rejected']} rejected")
+
+# Streaming exports
+# Exports are generators over a dedicated connection read with fetchmany, so
+# memory stays flat however many rows match and the header goes out before the
+# query has produced anything. On PostgreSQL the rows come from a server-side
+# cursor, since a plain one would receive the whole result up front.
+EXPORTS = {
+    'donations': ['id', 'transaction_id', 'donor_email', 'ngo_id', 'amount', 'payment_method',
+                  'status', 'urgent_requirement_id', 'created_at'],
+    'money_usage': ['id', 'donation_id', 'ngo_id', 'description', 'amount_used', 'receipt_path',
+                    'created_at'],
+}
+EXPORT_BATCH_SIZE = 1000
+
+def export_batches(conn, table, ngo_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of rows from table, filtered by NGO and [start, end] dates."""
+    where, params = [], []
+    if ngo_id is not None:
+        where.append('ngo_id = ?')
+        params.append(ngo_id)
+    if start:
+        where.append('created_at >= ?')
+        params.append(start.isoformat())
+    if end:
+        where.append('created_at < ?')
+        params.append((end + timedelta(days=1)).isoformat())
+    order = 'created_at, id' if ngo_id is not None else 'id'
+    cursor = conn.backend.stream(conn, f'''SELECT {', '.join(EXPORTS[table])} FROM {table}
+                                          {'WHERE ' + ' AND '.join(where) if where else ''}
+                                          ORDER BY {order}''', params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+def export_stream(table, fmt='csv', compress=False, ngo_id=None, start=None, end=None):
+    """Yield the encoded (and optionally gzipped) export as bytes chunks."""
+    columns = EXPORTS[table]
+    gzipper = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def encode(text):
+        data = text.encode('utf-8')
+        return gzipper.compress(data) if gzipper else data
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield encode(buffer.getvalue())
+    conn = connect_db()
+    try:
+        for rows in export_batches(conn, table, ngo_id, start, end):
+            if fmt == 'csv':
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                chunk = encode(buffer.getvalue())
+            else:
+                chunk = encode(''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows))
+            if chunk:
+                yield chunk
+    finally:
+        conn.close()
+    if gzipper:
+        yield gzipper.flush()
+
+def parse_export_date(value):
+    return date.fromisoformat(value) if value else None
+
+@app.route('/export/<table>')
+def export(table):
+    """
+    Stream donations or money_usage. NGOs export their own rows; auditors with
+    EXPORT_TOKEN may export any NGO (or all of them).
+    """
+    if table not in EXPORTS:
+        abort(404)
+    if bearer_token_matches(app.config['EXPORT_TOKEN']):
+        ngo_id = request.args.get('ngo_id', type=int)
+    elif session.get('user_type') == 'receiver':
+        ngo = get_db().execute('SELECT id FROM ngos WHERE user_id = ?', (session['user_id'],)).fetchone()
+        if not ngo:
+            abort(404)
+        ngo_id = ngo[0]
+    else:
+        abort(403)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        abort(400)
+    try:
+        start = parse_export_date(request.args.get('from'))
+        end = parse_export_date(request.args.get('to'))
+    except ValueError:
+        abort(400)
+    compress = request.args.get('gzip') == '1'
+    filename = f"{table}{f'-ngo{ngo_id}' if ngo_id else ''}.{fmt}{'.gz' if compress else ''}"
+    response = app.response_class(export_stream(table, fmt, compress, ngo_id, start, end),
+                                  mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    if compress:
+        response.mimetype = 'application/gzip'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.cli.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORTS)))
+@click.option('--ngo-id', type=int)
+@click.option('--from', 'start', help='First day to include (YYYY-MM-DD).')
+@click.option('--to', 'end', help='Last day to include (YYYY-MM-DD).')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True)
+@click.option('-o', '--output', type=click.File('wb'), default='-')
+def export_command(table, ngo_id, start, end, fmt, compress, output):
+    """Stream donations or money_usage to a file (stdout by default)."""
+    for chunk in export_stream(table, fmt, compress, ngo_id, parse_export_date(start), parse_export_date(end)):
+        output.write(chunk)
+
+# Static assets
+# Page CSS and JavaScript live in static/css and static/js, not inline in the
+# templates, so a browser downloads them once instead of with every page.
+# build_assets() copies each file into ASSET_DIR under a name carrying a hash of
+# its content, next to gzip (and, with the brotli package, brotli) compressed
+# copies, so a changed file gets a new URL and the old one can be cached for a
+# year. Each process builds on first use, which only hashes the sources when
+# `flask build-assets` has already written the files.
+ASSET_KINDS = ('css', 'js')
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_NAME = re.compile(r'(?:css|js)/[\w-]+\.[0-9a-f]{16}\.(?:css|js)')
+# Best first; only sent to clients that accept them
+ASSET_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def asset_sources():
+    """(name, path) of every file under static/css and static/js, e.g. ('css/base.css', ...)."""
+    sources = []
+    for kind in ASSET_KINDS:
+        folder = os.path.join(app.static_folder, kind)
+        if os.path.isdir(folder):
+            sources += [(f'{kind}/{name}', os.path.join(folder, name)) for name in sorted(os.listdir(folder))]
+    return sources
+
+def _write_file(path, data):
+    """Write data to path atomically, so concurrent builds never expose a partial file."""
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def build_assets():
+    """
+    Fingerprint and precompress every asset source into ASSET_DIR and return the
+    manifest, {source name: built name}. Files that are already built are kept.
+    """
+    root = app.config['ASSET_DIR']
+    manifest = {}
+    for name, path in asset_sources():
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        built = f'{stem}.{hashlib.sha256(data).hexdigest()[:16]}{ext}'
+        target = os.path.join(root, built)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_file(target + '.gz', gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write_file(target + '.br', brotli.compress(data, quality=11))
+            # Last, so an existing target means its compressed copies exist too
+            _write_file(target, data)
+        manifest[name] = built
+    os.makedirs(root, exist_ok=True)
+    _write_file(os.path.join(root, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+_assets = None
+_assets_stamp = None
+_asset_urls = {}
+_assets_lock = threading.Lock()
+
+def asset_manifest():
+    """This process's manifest. In debug mode an edited source is rebuilt on the next request."""
+    global _assets, _assets_stamp
+    if _assets is not None and not app.debug:
+        return _assets
+    with _assets_lock:
+        stamp = [(name, os.stat(path).st_mtime_ns) for name, path in asset_sources()]
+        if stamp != _assets_stamp:
+            _assets, _assets_stamp = build_assets(), stamp
+            _asset_urls.clear()
+        return _assets
+
+@app.template_global()
+def asset_url(name):
+    """URL of the built copy of a source under static/, e.g. asset_url('css/base.css')."""
+    manifest = asset_manifest()
+    key = (request.script_root, name)
+    url = _asset_urls.get(key)
+    if url is None:
+        url = _asset_urls[key] = url_for('asset', name=manifest[name])
+    return url
+
+@app.route('/assets/<path:name>')
+def asset(name):
+    """A built asset. Its name changes with its content, so it is cached for a year."""
+    if not ASSET_NAME.fullmatch(name):
+        abort(404)
+    root = app.config['ASSET_DIR']
+    mimetype = mimetypes.guess_type(name)[0]
+    accepted = request.accept_encodings
+    for encoding, suffix in ASSET_ENCODINGS:
+        if accepted[encoding] and os.path.exists(os.path.join(root, name + suffix)):
+            response = send_from_directory(root, name + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(root, name, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+# Compiled templates
+# Jinja keeps each template's compiled bytecode in TEMPLATE_CACHE_DIR, keyed on
+# its source, so a fresh gunicorn worker loads bytecode instead of parsing and
+# compiling every template again. `flask build-assets` fills it before a deploy.
+if app.config['TEMPLATE_CACHE_DIR']:
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+def compile_templates(env=None):
+    """Load every template into env (default: the app's), through its bytecode cache. Returns the count."""
+    env = env or app.jinja_env
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static assets and precompile the templates."""
+    manifest = build_assets()
+    root = app.config['ASSET_DIR']
+    for name, built in sorted(manifest.items()):
+        sizes = [os.path.getsize(os.path.join(root, built + suffix))
+                 for suffix in ('', '.gz', '.br') if os.path.exists(os.path.join(root, built + suffix))]
+        print(f"{built:48} {' / '.join(f'{size:,}' for size in sizes)} bytes")
+    print(f"Built {len(manifest)} assets into {root}")
+    if app.config['TEMPLATE_CACHE_DIR']:
+        print(f"Compiled {compile_templates()} templates into {app.config['TEMPLATE_CACHE_DIR']}")
+
+# Uploads
+# Files are copied to UPLOAD_DIR in UPLOAD_CHUNK_SIZE pieces while being hashed,
+# and stored under their SHA-256 (<2 hex>/<sha256>.<ext>), so the same file
+# uploaded twice is kept once and a stored file never changes; its URL can be
+# cached for a year. Multipart bodies are spooled to disk by Werkzeug before we
+# see them; /api/uploads reads the raw request body straight from the socket.
+# The type comes from the file's leading bytes, never from the client. Image
+# thumbnails are made by the background job workers, and until they exist a
+# thumbnail URL serves the original, uncached.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+UPLOAD_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'%PDF-', 'pdf'),
+]
+IMAGE_TYPES = ('png', 'jpg', 'gif', 'webp')
+DOCUMENT_TYPES = IMAGE_TYPES + ('pdf',)
+UPLOAD_KEY = re.compile(r'([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.(png|jpg|gif|webp|pdf)|-(\d+)\.webp)')
+
+def upload_root():
+    return os.path.abspath(app.config['UPLOAD_DIR'])
+
+def sniff_upload(head):
+    """The file type named by a file's leading bytes, or None."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, ext in UPLOAD_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+def thumbnail_key(key, size):
+    return f'{key.rsplit(".", 1)[0]}-{size}.webp'
+
+def missing_thumbnails(key):
+    """Whether an image upload lacks any of its THUMBNAIL_SIZES."""
+    return key.rsplit('.', 1)[1] in IMAGE_TYPES and not all(
+        os.path.exists(os.path.join(upload_root(), thumbnail_key(key, size)))
+        for size in app.config['THUMBNAIL_SIZES'])
+
+def store_upload(stream, allowed=IMAGE_TYPES, max_bytes=None):
+    """
+    Copy a file-like stream into content-addressed storage and return its key.
+    Raises ValueError when the file is empty, too large or not an allowed type.
+    """
+    max_bytes = max_bytes or app.config['UPLOAD_MAX_BYTES']
+    staging = os.path.join(upload_root(), 'tmp')
+    os.makedirs(staging, exist_ok=True)
+    digest, size, head = hashlib.sha256(), 0, b''
+    fd, tmp = tempfile.mkstemp(dir=staging)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f'Files must be at most {max_bytes // (1024 * 1024)} MB.')
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                out.write(chunk)
+        if not size:
+            raise ValueError('The uploaded file is empty.')
+        ext = sniff_upload(head)
+        if ext not in allowed:
+            raise ValueError(f'Upload a {", ".join(allowed[:-1]).upper()} or {allowed[-1].upper()} file.')
+        name = digest.hexdigest()
+        key = f'{name[:2]}/{name}.{ext}'
+        path = os.path.join(upload_root(), key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return key
+
+def save_upload(file, allowed=IMAGE_TYPES):
+    """Store an uploaded FileStorage (or stream); None when nothing was uploaded."""
+    if isinstance(file, FileStorage):
+        if not file.filename:
+            return None
+        file = file.stream
+    elif file is None:
+        return None
+    return store_upload(file, allowed)
+
+def queue_thumbnails(conn, *keys):
+    """
+    Queue thumbnail jobs on conn for the images among keys that need them; the
+    caller commits and calls notify_job_workers().
+    """
+    for key in keys:
+        if key and missing_thumbnails(key):
+            enqueue_job(conn, 'thumbnails', {'key': key})
+
+def upload_key(value, allowed=DOCUMENT_TYPES):
+    """Validate a key returned by /api/uploads; None for an empty value."""
+    if not value:
+        return None
+    match = UPLOAD_KEY.fullmatch(str(value))
+    if not match or match.group(3) not in allowed or not os.path.exists(os.path.join(upload_root(), value)):
+        raise ValueError('Unknown upload.')
+    return value
+
+@job_handler('thumbnails')
+def make_thumbnails(conn, payload):
+    """Write a WebP thumbnail of an uploaded image for each of THUMBNAIL_SIZES."""
+    if Image is None:
+        app.logger.warning('Pillow is not installed; skipping thumbnails for %s', payload['key'])
+        return
+    root = upload_root()
+    sizes = sorted(app.config['THUMBNAIL_SIZES'], reverse=True)
+    with Image.open(os.path.join(root, payload['key'])) as image:
+        # JPEGs can be decoded straight at a reduced scale
+        image.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+        for size in sizes:
+            path = os.path.join(root, thumbnail_key(payload['key'], size))
+            if os.path.exists(path):
+                continue
+            # Shrink each size from the previous one, which is already close
+            image.thumbnail((size, size), Image.LANCZOS)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    image.save(out, 'WEBP', quality=80, method=4)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+@app.template_global()
+def upload_url(key, size=None):
+    """URL of an uploaded file, or of its thumbnail of the given size."""
+    if size and key.rsplit('.', 1)[-1] in IMAGE_TYPES:
+        key = thumbnail_key(key, size)
+    return url_for('uploaded_file', key=key)
+
+@app.route('/uploads/<path:key>')
+def uploaded_file(key):
+    match = UPLOAD_KEY.fullmatch(key)
+    if not match:
+        abort(404)
+    root = upload_root()
+    if os.path.exists(os.path.join(root, key)):
+        response = send_from_directory(root, key, max_age=UPLOAD_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # A thumbnail that has not been made yet
+        original = next((f'{match.group(1)}/{match.group(2)}.{ext}' for ext in IMAGE_TYPES
+                         if match.group(4) and os.path.exists(os.path.join(root, match.group(1),
+                                                                           f'{match.group(2)}.{ext}'))), None)
+        if original is None:
+            abort(404)
+        response = send_from_directory(root, original, max_age=0)
+        response.cache_control.no_cache = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/api/uploads', methods=['POST'])
+@login_required
+def api_upload():
+    """
+    Store the raw request body (not a multipart form) and return its key, for
+    clients that attach files to JSON requests such as POST /api/money_usage.
+    """
+    try:
+        key = save_upload(request.stream, DOCUMENT_TYPES)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    conn = get_db()
+    queue_thumbnails(conn, key)
+    conn.commit()
+    notify_job_workers()
+    return jsonify(key=key, url=upload_url(key)), 201
+
+@app.cli.command('make-thumbnails')
+def make_thumbnails_command():
+    """Queue thumbnail jobs for stored images that are missing any thumbnail size."""
+    conn = connect_db()
+    root = upload_root()
+    queued = 0
+    for folder in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        if not re.fullmatch(r'[0-9a-f]{2}', folder):
+            continue
+        for name in os.listdir(os.path.join(root, folder)):
+            key = f'{folder}/{name}'
+            match = UPLOAD_KEY.fullmatch(key)
+            if match and match.group(3) and missing_thumbnails(key):
+                enqueue_job(conn, 'thumbnails', {'key': key})
+                queued += 1
+    conn.commit()
+    conn.close()
+    print(f"Queued thumbnails for {queued} images; run `flask run-jobs --burst` to make them now")
+
+# Transaction IDs
+# ULID-style 26-character Crockford base32 strings: 48 bits of milliseconds,
+# 23 bits of node, 22 bits of pid and a 35-bit per-process counter. IDs sort by
+# creation time, so inserts land at the right edge of the transaction_id index,
+# and pid + counter keep them unique across gunicorn workers and threads on one
+# host without any coordination. The node defaults to a 23-bit hash of the host
+# name, which two hosts can share: that is no uniqueness guarantee across hosts.
+# Deployments with several app servers give each one its own
+# TRANSACTION_NODE_ID (0 to 8388607). The fields fall on character boundaries
+# (10 + 9 + 7 characters), so only the counter is encoded on every call.
+CROCKFORD32 = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+CROCKFORD_PAIRS = [a + b for a in CROCKFORD32 for b in CROCKFORD32]
+
+def crockford32(value, length):
+    """Encode value as exactly length base32 characters, two at a time."""
+    chars = []
+    if length % 2:
+        chars.append(CROCKFORD32[(value >> (5 * (length - 1))) & 31])
+    for shift in range(10 * (length // 2) - 10, -1, -10):
+        chars.append(CROCKFORD_PAIRS[(value >> shift) & 0x3FF])
+    return ''.join(chars)
+
+class TransactionIdGenerator:
+    def __init__(self, host=None, node_id=None):
+        self.host = host or socket.gethostname()
+        if node_id is not None and not 0 <= int(node_id) < 1 << 23:
+            raise ValueError(f'TRANSACTION_NODE_ID must be between 0 and {(1 << 23) - 1}')
+        self.node_id = int(node_id) if node_id is not None else None
+        self.reset()
+
+    def reset(self):
+        """Take a fresh node id; runs again in every forked child."""
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        node = self.node_id
+        if node is None:
+            node = int.from_bytes(hashlib.blake2b(self.host.encode(), digest_size=3).digest(), 'big') >> 1
+        self._node = crockford32((node << 22) | (self.pid & 0x3FFFFF), 9)
+        self._counter = random.getrandbits(35)
+        self._last_ms = 0
+        self._time = crockford32(0, 10)
+
+    def next_id(self):
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            # Never step backwards if the wall clock does
+            if ms > self._last_ms:
+                self._last_ms = ms
+                self._time = crockford32(ms, 10)
+            self._counter = (self._counter + 1) & 0x7FFFFFFFF
+            return self._time + self._node + crockford32(self._counter, 7)
+
+_transaction_ids = TransactionIdGenerator(node_id=app.config['TRANSACTION_NODE_ID'])
+os.register_at_fork(after_in_child=_transaction_ids.reset)
+
+def new_transaction_id():
+    return _transaction_ids.next_id()
+
+# Donation write path
+# A donation that funds an urgent requirement bumps amount_raised with a single
+# UPDATE in the same transaction as the insert. The SET expressions are evaluated
+# against the row as it was before the update (and PostgreSQL, which lets donors
+# write concurrently, re-reads the row after waiting for its lock), so concurrent
+# donors never lose each other's amounts and the requirement closes itself
+# exactly when its goal is met. A new donation only funds a requirement that is
+# still active; one made from a requirement that has meanwhile closed goes to the
+# NGO unattributed. (Imported donations already happened, so they are credited
+# to their requirement whatever its state.) The same statement returns the new
+# progress for the requirement's live 'funding' event, so publishing it costs no
+# extra read.
+FUND_URGENT_REQUIREMENT_SQL = '''UPDATE urgent_requirements
+    SET amount_raised = amount_raised + ?,
+        is_active = is_active AND amount_raised + ? < amount_needed
+    WHERE id = ? AND ngo_id = ?'''
+FUND_URGENT_REQUIREMENT_RETURNING_SQL = FUND_URGENT_REQUIREMENT_SQL + ''' AND is_active = TRUE
+    RETURNING amount_raised, amount_needed, is_active'''
+
+def record_donation(conn, donor_email, ngo_id, amount, payment_method, urgent_requirement_id=None):
+    """
+    Insert a completed donation and return its transaction ID. A requirement
+    that does not belong to ngo_id, or is no longer active, is ignored and the
+    donation goes to the NGO. Raises ValueError, with a message fit for the
+    user, for an amount that is not a positive number or an NGO that does not
+    exist or is not verified. With GROUP_COMMIT set, the donation is written by
+    this process's DonationWriter instead of on conn, and the call returns once
+    it is durable.
+    """
+    try:
+        amount = round(float(amount), 2)
+    except (TypeError, ValueError):
+        raise ValueError('Enter the amount as a number.')
+    if not (math.isfinite(amount) and amount > 0):
+        raise ValueError('Amount must be positive.')
+    if not conn.execute('SELECT 1 FROM ngos WHERE id = ? AND is_verified = TRUE', (ngo_id,)).fetchone():
+        raise ValueError('NGO not found!')
+    donation = (new_transaction_id(), donor_email, ngo_id, amount, payment_method, urgent_requirement_id)
+    if app.config['GROUP_COMMIT']:
+        return get_donation_writer().submit(donation)
+    commit_donations(conn, [donation])
+    notify_event_listeners()
+    return donation[0]
+
+def commit_donations(conn, donations):
+    """
+    Insert (transaction_id, donor_email, ngo_id, amount, payment_method,
+    urgent_requirement_id) donations in one write transaction, together with
+    their requirement funding, live events and cache invalidation.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        tags = ['donations']
+        events = []
+        rows = []
+        for transaction_id, donor_email, ngo_id, amount, payment_method, urgent_requirement_id in donations:
+            if urgent_requirement_id is not None:
+                funded = conn.execute(FUND_URGENT_REQUIREMENT_RETURNING_SQL,
+                                      (amount, amount, urgent_requirement_id, ngo_id)).fetchall()
+                if funded:
+                    if 'urgent' not in tags:
+                        tags.append('urgent')
+                    events.append(funding_event(urgent_requirement_id, *funded[0]))
+                else:
+                    urgent_requirement_id = None
+            rows.append((donor_email, ngo_id, amount, payment_method, transaction_id, 'completed',
+                         urgent_requirement_id))
+            events.append(donation_event(ngo_id, donor_email, amount, payment_method, transaction_id))
+        conn.executemany('''INSERT INTO donations (donor_email, ngo_id, amount, payment_method, transaction_id,
+                            status, urgent_requirement_id) VALUES (?, ?, ?, ?, ?, ?, ?)''', rows)
+        publish_events(conn, events)
+        invalidate_tags(conn, *tags)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Group commit
+# With GROUP_COMMIT set, a request does not commit its own donation. Each process
+# runs one writer thread with its own connection: request threads queue their
+# donation and wait, and the writer takes everything queued, waits up to
+# GROUP_COMMIT_WINDOW for more (at most GROUP_COMMIT_MAX_BATCH) and commits them
+# all in one transaction. A spike then costs one write lock and one sync per
+# batch instead of per donation, and request threads stop queueing on SQLite's
+# single writer lock. The writer's commits are durable (synchronous=FULL on
+# SQLite), and a request is answered only once its batch has committed. When a
+# batch fails, its donations are retried one at a time, so only the bad one
+# fails. Batch sizes and commit times are reported on /metrics. A request whose
+# donation is still queued after GROUP_COMMIT_TIMEOUT withdraws it and gets a
+# 503; a writer thread that has died is replaced by the next request.
+_donation_writer = None
+_donation_writer_lock = threading.Lock()
+
+class DonationWriter:
+    """This process's group-commit writer thread."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.database = app.config['DATABASE']
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='donation-writer')
+        self.thread.start()
+
+    def submit(self, donation):
+        """Queue a commit_donations() tuple and wait for its batch; returns its transaction ID."""
+        future = Future()
+        self.queue.put((donation, future))
+        timeout = app.config['GROUP_COMMIT_TIMEOUT']
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Withdraw the donation if the writer has not taken it yet
+            withdrawn = future.cancel()
+            app.logger.error('Donation %s not committed after %ss (writer %s, donation %s)', donation[0], timeout,
+                             'alive' if self.thread.is_alive() else 'dead',
+                             'withdrawn' if withdrawn else 'still being committed')
+            if not self.thread.is_alive():
+                get_donation_writer()
+            abort(503)
+
+    def collect(self):
+        """
+        Wait for a donation, then gather the ones arriving within the window behind
+        it. Donations withdrawn by a timed-out request are dropped.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < app.config['GROUP_COMMIT_MAX_BATCH']:
+            try:
+                item = self.queue.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + app.config['GROUP_COMMIT_WINDOW']
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch
+
+    def commit(self, conn, donations):
+        """Commit donations together, or one at a time if that fails. Returns each one's error or None."""
+        started = time.perf_counter()
+        try:
+            commit_donations(conn, donations)
+        except Exception as e:
+            if len(donations) == 1:
+                return [e]
+            app.logger.warning('Group commit of %s donations failed, retrying them one by one: %r',
+                               len(donations), e)
+            return [self.commit(conn, [donation])[0] for donation in donations]
+        record_commit_metrics(len(donations), time.perf_counter() - started)
+        return [None] * len(donations)
+
+    def run(self):
+        conn = None
+        while True:
+            batch = self.collect()
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = connect_db(self.database)
+                    conn.backend.durable(conn)
+                errors = self.commit(conn, [donation for donation, _ in batch])
+            except Exception as e:
+                errors = [e] * len(batch)
+            if any(errors) and conn is not None:
+                # The connection itself may be broken; the next batch gets a new one
+                conn.close()
+                conn = None
+            notify_event_listeners()
+            for (donation, future), error in zip(batch, errors):
+                if error is None:
+                    future.set_result(donation[0])
+                else:
+                    future.set_exception(error)
+
+def get_donation_writer():
+    """
+    Return this process's writer, starting a new one after a gunicorn fork, if
+    it has died, or if DATABASE has changed.
+    """
+    global _donation_writer
+    with _donation_writer_lock:
+        if (_donation_writer is None or _donation_writer.pid != os.getpid()
+                or not _donation_writer.thread.is_alive() or _donation_writer.database != app.config['DATABASE']):
+            _donation_writer = DonationWriter()
+        return _donation_writer
+
+# Live events
+# /events is a server-sent events stream: funding progress of urgent requirements
+# for everyone, and new donations for the signed-in NGO. Writes publish through
+# the storage backend inside their own transaction, so an event goes out exactly
+# when its write commits, whichever worker made it. On PostgreSQL that is NOTIFY;
+# on SQLite the events table stands in for a broker, and writers prune rows older
+# than EVENT_RETENTION. Each process runs one listener thread while it has open
+# streams: it receives every published event (SQLite polls every
+# EVENT_POLL_INTERVAL, and is woken at once by writes made in the same process)
+# and hands it to the process's EventHub. The hub fans events out to the streams
+# and keeps the last EVENT_BUFFER of them, so a reconnecting browser catches up
+# from its Last-Event-ID.
+# Under gunicorn's sync and gthread workers an open stream holds a worker thread,
+# so a process serves at most EVENT_MAX_STREAMS of them. For many listeners run
+# `gunicorn -k gevent --worker-connections 1000`: each stream is then a greenlet
+# parked on its queue, and EVENT_MAX_STREAMS can be raised to match.
+EVENT_BUFFER = 1000
+EVENT_QUEUE_SIZE = 100
+EVENT_RETRY_MS = 3000
+EVENT_LISTEN_TIMEOUT = 5
+
+def publish_events(conn, events):
+    """
+    Publish (channel, event, data) tuples; call inside the write's transaction,
+    then notify_event_listeners() once it has committed.
+    """
+    conn.backend.publish(conn, [(channel, event, json.dumps(data)) for channel, event, data in events],
+                         app.config['EVENT_RETENTION'])
+
+def funding_event(requirement_id, amount_raised, amount_needed, is_active):
+    """An urgent requirement's progress, for everyone watching the list."""
+    return 'urgent', 'funding', {'id': requirement_id, 'amount_raised': amount_raised,
+                                 'amount_needed': amount_needed, 'is_active': bool(is_active)}
+
+def donation_event(ngo_id, donor_email, amount, payment_method, transaction_id):
+    """A completed donation, for the NGO that received it."""
+    return f'ngo:{ngo_id}', 'donation', {
+        'transaction_id': transaction_id, 'donor_email': donor_email, 'amount': amount,
+        'payment_method': payment_method, 'status': 'completed',
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}
+
+class Subscription:
+    """One open stream: the channels it follows and the events waiting to be sent."""
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(EVENT_QUEUE_SIZE)
+        self.closed = False
+
+class EventHub:
+    """This process's open streams and its most recent events, fed by listen_for_events()."""
+    def __init__(self, max_streams):
+        self.pid = os.getpid()
+        self.max_streams = max_streams
+        self.recent = deque(maxlen=EVENT_BUFFER)
+        self._channels = {}
+        self._streams = 0
+        self._cond = threading.Condition()
+        self._listener = None
+        self.listening = threading.Event()
+
+    def subscribe(self, channels, last_id=None):
+        """
+        Open a subscription, or return (None, []) when max_streams are already open.
+        The buffered events after last_id come back with it; the buffer and the
+        subscription are read under one lock, so no event is missed or sent twice.
+        Returns once the listener is receiving, so no event published after the
+        call is missed either.
+        """
+        with self._cond:
+            if self._streams >= self.max_streams:
+                return None, []
+            subscription = Subscription(channels)
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+            self._streams += 1
+            backlog = []
+            if last_id is not None:
+                # Ids are not always in delivery order (see PostgresBackend.publish),
+                # so resume after the client's last event while it is buffered
+                recent = list(self.recent)
+                after = next((i + 1 for i, event in enumerate(recent) if event.id == last_id), None)
+                missed = recent[after:] if after is not None else [event for event in recent if event.id > last_id]
+                backlog = [event for event in missed if event.channel in subscription.channels]
+            self._cond.notify_all()
+            if self._listener is None:
+                self._listener = threading.Thread(target=listen_for_events, args=(self,), daemon=True,
+                                                  name='event-listener')
+                self._listener.start()
+        self.listening.wait(EVENT_LISTEN_TIMEOUT)
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._cond:
+            self._drop(subscription)
+
+    def _drop(self, subscription):
+        if subscription.closed:
+            return
+        subscription.closed = True
+        for channel in subscription.channels:
+            self._channels[channel].discard(subscription)
+        self._streams -= 1
+
+    def publish(self, events):
+        with self._cond:
+            for event in events:
+                self.recent.append(event)
+                for subscription in list(self._channels.get(event.channel, ())):
+                    try:
+                        subscription.queue.put_nowait(event)
+                    except queue.Full:
+                        # A client this far behind is cut off; it reconnects and
+                        # catches up from the buffer
+                        self._drop(subscription)
+
+    def pause(self):
+        """For the listener: True, and no longer counted as listening, if no stream is open."""
+        with self._cond:
+            if self._streams:
+                return False
+            self.listening.clear()
+            return True
+
+    def wait_for_streams(self):
+        with self._cond:
+            while not self._streams:
+                self._cond.wait()
+
+    def stats(self):
+        with self._cond:
+            return {'pid': self.pid, 'streams': self._streams, 'max_streams': self.max_streams,
+                    'buffered': len(self.recent), 'last_event_id': self.recent[-1].id if self.recent else None}
+
+_event_hub = None
+_event_hub_lock = threading.Lock()
+
+def get_event_hub():
+    """Return this process's hub, recreating it after a gunicorn fork."""
+    global _event_hub
+    with _event_hub_lock:
+        if _event_hub is None or _event_hub.pid != os.getpid():
+            _event_hub = EventHub(app.config['EVENT_MAX_STREAMS'])
+        return _event_hub
+
+def notify_event_listeners():
+    """Wake this process's listener after a write that published events has committed."""
+    SQLITE.wakeup.set()
+
+def listen_for_events(hub):
+    """Hand the events published by every process to hub while it has open streams."""
+    conn = position = None
+    while True:
+        if hub.pause():
+            # Stop listening while nobody is: PostgreSQL keeps every notification
+            # until the slowest listening connection has read it
+            if conn is not None:
+                conn.close()
+                conn = None
+            hub.wait_for_streams()
+        try:
+            if conn is None:
+                conn = connect_db()
+                position = conn.backend.listen(conn)
+                hub.listening.set()
+            events, position = conn.backend.receive(conn, position, app.config['EVENT_POLL_INTERVAL'],
+                                                     EVENT_BUFFER)
+        except DATABASE_ERRORS as e:
+            app.logger.warning('Event listener failed: %r', e)
+            hub.listening.clear()
+            if conn is not None:
+                conn.close()
+                conn = None
+            time.sleep(app.config['EVENT_POLL_INTERVAL'])
+            continue
+        if events:
+            hub.publish(events)
+
+def format_event(event):
+    return f'id: {event.id}\nevent: {event.event}\ndata: {event.data}\n\n'
+
+def event_stream(subscription, backlog):
+    """
+    The body of an /events response. A comment goes out every EVENT_HEARTBEAT
+    seconds so proxies keep the connection open and a dead client is noticed,
+    and the stream ends after EVENT_STREAM_LIFETIME so browsers reconnect and
+    spread themselves over the workers again.
+    """
+    yield f'retry: {EVENT_RETRY_MS}\n\n'
+    for event in backlog:
+        yield format_event(event)
+    deadline = time.monotonic() + app.config['EVENT_STREAM_LIFETIME']
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (subscription.closed and subscription.queue.empty()):
+            return
+        try:
+            event = subscription.queue.get(timeout=min(app.config['EVENT_HEARTBEAT'], remaining))
+        except queue.Empty:
+            yield ': keep-alive\n\n'
+            continue
+        yield format_event(event)
+
+@app.route('/event_stats')
+@ops_only
+def event_stats():
+    return jsonify(get_event_hub().stats())
+
+# Donation receipts
+# Every completed donation gets a receipt named after its transaction_id, and
+# every donor a statement per tax year listing what they gave. Receipts are
+# files under RECEIPT_DIR, one per format (HTML, and PDF when reportlab is
+# installed), rendered in a process pool of RECEIPT_WORKERS so the request
+# workers keep their CPU. A year-end run (`flask generate-receipts`) queues
+# 'receipts' jobs that each cover a range of donations or donors, so it is spread
+# over the pool and survives restarts like any other job. An existing file is
+# never rendered again unless forced, which makes repeating a job or a whole run
+# safe. A receipt asked for before any run has made it is rendered on the spot
+# through the same pool.
+RECEIPT_CHUNK = 200   # documents per pool task
+RECEIPT_TYPES = {'html': 'text/html', 'pdf': 'application/pdf'}
+
+RECEIPT_SQL = '''SELECT d.transaction_id, d.donor_email, d.amount, d.payment_method, d.created_at,
+                 n.org_name, n.location, n.email, n.contact_number, n.niti_aayog_id
+                 FROM donations d JOIN ngos n ON n.id = d.ngo_id
+                 WHERE d.status = 'completed' AND {where}'''
+
+_receipt_totals = {'documents': 0, 'written': 0, 'skipped': 0, 'bytes': 0}
+_receipt_totals_lock = threading.Lock()
+
+def receipt_root():
+    return os.path.abspath(app.config['RECEIPT_DIR'])
+
+def receipt_formats():
+    """The configured formats this installation can render."""
+    return [fmt for fmt in app.config['RECEIPT_FORMATS'] if fmt == 'html' or (fmt == 'pdf' and pdf_canvas)]
+
+def receipt_path(kind, year, key):
+    """
+    Path of a receipt under RECEIPT_DIR, without its extension: a donation's is
+    keyed by transaction_id, a statement's by a hash of the donor's email.
+    """
+    if kind == 'annual':
+        key = hashlib.sha256(key.encode()).hexdigest()
+    return f'{kind}/{year}/{key[-2:]}/{key}'
+
+def receipt_documents(kind, year, rows):
+    """
+    Turn ReceiptLine rows into (path, context) pairs for write_receipts(). Rows
+    for statements must be ordered by donor.
+    """
+    if kind == 'donation':
+        return [(receipt_path('donation', row.created_at[:4], row.transaction_id),
+                 {'kind': 'donation', 'donation': row._asdict()}) for row in rows]
+    documents = []
+    for donor_email, lines in itertools.groupby(rows, key=lambda row: row.donor_email):
+        donations = [row._asdict() for row in lines]
+        organizations = {}
+        for donation in donations:
+            org = organizations.setdefault(donation['org_name'], {'org_name': donation['org_name'], 'count': 0,
+                                                                  'niti_aayog_id': donation['niti_aayog_id'],
+                                                                  'total': 0.0})
+            org['count'] += 1
+            org['total'] += donation['amount']
+        path = receipt_path('annual', year, donor_email)
+        documents.append((path, {'kind': 'annual', 'year': year, 'donor_email': donor_email,
+                                 'number': f'{year}-{path.rsplit("/", 1)[1][:12].upper()}',
+                                 'donations': donations, 'total': sum(d['amount'] for d in donations),
+                                 'organizations': sorted(organizations.values(), key=lambda o: -o['total'])}))
+    return documents
+
+def render_receipt_pdf(context):
+    """
+    A plain PDF of a receipt or statement. The standard PDF fonts have no rupee
+    sign, so amounts read 'Rs.'.
+    """
+    buffer = io.BytesIO()
+    # invariant: no creation date or random document ID, so the same receipt is always the same file
+    pdf = pdf_canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+    y = height - 60
+
+    def line(text, size=10, gap=15, bold=False, amount=None):
+        nonlocal y
+        if y < 60:
+            pdf.showPage()
+            y = height - 60
+        pdf.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
+        pdf.drawString(50, y, text)
+        if amount is not None:
+            pdf.drawRightString(width - 50, y, f'Rs. {amount:,.2f}')
+        y -= gap
+
+    if context['kind'] == 'donation':
+        donation = context['donation']
+        pdf.setTitle(f"Donation Receipt {donation['transaction_id']}")
+        line('Donation Receipt', 18, 26, bold=True)
+        line(f"Receipt no. {donation['transaction_id']}  |  {donation['created_at'][:10]}", gap=30)
+        line('Received by', 11, bold=True)
+        line(donation['org_name'])
+        line(donation['location'])
+        line(' | '.join(filter(None, [donation['ngo_email'], donation['contact_number']])))
+        line(f"NITI Aayog Darpan ID: {donation['niti_aayog_id']}", gap=25)
+        line('Donor', 11, bold=True)
+        line(donation['donor_email'], gap=25)
+        line('Amount', 12, bold=True, amount=donation['amount'])
+        line(f"Date: {donation['created_at']}")
+        line(f"Payment method: {donation['payment_method'].upper()}")
+        line(f"Transaction ID: {donation['transaction_id']}", gap=30)
+        line(f"Issued through DonateSecure on behalf of {donation['org_name']}.", 8, 11)
+    else:
+        pdf.setTitle(f"Donation Statement {context['year']}")
+        line(f"Donation Statement {context['year']}", 18, 26, bold=True)
+        line(f"Statement no. {context['number']}  |  1 January to 31 December {context['year']}")
+        line(f"Donor: {context['donor_email']}", gap=30)
+        line('Summary', 11, bold=True)
+        for org in context['organizations']:
+            line(f"{org['org_name']} ({org['niti_aayog_id']}), {org['count']} donations", amount=org['total'])
+        line(f"Total, {len(context['donations'])} donations", bold=True, gap=30, amount=context['total'])
+        line('Donations', 11, bold=True)
+        for donation in context['donations']:
+            line(f"{donation['created_at'][:10]}  {donation['transaction_id']}  {donation['org_name']}",
+                 9, 13, amount=donation['amount'])
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def write_receipts(root, documents, formats, force=False):
+    """
+    Render (path, context) documents into root in each format; existing files are
+    kept unless force is set. Runs in the receipt pool. Returns (documents,
+    files written, files skipped, bytes written).
+    """
+    templates = {'donation': 'receipt.html', 'annual': 'annual_statement.html'}
+    written = skipped = size = 0
+    for path, context in documents:
+        for fmt in formats:
+            target = os.path.join(root, f'{path}.{fmt}')
+            if not force and os.path.exists(target):
+                skipped += 1
+                continue
+            if fmt == 'pdf':
+                data = render_receipt_pdf(context)
+            else:
+                data = app.jinja_env.get_template(templates[context['kind']]).render(context).encode()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_file(target, data)
+            written += 1
+            size += len(data)
+    return len(documents), written, skipped, size
+
+def get_receipt_pool():
+    return bounded_process_pool('receipts', app.config['RECEIPT_WORKERS'])
+
+def render_receipts(documents, force=False):
+    """
+    Render documents in RECEIPT_CHUNK pieces on the receipt pool and wait for
+    them. At most four pieces per worker are queued at once, so a receipt asked
+    for by a donor waits behind a few pieces of a year-end run, not all of it; a
+    piece that cannot be queued within RECEIPT_TIMEOUT raises TimeoutError.
+    Returns (documents, files written, files skipped, bytes written).
+    """
+    root, formats = receipt_root(), receipt_formats()
+    chunks = [documents[i:i + RECEIPT_CHUNK] for i in range(0, len(documents), RECEIPT_CHUNK)]
+    pool = get_receipt_pool()
+    if pool is None:
+        results = [write_receipts(root, chunk, formats, force) for chunk in chunks]
+    else:
+        futures = []
+        try:
+            for chunk in chunks:
+                future = submit_bounded(pool, write_receipts, root, chunk, formats, force,
+                                        timeout=app.config['RECEIPT_TIMEOUT'])
+                if future is None:
+                    raise TimeoutError('receipt pool is busy')
+                futures.append(future)
+            results = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    totals = tuple(map(sum, zip(*results))) if results else (0, 0, 0, 0)
+    with _receipt_totals_lock:
+        for name, value in zip(('documents', 'written', 'skipped', 'bytes'), totals):
+            _receipt_totals[name] += value
+    return totals
+
+def receipt_year_range(year):
+    return f'{year}-01-01', f'{year + 1}-01-01'
+
+@job_handler('receipts')
+def make_receipts(conn, payload):
+    """
+    Render the receipts of the donations with ids first_id..last_id, or the
+    statements of the donors after 'after' up to 'through', for one year.
+    """
+    year, force = payload['year'], payload.get('force', False)
+    start, end = receipt_year_range(year)
+    if payload['kind'] == 'donation':
+        rows = fetch_records(conn.cursor(), ReceiptLine, RECEIPT_SQL.format(
+            where='d.id BETWEEN ? AND ? AND d.created_at >= ? AND d.created_at < ? ORDER BY d.id'),
+            (payload['first_id'], payload['last_id'], start, end))
+    else:
+        rows = fetch_records(conn.cursor(), ReceiptLine, RECEIPT_SQL.format(
+            where='''d.donor_email > ? AND d.donor_email <= ? AND d.created_at >= ? AND d.created_at < ?
+                     ORDER BY d.donor_email, d.created_at, d.id'''),
+            (payload['after'], payload['through'], start, end))
+    render_receipts(receipt_documents(payload['kind'], year, rows), force)
+
+def enqueue_receipt_jobs(conn, year, kinds, batch_size, force=False):
+    """
+    Queue 'receipts' jobs covering a year's donations (batch_size ids per job)
+    and donors (a tenth as many per job, since each has several donations) on
+    conn; the caller commits. Returns the number of jobs queued.
+    """
+    start, end = receipt_year_range(year)
+    queued = 0
+    if 'donation' in kinds:
+        first, last = conn.execute('SELECT MIN(id), MAX(id) FROM donations WHERE created_at >= ? AND created_at < ?',
+                                   (start, end)).fetchone()
+        for low in range(first, last + 1, batch_size) if first is not None else ():
+            enqueue_job(conn, 'receipts', {'kind': 'donation', 'year': year, 'first_id': low,
+                                           'last_id': min(low + batch_size - 1, last), 'force': force})
+            queued += 1
+    if 'annual' in kinds:
+        donors = [row[0] for row in conn.execute('''SELECT DISTINCT donor_email FROM donations
+                                                    WHERE created_at >= ? AND created_at < ?
+                                                    ORDER BY donor_email''', (start, end))]
+        per_job = max(1, batch_size // 10)
+        for i in range(0, len(donors), per_job):
+            enqueue_job(conn, 'receipts', {'kind': 'annual', 'year': year, 'after': donors[i - 1] if i else '',
+                                           'through': donors[min(i + per_job, len(donors)) - 1], 'force': force})
+            queued += 1
+    return queued
+
+def send_receipt(path, fmt, documents):
+    """
+    Serve the receipt at path in fmt, first rendering it from documents() when
+    no run has made it yet. A full pool answers 503 rather than queue the donor.
+    """
+    name = f'{path}.{fmt}'
+    if not os.path.exists(os.path.join(receipt_root(), name)):
+        try:
+            render_receipts(documents())
+        except TimeoutError:
+            abort(503)
+    response = send_from_directory(os.path.abspath(receipt_root()), name, mimetype=RECEIPT_TYPES[fmt],
+                                   as_attachment=fmt == 'pdf', download_name=os.path.basename(name))
+    # Receipts are personal, but a browser may keep and revalidate them
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.cli.command('generate-receipts')
+@click.option('--year', type=int, default=lambda: date.today().year - 1, show_default='last year')
+@click.option('--kind', type=click.Choice(['all', 'donation', 'annual']), default='all', show_default=True)
+@click.option('--batch-size', default=5000, show_default=True, help='Donation ids per job.')
+@click.option('--force', is_flag=True, help='Render receipts again even where they exist.')
+@click.option('--enqueue-only', is_flag=True, help='Only queue the jobs, for `flask run-jobs` workers.')
+def generate_receipts_command(year, kind, batch_size, force, enqueue_only):
+    """Year-end run: receipts for a year's completed donations and a statement for each donor."""
+    conn = connect_db()
+    queued = enqueue_receipt_jobs(conn, year, ('donation', 'annual') if kind == 'all' else (kind,),
+                                  batch_size, force)
+    conn.commit()
+    conn.close()
+    if enqueue_only:
+        print(f"Queued {queued} receipt jobs for {year}; run `flask run-jobs` to render them")
+        return
+    started = time.perf_counter()
+    # Two job threads, so one reads its rows while the pool renders the other's
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(work_jobs(burst=True))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    failed = sum(f for _, f in results)
+    totals = _receipt_totals
+    print(f"{sum(d for d, _ in results)} jobs ({failed} failed) in {elapsed:.1f}s on "
+          f"{app.config['RECEIPT_WORKERS'] or 'no'} workers, formats {','.join(receipt_formats())}")
+    print(f"  {totals['documents']:,} documents, {totals['documents'] / elapsed:,.0f}/s; "
+          f"{totals['written']:,} files written ({totals['bytes'] / 1e6:,.1f} MB), "
+          f"{totals['skipped']:,} already there")
+    if failed:
+        raise SystemExit(1)
+
+# Money usage
+# NGOs record what they spent, optionally against one donation. An expenditure
+# may not exceed the NGO's balance (completed donations minus what it has already
+# recorded) nor, when tied to a donation, what is left of that donation. The
+# checks and the insert share one write transaction, locked per NGO, so two
+# concurrent entries cannot overdraw the same balance.
+UTILIZATION_PERIODS = {'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m', 'year': '%Y'}
+
+def fund_balance(c, ngo_id):
+    """(received, used, balance) for one NGO from its running totals."""
+    c.execute('''SELECT COALESCE((SELECT completed_amount FROM ngo_stats WHERE ngo_id = ?), 0),
+                        COALESCE((SELECT used_amount FROM ngo_usage_stats WHERE ngo_id = ?), 0)''',
+              (ngo_id, ngo_id))
+    received, used = c.fetchone()
+    return round(received, 2), round(used, 2), round(received - used, 2)
+
+def record_money_usage(conn, ngo_id, description, amount, transaction_id=None, receipt_path=None):
+    """
+    Record an expenditure and return its id. Raises ValueError, with a message
+    fit for the user, when the entry is invalid or would overdraw a balance.
+    """
+    description = (description or '').strip()
+    if not description:
+        raise ValueError('Describe what the money was spent on.')
+    try:
+        amount = round(float(amount), 2)
+    except (TypeError, ValueError):
+        raise ValueError('Enter the amount spent as a number.')
+    if not amount > 0:
+        raise ValueError('Amount must be positive.')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.backend.lock(conn, f'money_usage:{ngo_id}')
+        c = conn.cursor()
+        donation_id = None
+        if transaction_id:
+            c.execute('''SELECT id, amount FROM donations
+                         WHERE transaction_id = ? AND ngo_id = ? AND status = 'completed' ''',
+                      (str(transaction_id).strip(), ngo_id))
+            donation = c.fetchone()
+            if not donation:
+                raise ValueError('No completed donation to this NGO has that transaction ID.')
+            donation_id = donation[0]
+            c.execute('SELECT COALESCE(SUM(amount_used), 0) FROM money_usage WHERE donation_id = ?',
+                      (donation_id,))
+            remaining = round(donation[1] - c.fetchone()[0], 2)
+            if amount > remaining:
+                raise ValueError(f'Only ₹{remaining:,.2f} of that donation is unspent.')
+        balance = fund_balance(c, ngo_id)[2]
+        if amount > balance:
+            raise ValueError(f'Only ₹{balance:,.2f} of received donations is unspent.')
+        c.execute('''INSERT INTO money_usage (donation_id, ngo_id, description, amount_used, receipt_path)
+                     VALUES (?, ?, ?, ?, ?)''', (donation_id, ngo_id, description, amount, receipt_path))
+        usage_id = c.lastrowid
+        queue_thumbnails(conn, receipt_path)
+        invalidate_tags(conn, 'usage')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return usage_id
+
+def utilization_report(c, ngo_id, period='month', start=None, end=None):
+    """
+    Money received and spent per period (day, week, month or year) between the
+    start and end dates, from the daily rollups. Each period also carries its
+    utilization (spent / received) and the balance at its close.
+    """
+    where, params = '', [ngo_id]
+    if start:
+        where += ' AND day >= ?'
+        params.append(start.isoformat())
+    if end:
+        where += ' AND day <= ?'
+        params.append(end.isoformat())
+    balance = 0
+    if start:
+        c.execute('''SELECT COALESCE(SUM(received_amount - used_amount), 0) FROM ngo_daily_stats
+                     WHERE ngo_id = ? AND day < ?''', (ngo_id, start.isoformat()))
+        balance = c.fetchone()[0]
+    c.execute(f'''SELECT strftime(?, day) AS period, SUM(received_amount), SUM(donation_count),
+                         SUM(used_amount), SUM(usage_count)
+                  FROM ngo_daily_stats WHERE ngo_id = ? {where}
+                  GROUP BY period ORDER BY period''', [UTILIZATION_PERIODS[period]] + params)
+    report = []
+    for label, received, donations, used, expenses in c.fetchall():
+        balance += received - used
+        report.append(UtilizationPeriod(label, round(received, 2), donations, round(used, 2), expenses,
+                                        round(used / received, 4) if received else None, round(balance, 2)))
+    return report
+
+def months_back(today, months):
+    """First day of the month `months` before today's."""
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
 # Routes
 @app.route('/')
+@conditional('stories', 'urgent')
 def index():
-    conn = sqlite3.connect('donation_platform.db')
-    c = conn.cursor()
+    conn = get_db()
     
-    # Get featured stories
-    c.execute('''SELECT s.title, s.content, n.org_name, s.created_at 
-                FROM stories s 
-                JOIN ngos n ON s.ngo_id = n.id 
-                WHERE s.is_approved = TRUE 
-                ORDER BY s.created_at DESC LIMIT 3''')
-    stories = c.fetchall()
-    
-    # Get urgent requirements
-    c.execute('''SELECT ur.title, ur.description, ur.amount_needed, ur.amount_raised, n.org_name 
-                FROM urgent_requirements ur 
-                JOIN ngos n ON ur.ngo_id = n.id 
-                WHERE ur.is_active = TRUE 
-                ORDER BY ur.deadline ASC LIMIT 3''')
-    urgent_reqs = c.fetchall()
+    def featured():
+        c = conn.cursor()
+        # Latest stories and the most pressing urgent requirements
+        return [fetch_stories_page(c, limit=3)[0], fetch_urgent_page(c, limit=3)[0]]
     
-    conn.close()
-    
-    return render_template('index.html', stories=stories, urgent_requirements=urgent_reqs)
+    # The shared cache hands back plain lists, so rebuild the records by position
+    stories, urgent_reqs = cached('index_featured', ['stories', 'urgent'], featured)
+    return render_template('index.html', stories=[StoryCard._make(row) for row in stories],
+                           urgent_requirements=[UrgentCard._make(row) for row in urgent_reqs])
 
 @app.route('/choose_role')
 def choose_role():
@@ -200,9 +2804,9 @@ def process_register():
     user_type = request.form['user_type']
     
     # Hash password
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
     try:
@@ -222,11 +2826,9 @@ def process_register():
         else:
             return redirect(url_for('donor_dashboard'))
             
-    except sqlite3.IntegrityError:
+    except INTEGRITY_ERRORS:
         flash('Email already exists!')
         return redirect(url_for('register', role=user_type))
-    finally:
-        conn.close()
 
 @app.route('/login')
 def login():
@@ -237,13 +2839,19 @@ def process_login():
     email = request.form['email']
     password = request.form['password']
     
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
+    keys = login_throttle_keys(email)
+    retry_after = login_retry_after(conn, keys)
+    if retry_after:
+        flash(f'Too many failed login attempts. Please try again in {int(retry_after // 60) + 1} minutes.')
+        return redirect(url_for('login'))
+    
     c = conn.cursor()
     c.execute('SELECT id, password, user_type FROM users WHERE email = ?', (email,))
     user = c.fetchone()
-    conn.close()
     
-    if user and check_password_hash(user[1], password):
+    if user and verify_password(user[0], user[1], password):
+        clear_login_failures(conn, email)
         session['user_id'] = user[0]
         session['email'] = email
         session['user_type'] = user[2]
@@ -255,6 +2863,7 @@ def process_login():
         else:
             return redirect(url_for('donor_dashboard'))
     else:
+        record_login_failure(conn, keys)
         flash('Invalid email or password!')
         return redirect(url_for('login'))
 
@@ -284,36 +2893,100 @@ def process_ngo_registration():
     upi_id = request.form.get('upi_id', '')
     niti_aayog_id = request.form['niti_aayog_id']
     
-    # Verify NITI Aayog ID (simplified - in real implementation, call actual API)
-    is_verified = verify_niti_aayog_id(niti_aayog_id, org_name)
-    
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
+    try:
+        qr_code_path = save_upload(request.files.get('qr_code'))
+        tax_certificate_path = save_upload(request.files.get('tax_certificate'), DOCUMENT_TYPES)
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('ngo_registration'))
+    
+    # Reuse a recent NITI Aayog result; otherwise verify in the background
+    is_verified = cached_niti_verification(conn, niti_aayog_id)
+    
     c.execute('''INSERT INTO ngos (user_id, org_name, location, contact_number, email, 
-                website, bank_name, account_number, upi_id, niti_aayog_id, is_verified) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                website, bank_name, account_number, upi_id, qr_code_path, niti_aayog_id,
+                tax_certificate_path, is_verified) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
              (session['user_id'], org_name, location, contact_number, email,
-              website, bank_name, account_number, upi_id, niti_aayog_id, is_verified))
+              website, bank_name, account_number, upi_id, qr_code_path, niti_aayog_id,
+              tax_certificate_path, bool(is_verified)))
+    if is_verified is None:
+        enqueue_job(conn, 'verify_ngos', {'ngo_ids': [c.lastrowid]})
+    queue_thumbnails(conn, qr_code_path, tax_certificate_path)
     
     conn.commit()
-    conn.close()
+    notify_job_workers()
     
-    if is_verified:
+    if is_verified is None:
+        flash('NGO registered! NITI Aayog verification is in progress.')
+    elif is_verified:
         flash('NGO registered and verified successfully!')
     else:
         flash('NGO registered but verification failed. Please contact support.')
     
     return redirect(url_for('ngo_dashboard'))
 
-def verify_niti_aayog_id(niti_id, org_name):
+def verify_niti_aayog_id(niti_id, org_name, http=None):
+    """
+    Check an NGO's NITI Aayog (NGO Darpan) ID.
+    With NITI_AAYOG_API_URL set this calls GET <url>?id=<niti_id>&name=<org_name>,
+    which must answer {"verified": true|false}; otherwise it falls back to the
+    simplified offline check.
+    """
+    url = app.config['NITI_AAYOG_API_URL']
+    if not url:
+        # Mock verification logic
+        if len(niti_id) >= 10 and niti_id.replace('/', '').replace('\\', '').isalnum():
+            return True
+        return False
+    response = (http or requests).get(url, params={'id': niti_id, 'name': org_name},
+                                      timeout=app.config['NITI_AAYOG_TIMEOUT'])
+    response.raise_for_status()
+    return bool(response.json().get('verified'))
+
+def cached_niti_verification(conn, niti_id):
+    """Return a verification result younger than NITI_CACHE_TTL, or None."""
+    row = conn.execute('SELECT is_verified FROM niti_verifications WHERE niti_aayog_id = ? AND checked_at > ?',
+                       (niti_id, time.time() - app.config['NITI_CACHE_TTL'])).fetchone()
+    return None if row is None else bool(row[0])
+
+@job_handler('verify_ngos')
+def verify_ngos_job(conn, payload):
     """
-    Simplified verification - in real implementation, this would call NITI Aayog API
+    Verify a batch of NGOs over one HTTP session and update their is_verified flag.
+    Each result is committed as soon as it is known, so a retry after a network
+    error only repeats the NGOs that were not reached.
     """
-    # Mock verification logic
-    if len(niti_id) >= 10 and niti_id.replace('/', '').replace('\\', '').isalnum():
-        return True
-    return False
+    placeholders = ', '.join('?' * len(payload['ngo_ids']))
+    ngos = conn.execute(f'SELECT id, niti_aayog_id, org_name FROM ngos WHERE id IN ({placeholders})',
+                        payload['ngo_ids']).fetchall()
+    with requests.Session() as http:
+        for ngo_id, niti_id, org_name in ngos:
+            is_verified = None if payload.get('force') else cached_niti_verification(conn, niti_id)
+            if is_verified is None:
+                is_verified = verify_niti_aayog_id(niti_id, org_name, http)
+                conn.execute('''INSERT INTO niti_verifications (niti_aayog_id, is_verified, checked_at) VALUES (?, ?, ?)
+                                ON CONFLICT (niti_aayog_id) DO UPDATE SET is_verified = excluded.is_verified,
+                                                                          checked_at = excluded.checked_at''',
+                             (niti_id, is_verified, time.time()))
+            conn.execute('UPDATE ngos SET is_verified = ? WHERE id = ?', (is_verified, ngo_id))
+            conn.commit()
+
+@app.cli.command('reverify-ngos')
+@click.option('--batch-size', default=100, show_default=True)
+@click.option('--force', is_flag=True, help='Ignore cached verification results.')
+def reverify_ngos_command(batch_size, force):
+    """Queue NITI Aayog re-verification of every registered NGO."""
+    conn = connect_db()
+    ngo_ids = [row[0] for row in conn.execute('SELECT id FROM ngos ORDER BY id')]
+    for start in range(0, len(ngo_ids), batch_size):
+        enqueue_job(conn, 'verify_ngos', {'ngo_ids': ngo_ids[start:start + batch_size], 'force': force})
+    conn.commit()
+    conn.close()
+    print(f"Queued {len(ngo_ids)} NGOs in {-(-len(ngo_ids) // batch_size)} jobs; run them with 'flask run-jobs'")
 
 @app.route('/donor_dashboard')
 @login_required
@@ -322,17 +2995,28 @@ def donor_dashboard():
         flash('Access denied!')
         return redirect(url_for('index'))
         
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
+    q, location = request.args.get('q', '').strip(), request.args.get('location', '')
+    cursor, limit = decode_cursor(request.args.get('cursor')), page_size()
     
-    # Get all verified NGOs
-    c.execute('''SELECT id, org_name, location, website, 
-                (SELECT COUNT(*) FROM donations WHERE ngo_id = ngos.id AND status = 'completed') as donation_count
-                FROM ngos WHERE is_verified = TRUE''')
-    ngos = c.fetchall()
+    # Verified NGOs, one page at a time; a search goes through the search index
+    if q:
+        rows, next_cursor = fetch_search_page(c, search_terms(q, location), ['ngo'], cursor, limit)
+        ids = [row.ref_id for row in rows]
+        found = {ngo.id: ngo for ngo in fetch_records(c, NgoCard, f'''SELECT n.id, n.org_name, n.location, n.website,
+                    COALESCE(s.completed_count, 0) as donation_count
+                    FROM ngos n LEFT JOIN ngo_stats s ON s.ngo_id = n.id
+                    WHERE n.id IN ({', '.join('?' * len(ids))})''', ids)} if ids else {}
+        ngos = [found[ngo_id] for ngo_id in ids if ngo_id in found]
+    else:
+        ngos, next_cursor = fetch_ngos_page(c, location, cursor, limit)
     
-    conn.close()
-    return render_template('donor_dashboard.html', ngos=ngos)
+    c.execute('SELECT DISTINCT location FROM ngos WHERE is_verified = TRUE ORDER BY location')
+    locations = [row[0] for row in c.fetchall()]
+    
+    return render_template('donor_dashboard.html', ngos=ngos, next_cursor=next_cursor,
+                           locations=locations, q=q, location=location)
 
 @app.route('/ngo_dashboard')
 @login_required
@@ -341,52 +3025,74 @@ def ngo_dashboard():
         flash('Access denied!')
         return redirect(url_for('index'))
         
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
     # Get NGO details
-    c.execute('SELECT * FROM ngos WHERE user_id = ?', (session['user_id'],))
-    ngo = c.fetchone()
+    ngo = fetch_record(c, NgoAccount, '''SELECT id, org_name, location, email, is_verified
+                                         FROM ngos WHERE user_id = ?''', (session['user_id'],))
     
     if not ngo:
         return redirect(url_for('ngo_registration'))
     
-    # Get donations received
-    c.execute('''SELECT donor_email, amount, created_at, status 
-                FROM donations WHERE ngo_id = ? ORDER BY created_at DESC''', (ngo[0],))
-    donations = c.fetchall()
+    # Donation totals, maintained by the donations triggers
+    c.execute('''SELECT total_amount, donation_count, completed_amount, completed_count, last_donation_at
+                FROM ngo_stats WHERE ngo_id = ?''', (ngo.id,))
+    row = c.fetchone() or (0, 0, 0, 0, None)
+    stats = dict(zip(('total_amount', 'donation_count', 'completed_amount',
+                      'completed_count', 'last_donation_at'), row))
+    stats['received'], stats['used'], stats['balance'] = fund_balance(c, ngo.id)
+    payment_totals = fetch_records(c, PaymentTotal, '''SELECT payment_method, total_amount, donation_count
+                FROM ngo_payment_stats
+                WHERE ngo_id = ? AND donation_count > 0 ORDER BY total_amount DESC''', (ngo.id,))
+    
+    # Recent donations, paged with ?cursor=
+    donations, next_cursor = fetch_donations_page(c, ngo.id, decode_cursor(request.args.get('cursor')),
+                                                  DASHBOARD_DONATIONS)
     
     # Get stories count
-    c.execute('SELECT COUNT(*) FROM stories WHERE ngo_id = ?', (ngo[0],))
+    c.execute('SELECT COUNT(*) FROM stories WHERE ngo_id = ?', (ngo.id,))
     stories_count = c.fetchone()[0]
     
     # Get urgent requirements count  
-    c.execute('SELECT COUNT(*) FROM urgent_requirements WHERE ngo_id = ? AND is_active = TRUE', (ngo[0],))
+    c.execute('SELECT COUNT(*) FROM urgent_requirements WHERE ngo_id = ? AND is_active = TRUE', (ngo.id,))
     urgent_count = c.fetchone()[0]
     
-    conn.close()
-    return render_template('ngo_dashboard.html', ngo=ngo, donations=donations, 
-                         stories_count=stories_count, urgent_count=urgent_count)
+    # Recorded expenditure, paged with ?usage_cursor=, and the last year by month
+    expenses, next_usage_cursor = fetch_usage_page(c, ngo.id, decode_cursor(request.args.get('usage_cursor')),
+                                                   DASHBOARD_DONATIONS)
+    utilization = utilization_report(c, ngo.id, 'month', months_back(date.today(), 11))
+    
+    return render_template('ngo_dashboard.html', ngo=ngo, donations=donations, stats=stats,
+                         payment_totals=payment_totals, next_cursor=next_cursor,
+                         stories_count=stories_count, urgent_count=urgent_count,
+                         expenses=expenses, next_usage_cursor=next_usage_cursor, utilization=utilization)
 
 @app.route('/ngo_details/<int:ngo_id>')
 @login_required
 def ngo_details(ngo_id):
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
-    c.execute('SELECT * FROM ngos WHERE id = ? AND is_verified = TRUE', (ngo_id,))
-    ngo = c.fetchone()
+    ngo = fetch_record(c, NgoProfile, '''SELECT id, org_name, location, contact_number, email, website, bank_name,
+                                         account_number, upi_id, qr_code_path, niti_aayog_id, tax_certificate_path
+                                         FROM ngos WHERE id = ? AND is_verified = TRUE''', (ngo_id,))
     
     if not ngo:
         flash('NGO not found or not verified!')
         return redirect(url_for('donor_dashboard'))
     
     # Get NGO's stories
-    c.execute('SELECT title, content, created_at FROM stories WHERE ngo_id = ? AND is_approved = TRUE', (ngo_id,))
-    stories = c.fetchall()
+    stories = fetch_records(c, NgoStory, '''SELECT title, content, created_at, image_path
+                                         FROM stories WHERE ngo_id = ? AND is_approved = TRUE''', (ngo_id,))
     
-    conn.close()
-    return render_template('ngo_details.html', ngo=ngo, stories=stories)
+    # How the donations have been spent
+    received, used, balance = fund_balance(c, ngo_id)
+    expenses = fetch_usage_page(c, ngo_id, limit=DASHBOARD_DONATIONS)[0]
+    utilization = utilization_report(c, ngo_id, 'month', months_back(date.today(), 11))
+    
+    return render_template('ngo_details.html', ngo=ngo, stories=stories, funds=dict(received=received, used=used,
+                           balance=balance), expenses=expenses, utilization=utilization)
 
 @app.route('/donate/<int:ngo_id>')
 @login_required
@@ -395,17 +3101,23 @@ def donate(ngo_id):
         flash('Only donors can make donations!')
         return redirect(url_for('login'))
         
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
-    c.execute('SELECT * FROM ngos WHERE id = ? AND is_verified = TRUE', (ngo_id,))
-    ngo = c.fetchone()
-    conn.close()
+    ngo = fetch_record(c, NgoContact, '''SELECT id, org_name, location, contact_number, email, qr_code_path
+                                         FROM ngos WHERE id = ? AND is_verified = TRUE''', (ngo_id,))
     
     if not ngo:
         flash('NGO not found!')
         return redirect(url_for('donor_dashboard'))
     
-    return render_template('donate.html', ngo=ngo)
+    # Donating from an urgent requirement attributes the money to it
+    requirement = None
+    if request.args.get('requirement'):
+        requirement = fetch_record(c, RequirementSummary, '''SELECT id, title, amount_needed, amount_raised
+                    FROM urgent_requirements WHERE id = ? AND ngo_id = ? AND is_active = TRUE''',
+                    (request.args.get('requirement', type=int), ngo_id))
+    
+    return render_template('donate.html', ngo=ngo, requirement=requirement)
 
 @app.route('/process_donation', methods=['POST'])
 @login_required
@@ -414,26 +3126,72 @@ def process_donation():
         flash('Only donors can make donations!')
         return redirect(url_for('login'))
         
-    ngo_id = request.form['ngo_id']
-    amount = float(request.form['amount'])
+    ngo_id = request.form.get('ngo_id', type=int)
+    amount = request.form.get('amount')
     payment_method = request.form['payment_method']
+    urgent_requirement_id = request.form.get('urgent_requirement_id', type=int)
     
-    # Generate unique transaction ID
-    transaction_id = hashlib.md5(f"{session['email']}{ngo_id}{amount}{datetime.now()}".encode()).hexdigest()
-    
-    conn = sqlite3.connect('donation_platform.db')
-    c = conn.cursor()
-    
-    c.execute('''INSERT INTO donations (donor_email, ngo_id, amount, payment_method, transaction_id, status) 
-                VALUES (?, ?, ?, ?, ?, ?)''',
-             (session['email'], ngo_id, amount, payment_method, transaction_id, 'completed'))
-    
-    conn.commit()
-    conn.close()
+    try:
+        transaction_id = record_donation(get_db(), session['email'], ngo_id, amount, payment_method,
+                                         urgent_requirement_id)
+    except ValueError as e:
+        flash(str(e))
+        if ngo_id is None:
+            return redirect(url_for('donor_dashboard'))
+        return redirect(url_for('donate', ngo_id=ngo_id, requirement=urgent_requirement_id))
+    amount = float(amount)
     
-    flash(f'Donation of ₹{amount} completed successfully! Transaction ID: {transaction_id}')
+    flash(f'Donation of ₹{amount} completed successfully! Transaction ID: {transaction_id}. '
+          'Your receipt is under My Receipts.')
     return redirect(url_for('donor_dashboard'))
 
+@app.route('/receipts')
+@login_required
+def receipts():
+    if session['user_type'] != 'donor':
+        flash('Only donors have donation receipts!')
+        return redirect(url_for('index'))
+    conn = get_db()
+    c = conn.cursor()
+    this_year = date.today().year
+    first = c.execute('SELECT MIN(created_at) FROM donations WHERE donor_email = ?', (session['email'],)).fetchone()[0]
+    years = list(range(this_year, int(first[:4]) - 1, -1)) if first else []
+    year = request.args.get('year', years[0] if years else this_year, type=int)
+    donations, next_cursor = fetch_donor_donations_page(c, session['email'], year,
+                                                        decode_cursor(request.args.get('cursor')), page_size())
+    return render_template('receipts.html', years=years, year=year, donations=donations, next_cursor=next_cursor,
+                           formats=receipt_formats(), statement_ready=year < this_year)
+
+@app.route('/receipts/<transaction_id>')
+@login_required
+def donation_receipt(transaction_id):
+    """A donation's receipt, for the donor who made it."""
+    fmt = request.args.get('format', 'html')
+    if fmt not in receipt_formats():
+        abort(404)
+    row = fetch_record(get_db().cursor(), ReceiptLine, RECEIPT_SQL.format(where='d.transaction_id = ?'),
+                       (transaction_id,))
+    if row is None or row.donor_email != session['email']:
+        abort(404)
+    return send_receipt(receipt_path('donation', row.created_at[:4], row.transaction_id), fmt,
+                        lambda: receipt_documents('donation', None, [row]))
+
+@app.route('/receipts/annual/<int:year>')
+@login_required
+def annual_statement(year):
+    """The signed-in donor's statement for a past calendar year."""
+    fmt = request.args.get('format', 'html')
+    if fmt not in receipt_formats() or year >= date.today().year:
+        abort(404)
+    start, end = receipt_year_range(year)
+    rows = fetch_records(get_db().cursor(), ReceiptLine, RECEIPT_SQL.format(
+        where='d.donor_email = ? AND d.created_at >= ? AND d.created_at < ? ORDER BY d.created_at, d.id'),
+        (session['email'], start, end))
+    if not rows:
+        abort(404)
+    return send_receipt(receipt_path('annual', year, session['email']), fmt,
+                        lambda: receipt_documents('annual', year, rows))
+
 @app.route('/add_story')
 @login_required
 def add_story():
@@ -452,7 +3210,7 @@ def process_story():
     title = request.form['title']
     content = request.form['content']
     
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
     # Get NGO ID
@@ -460,14 +3218,21 @@ def process_story():
     ngo = c.fetchone()
     
     if ngo:
-        c.execute('INSERT INTO stories (ngo_id, title, content, is_approved) VALUES (?, ?, ?, ?)',
-                 (ngo[0], title, content, True))  # Auto-approve for demo
+        try:
+            image_path = save_upload(request.files.get('image'))
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('add_story'))
+        c.execute('INSERT INTO stories (ngo_id, title, content, image_path, is_approved) VALUES (?, ?, ?, ?, ?)',
+                 (ngo[0], title, content, image_path, True))  # Auto-approve for demo
+        queue_thumbnails(conn, image_path)
+        invalidate_tags(conn, 'stories')
         conn.commit()
+        notify_job_workers()
         flash('Story submitted successfully!')
     else:
         flash('Please complete your NGO registration first.')
     
-    conn.close()
     return redirect(url_for('ngo_dashboard'))
 
 @app.route('/add_urgent_requirement')
@@ -490,7 +3255,7 @@ def process_urgent_requirement():
     amount_needed = float(request.form['amount_needed'])
     deadline = request.form['deadline'] if request.form['deadline'] else None
     
-    conn = sqlite3.connect('donation_platform.db')
+    conn = get_db()
     c = conn.cursor()
     
     # Get NGO ID
@@ -501,14 +3266,42 @@ def process_urgent_requirement():
         c.execute('''INSERT INTO urgent_requirements (ngo_id, title, description, amount_needed, deadline) 
                     VALUES (?, ?, ?, ?, ?)''',
                  (ngo[0], title, description, amount_needed, deadline))
+        invalidate_tags(conn, 'urgent')
         conn.commit()
         flash('Urgent requirement posted successfully!')
     else:
         flash('Please complete your NGO registration first.')
     
-    conn.close()
     return redirect(url_for('ngo_dashboard'))
 
+@app.route('/process_money_usage', methods=['POST'])
+@login_required
+def process_money_usage():
+    if session['user_type'] != 'receiver':
+        flash('Only NGOs can record expenditure!')
+        return redirect(url_for('index'))
+    
+    conn = get_db()
+    c = conn.cursor()
+    
+    # Get NGO ID
+    c.execute('SELECT id FROM ngos WHERE user_id = ?', (session['user_id'],))
+    ngo = c.fetchone()
+    
+    if ngo:
+        try:
+            receipt_path = save_upload(request.files.get('receipt'), DOCUMENT_TYPES)
+            record_money_usage(conn, ngo[0], request.form.get('description'), request.form.get('amount_used'),
+                               request.form.get('transaction_id'), receipt_path)
+            notify_job_workers()
+            flash('Expenditure recorded successfully!')
+        except ValueError as e:
+            flash(str(e))
+    else:
+        flash('Please complete your NGO registration first.')
+    
+    return redirect(url_for('ngo_dashboard', _anchor='utilization'))
+
 @app.route('/logout')
 def logout():
     session.clear()
@@ -525,47 +3318,179 @@ def contact():
 
 
 @app.route('/stories')
+@conditional('stories')
 def stories():
-    conn = sqlite3.connect("donation_platform.db")
-    c = conn.cursor()
-    c.execute('''SELECT s.title, s.content, n.org_name, s.created_at
-                 FROM stories s
-                 JOIN ngos n ON s.ngo_id = n.id
-                 WHERE s.is_approved = TRUE
-                 ORDER BY s.created_at DESC''')
-    stories = c.fetchall()  # list of tuples
-    conn.close()
-    return render_template('stories.html', stories=stories)
-
+    cursor, limit = request.args.get('cursor'), page_size()
+    
+    def render_list():
+        stories, next_cursor = fetch_stories_page(get_db().cursor(), decode_cursor(cursor), limit)
+        return render_template('stories_list.html', stories=stories, next_cursor=next_cursor)
+    
+    stories_list = cached(f'stories_list.html:{cursor}:{limit}', ['stories'], render_list)
+    return render_template('stories.html', stories_list=stories_list)
 
+@app.route('/api/stories')
+@conditional('stories')
+def api_stories():
+    conn = get_db()
+    c = conn.cursor()
+    rows, next_cursor = fetch_stories_page(c, decode_cursor(request.args.get('cursor')), page_size())
+    items = [{'id': row.id, 'title': row.title, 'content': row.content, 'org_name': row.org_name,
+              'created_at': row.created_at,
+              'image_url': upload_url(row.image_path, 960) if row.image_path else None}
+             for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
 
 @app.route('/urgent_requirements')
+@conditional('urgent')
 def urgent_requirements():
-    conn = sqlite3.connect('donation_platform.db')
+    cursor, limit = request.args.get('cursor'), page_size()
+    
+    def render_list():
+        requirements, next_cursor = fetch_urgent_page(get_db().cursor(), decode_cursor(cursor), limit)
+        return render_template('urgent_requirements_list.html', requirements=requirements,
+                               next_cursor=next_cursor)
+    
+    requirements_list = cached(f'urgent_requirements_list.html:{cursor}:{limit}',
+                               ['urgent'], render_list)
+    return render_template('urgent_requirements.html', requirements_list=requirements_list)
+
+@app.route('/api/urgent_requirements')
+@conditional('urgent')
+def api_urgent_requirements():
+    conn = get_db()
     c = conn.cursor()
-    c.execute('''SELECT ur.id, ur.title, ur.description, ur.amount_needed, ur.amount_raised, 
-                 ur.deadline, n.org_name, n.id as ngo_id
-                 FROM urgent_requirements ur 
-                 JOIN ngos n ON ur.ngo_id = n.id 
-                 WHERE ur.is_active = TRUE 
-                 ORDER BY ur.deadline ASC''')
-    rows = c.fetchall()
-    conn.close()
-    # List of dicts for Jinja attribute access
-    requirements = [
-        {
-            'id': row[0],
-            'title': row[1],
-            'description': row[2],
-            'amount_needed': row[3],
-            'amount_raised': row[4],
-            'deadline': row[5],
-            'org_name': row[6],
-            'ngo_id': row[7]
-        }
-        for row in rows
-    ]
-    return render_template('urgent_requirements.html', requirements=requirements)
+    rows, next_cursor = fetch_urgent_page(c, decode_cursor(request.args.get('cursor')), page_size())
+    items = [row._asdict() for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
+
+@app.route('/events')
+def events():
+    """
+    Server-sent events: 'funding' for every urgent requirement and, for a signed-in
+    NGO, 'donation' for each donation it receives.
+    """
+    channels = ['urgent']
+    if session.get('user_type') == 'receiver':
+        ngo = get_db().execute('SELECT id FROM ngos WHERE user_id = ?', (session['user_id'],)).fetchone()
+        if ngo:
+            channels.append(f'ngo:{ngo[0]}')
+    hub = get_event_hub()
+    subscription, backlog = hub.subscribe(channels, request.headers.get('Last-Event-ID', type=int))
+    if subscription is None:
+        response = make_response('Too many open event streams', 503)
+        response.headers['Retry-After'] = '30'
+        return response
+    # The stream needs no request context, so the request's connection is back in the pool
+    # before the first event is sent
+    response = app.response_class(event_stream(subscription, backlog), mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    return response
+
+def receiver_only():
+    if session['user_type'] != 'receiver':
+        abort(403)
+
+@app.route('/api/donations')
+@login_required
+@conditional('donations', validate=receiver_only)
+def api_donations():
+    conn = get_db()
+    c = conn.cursor()
+    c.execute('SELECT id FROM ngos WHERE user_id = ?', (session['user_id'],))
+    ngo = c.fetchone()
+    if not ngo:
+        abort(404)
+    rows, next_cursor = fetch_donations_page(c, ngo[0], decode_cursor(request.args.get('cursor')), page_size())
+    items = [row._asdict() for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
+
+@app.route('/api/money_usage', methods=['POST'])
+@login_required
+def api_record_money_usage():
+    if session['user_type'] != 'receiver':
+        abort(403)
+    conn = get_db()
+    ngo = conn.execute('SELECT id FROM ngos WHERE user_id = ?', (session['user_id'],)).fetchone()
+    if not ngo:
+        abort(404)
+    data = request.get_json(silent=True) or request.form
+    try:
+        # A receipt comes as a multipart file or as the key from POST /api/uploads
+        receipt_path = save_upload(request.files.get('receipt'), DOCUMENT_TYPES) or upload_key(data.get('receipt'))
+        usage_id = record_money_usage(conn, ngo[0], data.get('description'), data.get('amount_used'),
+                                      data.get('transaction_id'), receipt_path)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    notify_job_workers()
+    received, used, balance = fund_balance(conn.cursor(), ngo[0])
+    return jsonify(id=usage_id, received=received, used=used, balance=balance), 201
+
+def verified_ngo_id(ngo_id):
+    if not get_db().execute('SELECT 1 FROM ngos WHERE id = ? AND is_verified = TRUE', (ngo_id,)).fetchone():
+        abort(404)
+    return ngo_id
+
+@app.route('/api/ngos/<int:ngo_id>/money_usage')
+@conditional('usage', validate=verified_ngo_id)
+def api_money_usage(ngo_id):
+    c = get_db().cursor()
+    rows, next_cursor = fetch_usage_page(c, ngo_id, decode_cursor(request.args.get('cursor')), page_size())
+    items = [{'id': row.id, 'description': row.description, 'amount_used': row.amount_used,
+              'created_at': row.created_at, 'transaction_id': row.transaction_id,
+              'receipt_url': upload_url(row.receipt_path) if row.receipt_path else None}
+             for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
+
+def utilization_args():
+    """The period, start and end of a utilization request; 400 when malformed."""
+    period = request.args.get('period', 'month')
+    if period not in UTILIZATION_PERIODS:
+        abort(400)
+    try:
+        return period, parse_export_date(request.args.get('start')), parse_export_date(request.args.get('end'))
+    except ValueError:
+        abort(400)
+
+def check_utilization(ngo_id):
+    utilization_args()
+    verified_ngo_id(ngo_id)
+
+@app.route('/api/ngos/<int:ngo_id>/utilization')
+@conditional('donations', 'usage', validate=check_utilization)
+def api_utilization(ngo_id):
+    period, start, end = utilization_args()
+    c = get_db().cursor()
+    received, used, balance = fund_balance(c, ngo_id)
+    return jsonify(ngo_id=ngo_id, received=received, used=used, balance=balance, period=period,
+                   periods=[row._asdict() for row in utilization_report(c, ngo_id, period, start, end)])
+
+def search_results():
+    """Run the current request's search; returns (query, rows, next_cursor)."""
+    kinds = [kind for kind in request.args.getlist('type') if kind in SEARCH_KINDS]
+    query = search_terms(request.args.get('q'), request.args.get('location'))
+    if not query:
+        return None, [], None
+    # Search pages on the numeric rank
+    rows, next_cursor = fetch_search_page(get_db().cursor(), query, kinds,
+                                          decode_cursor(request.args.get('cursor'), (int, float)), page_size())
+    return query, rows, next_cursor
+
+@app.route('/search')
+def search():
+    query, results, next_cursor = search_results()
+    return render_template('search.html', results=results, next_cursor=next_cursor, searched=bool(query))
+
+@app.route('/api/search')
+def api_search():
+    query, rows, next_cursor = search_results()
+    if not query:
+        abort(400)
+    items = [{'type': row.kind, 'id': row.ref_id, 'title': row.title, 'snippet': str(highlight(row.snippet)),
+              'org_name': row.org_name, 'location': row.location, 'ngo_id': row.ngo_id}
+             for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
 
 # Error handlers
 @app.errorhandler(404)
@@ -578,8 +3503,7 @@ def internal_error(error):
 
 if __name__ == '__main__':
     # Create uploads directory
-    os.makedirs('static', exist_ok=True)
-    os.makedirs('static/uploads', exist_ok=True)
+    os.makedirs(app.config['UPLOAD_DIR'], exist_ok=True)
     
     # Initialize database
     init_db()
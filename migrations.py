@@ -0,0 +1,781 @@
+# Schema
+# The migration lists of both backends and migrate(), which applies them, with
+# the triggers that keep the derived tables (NGO aggregates, fund utilization and
+# the search index) in step and the functions that rebuild them from scratch.
+# NGO donation aggregates
+# ngo_stats / ngo_payment_stats hold running totals per NGO so the dashboards read
+# one row instead of the whole donation history. Triggers on donations keep them
+# in the same transaction as the write; rebuild_ngo_stats() recomputes from scratch.
+_NGO_STATS_ADD = '''
+        INSERT INTO ngo_stats (ngo_id, total_amount, donation_count, completed_amount,
+                               completed_count, last_donation_at)
+        SELECT NEW.ngo_id, NEW.amount, 1,
+               CASE WHEN NEW.status = 'completed' THEN NEW.amount ELSE 0 END,
+               NEW.status = 'completed', NEW.created_at
+        WHERE NEW.ngo_id IS NOT NULL
+        ON CONFLICT (ngo_id) DO UPDATE SET
+            total_amount = total_amount + excluded.total_amount,
+            donation_count = donation_count + 1,
+            completed_amount = completed_amount + excluded.completed_amount,
+            completed_count = completed_count + excluded.completed_count,
+            last_donation_at = CASE WHEN last_donation_at IS NULL
+                                      OR excluded.last_donation_at > last_donation_at
+                                    THEN excluded.last_donation_at ELSE last_donation_at END;
+        INSERT INTO ngo_payment_stats (ngo_id, payment_method, total_amount, donation_count)
+        SELECT NEW.ngo_id, NEW.payment_method, NEW.amount, 1
+        WHERE NEW.ngo_id IS NOT NULL
+        ON CONFLICT (ngo_id, payment_method) DO UPDATE SET
+            total_amount = total_amount + excluded.total_amount,
+            donation_count = donation_count + 1;
+'''
+
+_NGO_STATS_SUBTRACT = '''
+        UPDATE ngo_stats SET
+            total_amount = total_amount - OLD.amount,
+            donation_count = donation_count - 1,
+            completed_amount = completed_amount - CASE WHEN OLD.status = 'completed' THEN OLD.amount ELSE 0 END,
+            completed_count = completed_count - (OLD.status = 'completed'),
+            last_donation_at = (SELECT MAX(created_at) FROM donations WHERE ngo_id = OLD.ngo_id)
+        WHERE ngo_id = OLD.ngo_id;
+        UPDATE ngo_payment_stats SET
+            total_amount = total_amount - OLD.amount,
+            donation_count = donation_count - 1
+        WHERE ngo_id = OLD.ngo_id AND payment_method = OLD.payment_method;
+'''
+
+_NGO_STATS_QUERY = '''SELECT ngo_id, SUM(amount) AS total_amount, COUNT(*) AS donation_count,
+                             SUM(CASE WHEN status = 'completed' THEN amount ELSE 0 END) AS completed_amount,
+                             SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS completed_count,
+                             MAX(created_at) AS last_donation_at
+                      FROM donations WHERE ngo_id IS NOT NULL GROUP BY ngo_id'''
+
+_NGO_PAYMENT_STATS_QUERY = '''SELECT ngo_id, payment_method, SUM(amount) AS total_amount,
+                                     COUNT(*) AS donation_count
+                              FROM donations WHERE ngo_id IS NOT NULL
+                              GROUP BY ngo_id, payment_method'''
+
+def rebuild_ngo_stats(conn):
+    """Recompute the NGO aggregate tables from the donations table."""
+    conn.execute('DELETE FROM ngo_stats')
+    conn.execute('DELETE FROM ngo_payment_stats')
+    conn.execute('INSERT INTO ngo_stats ' + _NGO_STATS_QUERY)
+    conn.execute('INSERT INTO ngo_payment_stats ' + _NGO_PAYMENT_STATS_QUERY)
+
+def verify_ngo_stats(conn):
+    """Return the NGO ids whose stored aggregates disagree with the donations and money_usage tables."""
+    drifted = set()
+    for table, query, columns, live in (
+        ('ngo_stats', _NGO_STATS_QUERY,
+         'ngo_id, ROUND(total_amount, 2), donation_count, ROUND(completed_amount, 2), completed_count',
+         'donation_count > 0'),
+        ('ngo_payment_stats', _NGO_PAYMENT_STATS_QUERY,
+         'ngo_id, payment_method, ROUND(total_amount, 2), donation_count', 'donation_count > 0'),
+        ('ngo_usage_stats', _USAGE_STATS_QUERY, 'ngo_id, ROUND(used_amount, 2), usage_count', 'usage_count > 0'),
+        ('ngo_daily_stats', _DAILY_STATS_QUERY,
+         'ngo_id, day, ROUND(received_amount, 2), donation_count, ROUND(used_amount, 2), usage_count',
+         'donation_count > 0 OR usage_count > 0'),
+    ):
+        expected = f'SELECT {columns} FROM ({query}) AS expected'
+        stored = f'SELECT {columns} FROM {table} WHERE {live}'
+        for sql in (f'{expected} EXCEPT {stored}', f'{stored} EXCEPT {expected}'):
+            drifted.update(row[0] for row in conn.execute(sql))
+    return sorted(drifted)
+
+# Fund utilization
+# ngo_usage_stats holds each NGO's running total of recorded expenditure, so its
+# balance is completed_amount - used_amount from two single-row reads.
+# ngo_daily_stats rolls donations received and money spent up per NGO and day;
+# utilization reports group those rows by period instead of scanning years of
+# donations. Both are kept by triggers; rebuild_fund_utilization() recomputes them.
+_USAGE_STATS_ADD = '''
+        INSERT INTO ngo_usage_stats (ngo_id, used_amount, usage_count, last_used_at)
+        SELECT NEW.ngo_id, NEW.amount_used, 1, NEW.created_at
+        WHERE NEW.ngo_id IS NOT NULL
+        ON CONFLICT (ngo_id) DO UPDATE SET
+            used_amount = used_amount + excluded.used_amount,
+            usage_count = usage_count + 1,
+            last_used_at = CASE WHEN last_used_at IS NULL OR excluded.last_used_at > last_used_at
+                                THEN excluded.last_used_at ELSE last_used_at END;
+        INSERT INTO ngo_daily_stats (ngo_id, day, received_amount, donation_count, used_amount, usage_count)
+        SELECT NEW.ngo_id, date(NEW.created_at), 0, 0, NEW.amount_used, 1
+        WHERE NEW.ngo_id IS NOT NULL
+        ON CONFLICT (ngo_id, day) DO UPDATE SET
+            used_amount = used_amount + excluded.used_amount,
+            usage_count = usage_count + 1;
+'''
+
+_USAGE_STATS_SUBTRACT = '''
+        UPDATE ngo_usage_stats SET
+            used_amount = used_amount - OLD.amount_used,
+            usage_count = usage_count - 1,
+            last_used_at = (SELECT MAX(created_at) FROM money_usage WHERE ngo_id = OLD.ngo_id)
+        WHERE ngo_id = OLD.ngo_id;
+        UPDATE ngo_daily_stats SET
+            used_amount = used_amount - OLD.amount_used,
+            usage_count = usage_count - 1
+        WHERE ngo_id = OLD.ngo_id AND day = date(OLD.created_at);
+'''
+
+_DAILY_RECEIVED_ADD = '''
+        INSERT INTO ngo_daily_stats (ngo_id, day, received_amount, donation_count, used_amount, usage_count)
+        SELECT NEW.ngo_id, date(NEW.created_at), NEW.amount, 1, 0, 0
+        WHERE NEW.ngo_id IS NOT NULL AND NEW.status = 'completed'
+        ON CONFLICT (ngo_id, day) DO UPDATE SET
+            received_amount = received_amount + excluded.received_amount,
+            donation_count = donation_count + 1;
+'''
+
+_DAILY_RECEIVED_SUBTRACT = '''
+        UPDATE ngo_daily_stats SET
+            received_amount = received_amount - OLD.amount,
+            donation_count = donation_count - 1
+        WHERE OLD.status = 'completed' AND ngo_id = OLD.ngo_id AND day = date(OLD.created_at);
+'''
+
+_USAGE_STATS_QUERY = '''SELECT ngo_id, SUM(amount_used) AS used_amount, COUNT(*) AS usage_count,
+                               MAX(created_at) AS last_used_at
+                        FROM money_usage WHERE ngo_id IS NOT NULL GROUP BY ngo_id'''
+
+_DAILY_STATS_QUERY = '''SELECT ngo_id, day, SUM(received_amount) AS received_amount,
+                               SUM(donation_count) AS donation_count, SUM(used_amount) AS used_amount,
+                               SUM(usage_count) AS usage_count
+                        FROM (SELECT ngo_id, substr(created_at, 1, 10) AS day, amount AS received_amount,
+                                     1 AS donation_count, 0 AS used_amount, 0 AS usage_count
+                              FROM donations WHERE ngo_id IS NOT NULL AND status = 'completed'
+                              UNION ALL
+                              SELECT ngo_id, substr(created_at, 1, 10), 0, 0, amount_used, 1
+                              FROM money_usage WHERE ngo_id IS NOT NULL) AS entries
+                        GROUP BY ngo_id, day'''
+
+def rebuild_fund_utilization(conn):
+    """Recompute the expenditure totals and daily rollups from donations and money_usage."""
+    conn.execute('DELETE FROM ngo_usage_stats')
+    conn.execute('DELETE FROM ngo_daily_stats')
+    conn.execute('INSERT INTO ngo_usage_stats ' + _USAGE_STATS_QUERY)
+    conn.execute('INSERT INTO ngo_daily_stats ' + _DAILY_STATS_QUERY)
+
+# Search index
+# search_index is an FTS5 table over NGOs, stories and urgent requirements kept
+# in step by triggers on the source tables. Each document's rowid is derived from
+# its source row (id * 4 + kind), so triggers replace a document by rowid without
+# a lookup. Visibility (verified, approved, active) is checked against the source
+# tables at query time, so status changes need no reindexing. On PostgreSQL it is
+# a plain table with a weighted tsvector column under a GIN index, keyed by doc_id.
+SEARCH_KINDS = {'ngo': 1, 'story': 2, 'urgent': 3}
+
+_SEARCH_DOCUMENTS = {
+    'ngo': '''SELECT {id} * 4 + 1, 'ngo', {id}, {row}.org_name, '', {row}.location''',
+    'story': '''SELECT {id} * 4 + 2, 'story', {id}, {row}.title, {row}.content,
+                       (SELECT location FROM ngos WHERE id = {row}.ngo_id)''',
+    'urgent': '''SELECT {id} * 4 + 3, 'urgent', {id}, {row}.title, {row}.description,
+                        (SELECT location FROM ngos WHERE id = {row}.ngo_id)''',
+}
+
+_SEARCH_TABLES = {'ngo': 'ngos', 'story': 'stories', 'urgent': 'urgent_requirements'}
+_SEARCH_COLUMNS = {'ngo': 'org_name, location', 'story': 'ngo_id, title, content',
+                   'urgent': 'ngo_id, title, description'}
+
+def _search_triggers():
+    sql = []
+    insert = 'INSERT INTO search_index (rowid, kind, ref_id, title, body, location) '
+    for kind, table in _SEARCH_TABLES.items():
+        code = SEARCH_KINDS[kind]
+        add = insert + _SEARCH_DOCUMENTS[kind].format(id='NEW.id', row='NEW') + ';'
+        remove = f'DELETE FROM search_index WHERE rowid = OLD.id * 4 + {code};'
+        sql += [
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {add} END',
+            f'CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {remove} END',
+            f'''CREATE TRIGGER IF NOT EXISTS {table}_search_update
+            AFTER UPDATE OF {_SEARCH_COLUMNS[kind]} ON {table} BEGIN {remove} {add} END''',
+        ]
+    # Stories and requirements carry their NGO's location
+    sql.append('''CREATE TRIGGER IF NOT EXISTS ngos_search_location AFTER UPDATE OF location ON ngos
+        BEGIN
+            UPDATE search_index SET location = NEW.location
+            WHERE rowid IN (SELECT id * 4 + 2 FROM stories WHERE ngo_id = NEW.id
+                            UNION ALL SELECT id * 4 + 3 FROM urgent_requirements WHERE ngo_id = NEW.id);
+        END''')
+    return sql
+
+def rebuild_search_index(conn):
+    """Repopulate the search index from the source tables."""
+    conn.execute('DELETE FROM search_index')
+    for kind, table in _SEARCH_TABLES.items():
+        conn.execute(f'INSERT INTO search_index ({conn.backend.search_key}, kind, ref_id, title, body, location) '
+                     + _SEARCH_DOCUMENTS[kind].format(id='t.id', row='t') + f' FROM {table} t')
+    conn.backend.optimize_search_index(conn)
+
+# Schema migrations
+# Applied in order and tracked with PRAGMA user_version (the schema_version table
+# on PostgreSQL). Never edit a migration that has shipped; append a new one
+# instead. A step is either a SQL string or a callable taking the connection.
+MIGRATIONS = [
+    # 1: initial schema
+    [
+        # Users table (for both donors and receivers)
+        '''CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            user_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+
+        # NGOs table
+        '''CREATE TABLE IF NOT EXISTS ngos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            org_name TEXT NOT NULL,
+            location TEXT NOT NULL,
+            contact_number TEXT NOT NULL,
+            email TEXT NOT NULL,
+            website TEXT,
+            bank_name TEXT NOT NULL,
+            account_number TEXT NOT NULL,
+            upi_id TEXT,
+            qr_code_path TEXT,
+            niti_aayog_id TEXT NOT NULL,
+            tax_certificate_path TEXT,
+            is_verified BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )''',
+
+        # Donations table
+        '''CREATE TABLE IF NOT EXISTS donations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            donor_email TEXT NOT NULL,
+            ngo_id INTEGER,
+            amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            transaction_id TEXT UNIQUE NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+
+        # Stories table
+        '''CREATE TABLE IF NOT EXISTS stories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ngo_id INTEGER,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            image_path TEXT,
+            is_approved BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+
+        # Urgent requirements table
+        '''CREATE TABLE IF NOT EXISTS urgent_requirements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ngo_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            amount_needed REAL NOT NULL,
+            amount_raised REAL DEFAULT 0,
+            deadline DATE,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+
+        # Money usage tracking
+        '''CREATE TABLE IF NOT EXISTS money_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            donation_id INTEGER,
+            ngo_id INTEGER,
+            description TEXT NOT NULL,
+            amount_used REAL NOT NULL,
+            receipt_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (donation_id) REFERENCES donations (id),
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+    ],
+    # 2: indexes for the hot query paths
+    [
+        'CREATE INDEX IF NOT EXISTS idx_donations_ngo_status_created ON donations (ngo_id, status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_stories_approved_created ON stories (is_approved, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_stories_ngo ON stories (ngo_id, is_approved)',
+        'CREATE INDEX IF NOT EXISTS idx_urgent_active_deadline ON urgent_requirements (is_active, deadline)',
+        'CREATE INDEX IF NOT EXISTS idx_urgent_ngo_active ON urgent_requirements (ngo_id, is_active)',
+        'CREATE INDEX IF NOT EXISTS idx_ngos_user ON ngos (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_ngos_verified ON ngos (is_verified)',
+    ],
+    # 3: incrementally maintained per-NGO donation aggregates
+    [
+        '''CREATE TABLE IF NOT EXISTS ngo_stats (
+            ngo_id INTEGER PRIMARY KEY,
+            total_amount REAL NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            completed_amount REAL NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            last_donation_at TIMESTAMP,
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS ngo_payment_stats (
+            ngo_id INTEGER NOT NULL,
+            payment_method TEXT NOT NULL,
+            total_amount REAL NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ngo_id, payment_method)
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS donations_stats_insert AFTER INSERT ON donations
+        BEGIN''' + _NGO_STATS_ADD + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS donations_stats_delete AFTER DELETE ON donations
+        BEGIN''' + _NGO_STATS_SUBTRACT + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS donations_stats_update
+        AFTER UPDATE OF ngo_id, amount, payment_method, status, created_at ON donations
+        BEGIN''' + _NGO_STATS_SUBTRACT + _NGO_STATS_ADD + 'END',
+        rebuild_ngo_stats,
+    ],
+    # 4: keyset pagination over an NGO's donations
+    [
+        'CREATE INDEX IF NOT EXISTS idx_donations_ngo_created ON donations (ngo_id, created_at)',
+    ],
+    # 5: cache invalidation tags
+    [
+        '''CREATE TABLE IF NOT EXISTS cache_tags (
+            tag TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )''',
+    ],
+    # 6: modification times for Last-Modified validators
+    [
+        'ALTER TABLE cache_tags ADD COLUMN updated_at TIMESTAMP',
+    ],
+    # 7: background jobs and the NITI Aayog verification cache
+    [
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at REAL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)',
+        '''CREATE TABLE IF NOT EXISTS niti_verifications (
+            niti_aayog_id TEXT PRIMARY KEY,
+            is_verified BOOLEAN NOT NULL,
+            checked_at REAL NOT NULL
+        )''',
+    ],
+    # 8: donations can fund a specific urgent requirement
+    [
+        'ALTER TABLE donations ADD COLUMN urgent_requirement_id INTEGER REFERENCES urgent_requirements (id)',
+    ],
+    # 9: date-ordered money usage per NGO for exports
+    [
+        'CREATE INDEX IF NOT EXISTS idx_money_usage_ngo_created ON money_usage (ngo_id, created_at)',
+    ],
+    # 10: full-text search
+    [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5 (
+            kind UNINDEXED,
+            ref_id UNINDEXED,
+            title,
+            body,
+            location,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )''',
+        # Title matches outrank location, which outranks body text
+        "INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(0, 0, 10.0, 1.0, 4.0)')",
+        *_search_triggers(),
+        rebuild_search_index,
+        'CREATE INDEX IF NOT EXISTS idx_ngos_verified_name ON ngos (is_verified, org_name)',
+    ],
+    # 11: failed login counters for throttling
+    [
+        '''CREATE TABLE IF NOT EXISTS login_failures (
+            key TEXT PRIMARY KEY,
+            failures INTEGER NOT NULL,
+            window_start REAL NOT NULL
+        )''',
+    ],
+    # 12: expenditure totals and daily rollups for fund utilization
+    [
+        '''CREATE TABLE IF NOT EXISTS ngo_usage_stats (
+            ngo_id INTEGER PRIMARY KEY,
+            used_amount REAL NOT NULL DEFAULT 0,
+            usage_count INTEGER NOT NULL DEFAULT 0,
+            last_used_at TIMESTAMP,
+            FOREIGN KEY (ngo_id) REFERENCES ngos (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS ngo_daily_stats (
+            ngo_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            received_amount REAL NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            used_amount REAL NOT NULL DEFAULT 0,
+            usage_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ngo_id, day)
+        ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS money_usage_stats_insert AFTER INSERT ON money_usage
+        BEGIN''' + _USAGE_STATS_ADD + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS money_usage_stats_delete AFTER DELETE ON money_usage
+        BEGIN''' + _USAGE_STATS_SUBTRACT + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS money_usage_stats_update
+        AFTER UPDATE OF ngo_id, amount_used, created_at ON money_usage
+        BEGIN''' + _USAGE_STATS_SUBTRACT + _USAGE_STATS_ADD + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS donations_daily_insert AFTER INSERT ON donations
+        BEGIN''' + _DAILY_RECEIVED_ADD + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS donations_daily_delete AFTER DELETE ON donations
+        BEGIN''' + _DAILY_RECEIVED_SUBTRACT + 'END',
+        '''CREATE TRIGGER IF NOT EXISTS donations_daily_update
+        AFTER UPDATE OF ngo_id, amount, status, created_at ON donations
+        BEGIN''' + _DAILY_RECEIVED_SUBTRACT + _DAILY_RECEIVED_ADD + 'END',
+        rebuild_fund_utilization,
+        # Amount already spent from one donation
+        'CREATE INDEX IF NOT EXISTS idx_money_usage_donation ON money_usage (donation_id)',
+    ],
+    # 13: live events for /events streams
+    [
+        # AUTOINCREMENT: ids are never reused after pruning, so listeners can read past the last one seen
+        '''CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            event TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_events_created ON events (created_at)',
+    ],
+    # 14: a donor's donations by date, for receipts and yearly statements
+    [
+        'CREATE INDEX IF NOT EXISTS idx_donations_donor_created ON donations (donor_email, created_at)',
+    ],
+]
+
+# PostgreSQL has its own migration list, tracked in the schema_version table.
+# Version 1 is the whole schema as of SQLite version 12; from here on a schema
+# change is appended to both lists. The triggers do what the SQLite ones do, and
+# ROUND(double, int) and strftime() cover the SQLite functions shared queries use.
+_PG_NOW = "to_char(CURRENT_TIMESTAMP AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+_PG_DONATIONS_STATS = '''
+CREATE OR REPLACE FUNCTION donations_stats() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE ngo_stats SET
+            total_amount = total_amount - OLD.amount,
+            donation_count = donation_count - 1,
+            completed_amount = completed_amount - CASE WHEN OLD.status = 'completed' THEN OLD.amount ELSE 0 END,
+            completed_count = completed_count - CASE WHEN OLD.status = 'completed' THEN 1 ELSE 0 END,
+            last_donation_at = (SELECT MAX(created_at) FROM donations WHERE ngo_id = OLD.ngo_id)
+        WHERE ngo_id = OLD.ngo_id;
+        UPDATE ngo_payment_stats SET
+            total_amount = total_amount - OLD.amount,
+            donation_count = donation_count - 1
+        WHERE ngo_id = OLD.ngo_id AND payment_method = OLD.payment_method;
+        UPDATE ngo_daily_stats SET
+            received_amount = received_amount - OLD.amount,
+            donation_count = donation_count - 1
+        WHERE OLD.status = 'completed' AND ngo_id = OLD.ngo_id AND day = substr(OLD.created_at, 1, 10);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.ngo_id IS NOT NULL THEN
+        INSERT INTO ngo_stats AS s (ngo_id, total_amount, donation_count, completed_amount,
+                                    completed_count, last_donation_at)
+        VALUES (NEW.ngo_id, NEW.amount, 1, CASE WHEN NEW.status = 'completed' THEN NEW.amount ELSE 0 END,
+                CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END, NEW.created_at)
+        ON CONFLICT (ngo_id) DO UPDATE SET
+            total_amount = s.total_amount + excluded.total_amount,
+            donation_count = s.donation_count + 1,
+            completed_amount = s.completed_amount + excluded.completed_amount,
+            completed_count = s.completed_count + excluded.completed_count,
+            last_donation_at = GREATEST(s.last_donation_at, excluded.last_donation_at);
+        INSERT INTO ngo_payment_stats AS s (ngo_id, payment_method, total_amount, donation_count)
+        VALUES (NEW.ngo_id, NEW.payment_method, NEW.amount, 1)
+        ON CONFLICT (ngo_id, payment_method) DO UPDATE SET
+            total_amount = s.total_amount + excluded.total_amount,
+            donation_count = s.donation_count + 1;
+        IF NEW.status = 'completed' THEN
+            INSERT INTO ngo_daily_stats AS s (ngo_id, day, received_amount, donation_count, used_amount, usage_count)
+            VALUES (NEW.ngo_id, substr(NEW.created_at, 1, 10), NEW.amount, 1, 0, 0)
+            ON CONFLICT (ngo_id, day) DO UPDATE SET
+                received_amount = s.received_amount + excluded.received_amount,
+                donation_count = s.donation_count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$'''
+
+_PG_MONEY_USAGE_STATS = '''
+CREATE OR REPLACE FUNCTION money_usage_stats() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE ngo_usage_stats SET
+            used_amount = used_amount - OLD.amount_used,
+            usage_count = usage_count - 1,
+            last_used_at = (SELECT MAX(created_at) FROM money_usage WHERE ngo_id = OLD.ngo_id)
+        WHERE ngo_id = OLD.ngo_id;
+        UPDATE ngo_daily_stats SET
+            used_amount = used_amount - OLD.amount_used,
+            usage_count = usage_count - 1
+        WHERE ngo_id = OLD.ngo_id AND day = substr(OLD.created_at, 1, 10);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.ngo_id IS NOT NULL THEN
+        INSERT INTO ngo_usage_stats AS s (ngo_id, used_amount, usage_count, last_used_at)
+        VALUES (NEW.ngo_id, NEW.amount_used, 1, NEW.created_at)
+        ON CONFLICT (ngo_id) DO UPDATE SET
+            used_amount = s.used_amount + excluded.used_amount,
+            usage_count = s.usage_count + 1,
+            last_used_at = GREATEST(s.last_used_at, excluded.last_used_at);
+        INSERT INTO ngo_daily_stats AS s (ngo_id, day, received_amount, donation_count, used_amount, usage_count)
+        VALUES (NEW.ngo_id, substr(NEW.created_at, 1, 10), 0, 0, NEW.amount_used, 1)
+        ON CONFLICT (ngo_id, day) DO UPDATE SET
+            used_amount = s.used_amount + excluded.used_amount,
+            usage_count = s.usage_count + 1;
+    END IF;
+    RETURN NULL;
+END
+$$'''
+
+def _postgres_search_triggers():
+    sql = []
+    insert = 'INSERT INTO search_index (doc_id, kind, ref_id, title, body, location) '
+    for kind, table in _SEARCH_TABLES.items():
+        code = SEARCH_KINDS[kind]
+        add = insert + _SEARCH_DOCUMENTS[kind].format(id='NEW.id', row='NEW') + ';'
+        extra = ''
+        if kind == 'ngo':
+            # Stories and requirements carry their NGO's location
+            extra = '''
+    IF TG_OP = 'UPDATE' AND NEW.location IS DISTINCT FROM OLD.location THEN
+        UPDATE search_index SET location = NEW.location
+        WHERE doc_id IN (SELECT id * 4 + 2 FROM stories WHERE ngo_id = NEW.id
+                         UNION ALL SELECT id * 4 + 3 FROM urgent_requirements WHERE ngo_id = NEW.id);
+    END IF;'''
+        sql += [
+            f'''CREATE OR REPLACE FUNCTION {table}_search() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        DELETE FROM search_index WHERE doc_id = OLD.id * 4 + {code};
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        {add}
+    END IF;{extra}
+    RETURN NULL;
+END
+$$''',
+            f'''CREATE TRIGGER {table}_search AFTER INSERT OR DELETE OR UPDATE OF {_SEARCH_COLUMNS[kind]}
+            ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_search()''',
+        ]
+    return sql
+
+POSTGRES_MIGRATIONS = [
+    # 1: schema as of SQLite version 12
+    [
+        '''CREATE OR REPLACE FUNCTION round(value DOUBLE PRECISION, digits INTEGER) RETURNS DOUBLE PRECISION
+        LANGUAGE sql IMMUTABLE AS $$ SELECT round(value::numeric, digits)::double precision $$''',
+        # The %Y, %m, %d and %W (Monday-based week of the year) of SQLite's strftime()
+        '''CREATE OR REPLACE FUNCTION strftime(format TEXT, day TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT replace(replace(replace(replace(format,
+                '%Y', to_char(day::date, 'YYYY')), '%m', to_char(day::date, 'MM')), '%d', to_char(day::date, 'DD')),
+                '%W', lpad(((extract(doy FROM day::date)::int + 7 - extract(isodow FROM day::date)::int) / 7)::text,
+                           2, '0'))
+        $$''',
+        f'''CREATE TABLE users (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            user_type TEXT NOT NULL,
+            created_at TEXT DEFAULT {_PG_NOW}
+        )''',
+        f'''CREATE TABLE ngos (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id BIGINT REFERENCES users (id),
+            org_name TEXT NOT NULL,
+            location TEXT NOT NULL,
+            contact_number TEXT NOT NULL,
+            email TEXT NOT NULL,
+            website TEXT,
+            bank_name TEXT NOT NULL,
+            account_number TEXT NOT NULL,
+            upi_id TEXT,
+            qr_code_path TEXT,
+            niti_aayog_id TEXT NOT NULL,
+            tax_certificate_path TEXT,
+            is_verified BOOLEAN DEFAULT FALSE,
+            created_at TEXT DEFAULT {_PG_NOW}
+        )''',
+        f'''CREATE TABLE urgent_requirements (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            ngo_id BIGINT REFERENCES ngos (id),
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            amount_needed DOUBLE PRECISION NOT NULL,
+            amount_raised DOUBLE PRECISION DEFAULT 0,
+            deadline TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TEXT DEFAULT {_PG_NOW}
+        )''',
+        f'''CREATE TABLE donations (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            donor_email TEXT NOT NULL,
+            ngo_id BIGINT REFERENCES ngos (id),
+            amount DOUBLE PRECISION NOT NULL,
+            payment_method TEXT NOT NULL,
+            transaction_id TEXT UNIQUE NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT DEFAULT {_PG_NOW},
+            urgent_requirement_id BIGINT REFERENCES urgent_requirements (id) DEFERRABLE INITIALLY DEFERRED
+        )''',
+        f'''CREATE TABLE stories (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            ngo_id BIGINT REFERENCES ngos (id),
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            image_path TEXT,
+            is_approved BOOLEAN DEFAULT FALSE,
+            created_at TEXT DEFAULT {_PG_NOW}
+        )''',
+        f'''CREATE TABLE money_usage (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            donation_id BIGINT REFERENCES donations (id),
+            ngo_id BIGINT REFERENCES ngos (id),
+            description TEXT NOT NULL,
+            amount_used DOUBLE PRECISION NOT NULL,
+            receipt_path TEXT,
+            created_at TEXT DEFAULT {_PG_NOW}
+        )''',
+        '''CREATE TABLE ngo_stats (
+            ngo_id BIGINT PRIMARY KEY REFERENCES ngos (id),
+            total_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            completed_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            last_donation_at TEXT
+        )''',
+        '''CREATE TABLE ngo_payment_stats (
+            ngo_id BIGINT NOT NULL,
+            payment_method TEXT NOT NULL,
+            total_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ngo_id, payment_method)
+        )''',
+        '''CREATE TABLE ngo_usage_stats (
+            ngo_id BIGINT PRIMARY KEY REFERENCES ngos (id),
+            used_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            usage_count INTEGER NOT NULL DEFAULT 0,
+            last_used_at TEXT
+        )''',
+        '''CREATE TABLE ngo_daily_stats (
+            ngo_id BIGINT NOT NULL,
+            day TEXT NOT NULL,
+            received_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            donation_count INTEGER NOT NULL DEFAULT 0,
+            used_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+            usage_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (ngo_id, day)
+        )''',
+        '''CREATE TABLE cache_tags (
+            tag TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )''',
+        f'''CREATE TABLE jobs (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after DOUBLE PRECISION NOT NULL,
+            last_error TEXT,
+            created_at TEXT DEFAULT {_PG_NOW},
+            updated_at DOUBLE PRECISION
+        )''',
+        '''CREATE TABLE niti_verifications (
+            niti_aayog_id TEXT PRIMARY KEY,
+            is_verified BOOLEAN NOT NULL,
+            checked_at DOUBLE PRECISION NOT NULL
+        )''',
+        '''CREATE TABLE login_failures (
+            key TEXT PRIMARY KEY,
+            failures INTEGER NOT NULL,
+            window_start DOUBLE PRECISION NOT NULL
+        )''',
+        # Title matches outrank location, which outranks body text
+        '''CREATE TABLE search_index (
+            doc_id BIGINT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            ref_id BIGINT NOT NULL,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            location TEXT,
+            document TSVECTOR GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', title), 'A')
+                || setweight(to_tsvector('simple', COALESCE(location, '')), 'B')
+                || setweight(to_tsvector('simple', body), 'D')) STORED
+        )''',
+        'CREATE INDEX idx_search_index_document ON search_index USING GIN (document)',
+        'CREATE INDEX idx_donations_ngo_status_created ON donations (ngo_id, status, created_at)',
+        'CREATE INDEX idx_donations_ngo_created ON donations (ngo_id, created_at)',
+        'CREATE INDEX idx_stories_approved_created ON stories (is_approved, created_at)',
+        'CREATE INDEX idx_stories_ngo ON stories (ngo_id, is_approved)',
+        'CREATE INDEX idx_urgent_active_deadline ON urgent_requirements (is_active, deadline NULLS FIRST, id)',
+        'CREATE INDEX idx_urgent_ngo_active ON urgent_requirements (ngo_id, is_active)',
+        'CREATE INDEX idx_ngos_user ON ngos (user_id)',
+        'CREATE INDEX idx_ngos_verified ON ngos (is_verified)',
+        'CREATE INDEX idx_ngos_verified_name ON ngos (is_verified, org_name)',
+        'CREATE INDEX idx_jobs_status_run_after ON jobs (status, run_after)',
+        'CREATE INDEX idx_money_usage_ngo_created ON money_usage (ngo_id, created_at)',
+        'CREATE INDEX idx_money_usage_donation ON money_usage (donation_id)',
+        _PG_DONATIONS_STATS,
+        '''CREATE TRIGGER donations_stats
+        AFTER INSERT OR DELETE OR UPDATE OF ngo_id, amount, payment_method, status, created_at ON donations
+        FOR EACH ROW EXECUTE FUNCTION donations_stats()''',
+        _PG_MONEY_USAGE_STATS,
+        '''CREATE TRIGGER money_usage_stats
+        AFTER INSERT OR DELETE OR UPDATE OF ngo_id, amount_used, created_at ON money_usage
+        FOR EACH ROW EXECUTE FUNCTION money_usage_stats()''',
+        *_postgres_search_triggers(),
+    ],
+    # 2: ids for live events (SQLite 13); they are sent with NOTIFY, not stored
+    [
+        'CREATE SEQUENCE events_id_seq',
+    ],
+    # 3: SQLite 14
+    [
+        'CREATE INDEX idx_donations_donor_created ON donations (donor_email, created_at)',
+    ],
+]
+
+def migrate(conn):
+    """
+    Bring the database up to the latest schema version of its backend.
+    Each migration runs in its own write transaction, so under WAL readers keep
+    working while an index is being built on a live database. Workers starting
+    together wait for each other's migration and then skip it.
+    Returns the (old, new) schema versions.
+    """
+    backend = conn.backend
+    migrations = backend.migrations
+    current = backend.schema_version(conn)
+    for version in range(current + 1, len(migrations) + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            backend.lock(conn, 'migrate')
+            if backend.schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in migrations[version - 1]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            backend.set_schema_version(conn, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if current < len(migrations):
+        backend.optimize(conn)
+    return current, len(migrations)
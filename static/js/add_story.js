@@ -0,0 +1,248 @@
+// Character counters and preview
+document.getElementById('title').addEventListener('input', function() {
+    const count = this.value.length;
+    document.getElementById('titleCount').textContent = count;
+
+    // Update preview
+    document.getElementById('previewTitle').textContent = this.value || 'Your story title will appear here';
+
+    // Show preview if there's content
+    if (this.value || document.getElementById('content').value) {
+        document.getElementById('previewSection').style.display = 'block';
+    }
+});
+
+document.getElementById('content').addEventListener('input', function() {
+    const count = this.value.length;
+    document.getElementById('contentCount').textContent = count;
+
+    // Word count and reading time
+    const words = this.value.trim().split(/\s+/).filter(word => word.length > 0).length;
+    const readingTime = Math.ceil(words / 200);
+
+    const readingInfo = document.getElementById('readingInfo');
+    if (words > 0) {
+        readingInfo.textContent = `${words} words • ~${readingTime} min read`;
+    } else {
+        readingInfo.textContent = '';
+    }
+
+    // Update preview
+    document.getElementById('previewContent').textContent = this.value || 'Your story content will be shown here as you type...';
+
+    // Show preview if there's content
+    if (this.value || document.getElementById('title').value) {
+        document.getElementById('previewSection').style.display = 'block';
+    }
+});
+
+// Image upload handling
+const imageUpload = document.querySelector('.image-upload');
+const imageInput = document.getElementById('image');
+
+imageInput.addEventListener('change', function(e) {
+    const file = e.target.files[0];
+    if (file) {
+        // Validate file size (5MB)
+        if (file.size > 5 * 1024 * 1024) {
+            alert('File size must be less than 5MB');
+            this.value = '';
+            return;
+        }
+
+        // Validate file type
+        if (!file.type.startsWith('image/')) {
+            alert('Please select an image file');
+            this.value = '';
+            return;
+        }
+
+        // Update upload area
+        imageUpload.innerHTML = `
+            <i class="fas fa-check-circle" style="font-size: 3rem; color: #2ecc71; margin-bottom: 1rem;"></i>
+            <p style="margin-bottom: 0.5rem; color: #27ae60; font-weight: 600;">${file.name}</p>
+            <small style="color: #666;">Click to change image</small>
+        `;
+        imageUpload.classList.add('uploaded');
+    }
+});
+
+// Drag and drop functionality
+imageUpload.addEventListener('dragover', function(e) {
+    e.preventDefault();
+    this.classList.add('dragover');
+});
+
+imageUpload.addEventListener('dragleave', function(e) {
+    e.preventDefault();
+    this.classList.remove('dragover');
+});
+
+imageUpload.addEventListener('drop', function(e) {
+    e.preventDefault();
+    this.classList.remove('dragover');
+
+    const files = e.dataTransfer.files;
+    if (files.length > 0) {
+        imageInput.files = files;
+        imageInput.dispatchEvent(new Event('change'));
+    }
+});
+
+// Form submission
+document.getElementById('storyForm').addEventListener('submit', function(e) {
+    const title = document.getElementById('title').value.trim();
+    const content = document.getElementById('content').value.trim();
+
+    if (!title || !content) {
+        e.preventDefault();
+        alert('Please fill in both title and content.');
+        return;
+    }
+
+    if (title.length < 10) {
+        e.preventDefault();
+        alert('Title should be at least 10 characters long.');
+        document.getElementById('title').focus();
+        return;
+    }
+
+    if (content.length < 50) {
+        e.preventDefault();
+        alert('Story content should be at least 50 characters long.');
+        document.getElementById('content').focus();
+        return;
+    }
+
+    // Add loading state
+    const submitBtn = document.getElementById('submitBtn');
+    submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Sharing Your Story...';
+    submitBtn.disabled = true;
+    submitBtn.style.opacity = '0.7';
+});
+
+// Auto-save functionality
+function autoSave() {
+    const formData = {
+        title: document.getElementById('title').value,
+        content: document.getElementById('content').value,
+        timestamp: new Date().getTime()
+    };
+    localStorage.setItem('storyDraft', JSON.stringify(formData));
+}
+
+function loadDraft() {
+    const saved = localStorage.getItem('storyDraft');
+    if (saved) {
+        const data = JSON.parse(saved);
+        // Only load if saved within last 24 hours
+        if (Date.now() - data.timestamp < 24 * 60 * 60 * 1000) {
+            if (data.title || data.content) {
+                const modal = document.createElement('div');
+                modal.style.cssText = `
+                    position: fixed;
+                    top: 0;
+                    left: 0;
+                    width: 100%;
+                    height: 100%;
+                    background: rgba(0,0,0,0.5);
+                    display: flex;
+                    align-items: center;
+                    justify-content: center;
+                    z-index: 10000;
+                    backdrop-filter: blur(5px);
+                `;
+
+                modal.innerHTML = `
+                    <div style="
+                        background: white;
+                        padding: 2rem;
+                        border-radius: 15px;
+                        text-align: center;
+                        max-width: 400px;
+                        box-shadow: 0 20px 40px rgba(0,0,0,0.3);
+                    ">
+                        <div style="font-size: 3rem; margin-bottom: 1rem;">💾</div>
+                        <h3 style="color: #2c3e50; margin-bottom: 1rem;">Restore Draft?</h3>
+                        <p style="color: #666; margin-bottom: 2rem;">We found a saved draft from earlier. Would you like to restore it?</p>
+                        <div style="display: flex; gap: 1rem; justify-content: center;">
+                            <button onclick="restoreDraft(); this.closest('div').parentElement.remove();" style="
+                                background: linear-gradient(45deg, #667eea, #764ba2);
+                                color: white;
+                                border: none;
+                                padding: 10px 20px;
+                                border-radius: 25px;
+                                cursor: pointer;
+                            ">Yes, Restore</button>
+                            <button onclick="this.closest('div').parentElement.remove();" style="
+                                background: #95a5a6;
+                                color: white;
+                                border: none;
+                                padding: 10px 20px;
+                                border-radius: 25px;
+                                cursor: pointer;
+                            ">No, Thanks</button>
+                        </div>
+                    </div>
+                `;
+
+                document.body.appendChild(modal);
+
+                window.restoreDraft = function() {
+                    document.getElementById('title').value = data.title;
+                    document.getElementById('content').value = data.content;
+
+                    // Trigger input events to update counters
+                    document.getElementById('title').dispatchEvent(new Event('input'));
+                    document.getElementById('content').dispatchEvent(new Event('input'));
+                };
+            }
+        }
+    }
+}
+
+// Auto-save every 30 seconds
+setInterval(autoSave, 30000);
+
+// Auto-save on input
+document.getElementById('title').addEventListener('input', autoSave);
+document.getElementById('content').addEventListener('input', autoSave);
+
+// Clear draft on successful submission
+document.getElementById('storyForm').addEventListener('submit', function() {
+    localStorage.removeItem('storyDraft');
+});
+
+// Prevent accidental page leave
+window.addEventListener('beforeunload', function(e) {
+    const title = document.getElementById('title').value.trim();
+    const content = document.getElementById('content').value.trim();
+
+    if (title || content) {
+        e.preventDefault();
+        e.returnValue = '';
+    }
+});
+
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    loadDraft();
+
+    // Entrance animations
+    const sections = document.querySelectorAll('section');
+    sections.forEach((section, index) => {
+        section.style.opacity = '0';
+        section.style.transform = 'translateY(30px)';
+        section.style.transition = 'all 0.8s ease';
+
+        setTimeout(() => {
+            section.style.opacity = '1';
+            section.style.transform = 'translateY(0)';
+        }, index * 200);
+    });
+
+    // Focus on title field after animations
+    setTimeout(() => {
+        document.getElementById('title').focus();
+    }, 1500);
+});
@@ -0,0 +1,173 @@
+// Set minimum date to today
+document.addEventListener('DOMContentLoaded', function() {
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('deadline').min = today;
+
+    // Focus on title field after a short delay
+    setTimeout(() => {
+        document.getElementById('title').focus();
+    }, 500);
+});
+
+// Real-time preview updates
+document.getElementById('title').addEventListener('input', function() {
+    document.getElementById('previewTitle').textContent = this.value || 'Your requirement title will appear here';
+    showPreview();
+});
+
+document.getElementById('description').addEventListener('input', function() {
+    const text = this.value || 'Your detailed description will be shown here...';
+    document.getElementById('previewDescription').textContent = text.length > 150 ? text.substring(0, 150) + '...' : text;
+    showPreview();
+});
+
+document.getElementById('amount_needed').addEventListener('input', function() {
+    const amount = this.value ? parseFloat(this.value).toLocaleString() : '0';
+    document.getElementById('previewAmount').textContent = `₹${amount} needed`;
+    showPreview();
+});
+
+document.getElementById('deadline').addEventListener('change', function() {
+    const deadlineEl = document.getElementById('previewDeadline');
+    if (this.value) {
+        const date = new Date(this.value);
+        const options = { year: 'numeric', month: 'short', day: 'numeric' };
+        deadlineEl.innerHTML = `📅 Deadline: ${date.toLocaleDateString('en-US', options)}`;
+    } else {
+        deadlineEl.innerHTML = '📅 No deadline set';
+    }
+    showPreview();
+});
+
+function showPreview() {
+    const title = document.getElementById('title').value;
+    const description = document.getElementById('description').value;
+    const amount = document.getElementById('amount_needed').value;
+
+    if (title || description || amount) {
+        document.getElementById('previewSection').style.display = 'block';
+    }
+}
+
+// Form validation
+document.getElementById('urgentForm').addEventListener('submit', function(e) {
+    const title = document.getElementById('title').value.trim();
+    const description = document.getElementById('description').value.trim();
+    const amount = document.getElementById('amount_needed').value;
+
+    if (!title || !description || !amount) {
+        e.preventDefault();
+        alert('Please fill in all required fields.');
+        return;
+    }
+
+    if (parseFloat(amount) < 1000) {
+        e.preventDefault();
+        alert('Minimum amount should be ₹1,000');
+        document.getElementById('amount_needed').focus();
+        return;
+    }
+
+    // Confirmation dialog
+    if (!confirm('Are you sure you want to post this urgent requirement? It will be visible to all donors immediately.')) {
+        e.preventDefault();
+        return;
+    }
+
+    // Add loading state
+    const submitBtn = e.target.querySelector('button[type="submit"]');
+    const originalText = submitBtn.innerHTML;
+    submitBtn.innerHTML = '⏳ Posting Requirement...';
+    submitBtn.disabled = true;
+
+    // Re-enable if form submission fails
+    setTimeout(() => {
+        submitBtn.innerHTML = originalText;
+        submitBtn.disabled = false;
+    }, 5000);
+});
+
+// Amount input formatting
+document.getElementById('amount_needed').addEventListener('input', function() {
+    // Remove any non-digit characters except decimal point
+    let value = this.value.replace(/[^\d.]/g, '');
+
+    // Ensure only one decimal point
+    const parts = value.split('.');
+    if (parts.length > 2) {
+        value = parts[0] + '.' + parts.slice(1).join('');
+    }
+
+    // Limit to reasonable amount
+    const numValue = parseFloat(value);
+    if (numValue > 10000000) {
+        value = '10000000';
+    }
+
+    this.value = value;
+});
+
+// Character counter for description
+document.getElementById('description').addEventListener('input', function() {
+    const maxLength = 1000;
+    const currentLength = this.value.length;
+    const remaining = maxLength - currentLength;
+
+    // Find or create character counter
+    let counter = this.parentNode.querySelector('.char-counter');
+    if (!counter) {
+        counter = document.createElement('small');
+        counter.className = 'char-counter';
+        counter.style.float = 'right';
+        counter.style.color = '#666';
+        this.parentNode.appendChild(counter);
+    }
+
+    counter.textContent = `${currentLength}/${maxLength} characters`;
+    counter.style.color = remaining < 50 ? '#e74c3c' : '#666';
+});
+
+// Auto-save draft functionality
+function saveDraft() {
+    const draft = {
+        title: document.getElementById('title').value,
+        description: document.getElementById('description').value,
+        amount_needed: document.getElementById('amount_needed').value,
+        deadline: document.getElementById('deadline').value,
+        timestamp: new Date().getTime()
+    };
+    localStorage.setItem('urgentRequirementDraft', JSON.stringify(draft));
+}
+
+// Save draft every 30 seconds
+setInterval(saveDraft, 30000);
+
+// Save on input change
+document.querySelectorAll('#title, #description, #amount_needed, #deadline').forEach(input => {
+    input.addEventListener('input', saveDraft);
+});
+
+// Load draft on page load
+window.addEventListener('load', function() {
+    const saved = localStorage.getItem('urgentRequirementDraft');
+    if (saved) {
+        const draft = JSON.parse(saved);
+        // Only load if draft is less than 1 day old
+        if (new Date().getTime() - draft.timestamp < 86400000) {
+            if (confirm('Found a saved draft. Would you like to restore it?')) {
+                document.getElementById('title').value = draft.title || '';
+                document.getElementById('description').value = draft.description || '';
+                document.getElementById('amount_needed').value = draft.amount_needed || '';
+                document.getElementById('deadline').value = draft.deadline || '';
+
+                // Trigger preview update
+                showPreview();
+            }
+        }
+    }
+});
+
+// Clear draft on successful submission
+document.getElementById('urgentForm').addEventListener('submit', function() {
+    localStorage.removeItem('urgentRequirementDraft');
+});
@@ -0,0 +1,29 @@
+// Live updates from /events. handlers maps event names to functions taking the
+// parsed data. The browser reconnects by itself (resuming from the last event id);
+// a server with no room for another stream answers 503, so try again later.
+function openEvents(url, handlers) {
+    const source = new EventSource(url);
+    Object.entries(handlers).forEach(([name, handler]) => {
+        source.addEventListener(name, (event) => handler(JSON.parse(event.data)));
+    });
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => openEvents(url, handlers), 30000);
+        }
+    };
+    return source;
+}
+
+// Auto-hide flash messages
+document.addEventListener('DOMContentLoaded', function() {
+    const flashMessages = document.querySelectorAll('.flash-message');
+    flashMessages.forEach(function(message) {
+        setTimeout(function() {
+            message.style.opacity = '0';
+            message.style.transform = 'translateX(100%)';
+            setTimeout(function() {
+                message.remove();
+            }, 300);
+        }, 5000);
+    });
+});
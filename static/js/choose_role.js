@@ -0,0 +1,8 @@
+function selectRole(role) {
+    // Based on your Flask app.py routes
+    if (role === 'donor') {
+        window.location.href = "/register/donor";  // Goes to your register route with donor role
+    } else if (role === 'ngo') {
+        window.location.href = "/register/receiver";  // Goes to your register route with receiver role
+    }
+}
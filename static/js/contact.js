@@ -0,0 +1,13 @@
+document.getElementById('contactForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+    const submitBtn = this.querySelector('button[type="submit"]');
+    submitBtn.textContent = 'Sending...';
+    submitBtn.disabled = true;
+
+    setTimeout(() => {
+        alert('Thank you for your message! We will get back to you within 24-48 hours.');
+        this.reset();
+        submitBtn.textContent = '✈️ Send Message';
+        submitBtn.disabled = false;
+    }, 1000);
+});
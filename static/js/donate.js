@@ -0,0 +1,112 @@
+// Amount button functionality
+document.querySelectorAll('.amount-btn').forEach(btn => {
+    btn.addEventListener('click', function() {
+        const amount = this.dataset.amount;
+        const amountInput = document.getElementById('amount');
+
+        // Clear previous selections
+        document.querySelectorAll('.amount-btn').forEach(b => {
+            b.style.background = 'white';
+            b.style.color = '#333';
+            b.style.borderColor = '#ddd';
+        });
+
+        if (amount) {
+            // Set amount and highlight button
+            amountInput.value = amount;
+            this.style.background = '#667eea';
+            this.style.color = 'white';
+            this.style.borderColor = '#667eea';
+            updateImpact(amount);
+        } else {
+            // Custom amount
+            amountInput.focus();
+            this.style.background = '#667eea';
+            this.style.color = 'white';
+            this.style.borderColor = '#667eea';
+        }
+    });
+});
+
+// Custom amount input
+document.getElementById('amount').addEventListener('input', function() {
+    const amount = this.value;
+    if (amount) {
+        // Clear button selections
+        document.querySelectorAll('.amount-btn').forEach(b => {
+            b.style.background = 'white';
+            b.style.color = '#333';
+            b.style.borderColor = '#ddd';
+        });
+        // Highlight custom button
+        document.getElementById('customBtn').style.background = '#667eea';
+        document.getElementById('customBtn').style.color = 'white';
+        document.getElementById('customBtn').style.borderColor = '#667eea';
+        updateImpact(amount);
+    }
+});
+
+// Payment method highlighting
+document.querySelectorAll('.payment-option').forEach(option => {
+    option.addEventListener('click', function() {
+        document.querySelectorAll('.payment-option').forEach(opt => {
+            opt.style.borderColor = '#ddd';
+            opt.style.background = 'white';
+        });
+        this.style.borderColor = '#667eea';
+        this.style.background = 'rgba(102, 126, 234, 0.05)';
+    });
+});
+
+// Impact calculator
+function updateImpact(amount) {
+    const impactDisplay = document.getElementById('impactDisplay');
+    const amt = parseInt(amount);
+
+    if (amt >= 10) {
+        let impact = '';
+        if (amt >= 500) {
+            const meals = Math.floor(amt / 50);
+            impact += `<div style="font-size: 2rem; margin-bottom: 0.5rem;">🍽️</div>`;
+            impact += `<p style="font-weight: 600; color: #2c3e50; font-size: 1.2rem;">Provide ${meals} meals</p>`;
+        }
+        if (amt >= 1000) {
+            impact += `<div style="font-size: 2rem; margin-bottom: 0.5rem; margin-top: 1rem;">📚</div>`;
+            impact += `<p style="font-weight: 600; color: #2c3e50; font-size: 1.2rem;">Support education materials</p>`;
+        }
+        if (amt >= 5000) {
+            impact += `<div style="font-size: 2rem; margin-bottom: 0.5rem; margin-top: 1rem;">🏥</div>`;
+            impact += `<p style="font-weight: 600; color: #2c3e50; font-size: 1.2rem;">Provide medical aid</p>`;
+        }
+
+        impactDisplay.innerHTML = impact;
+    }
+}
+
+// Form submission
+document.getElementById('donationForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+
+    const amount = document.getElementById('amount').value;
+    const paymentMethod = document.querySelector('input[name="payment_method"]:checked');
+
+    if (!amount || amount < 10) {
+        alert('Please enter a minimum donation amount of ₹10');
+        return;
+    }
+
+    if (!paymentMethod) {
+        alert('Please select a payment method');
+        return;
+    }
+
+    // Show loading
+    const donateBtn = document.getElementById('donateBtn');
+    donateBtn.innerHTML = '🔄 Processing...';
+    donateBtn.disabled = true;
+
+    // Simulate payment processing
+    setTimeout(() => {
+        this.submit();
+    }, 1500);
+});
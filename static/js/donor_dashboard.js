@@ -0,0 +1,44 @@
+// Staggered entrance animations
+document.addEventListener('DOMContentLoaded', function() {
+    const ngoCards = document.querySelectorAll('.ngo-card');
+    ngoCards.forEach((card, index) => {
+        card.style.opacity = '0';
+        card.style.transform = 'translateY(30px)';
+        card.style.transition = 'all 0.6s ease';
+
+        setTimeout(() => {
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 100);
+    });
+});
+
+// Add loading effect to action buttons
+document.addEventListener('click', function(e) {
+    if (e.target.closest('.ngo-card a')) {
+        const btn = e.target.closest('.ngo-card a');
+        const originalText = btn.innerHTML;
+        btn.innerHTML = '<span class="loading">⏳</span> Loading...';
+        btn.style.pointerEvents = 'none';
+
+        // Restore after delay for demo
+        setTimeout(() => {
+            btn.innerHTML = originalText;
+            btn.style.pointerEvents = 'auto';
+        }, 1000);
+    }
+});
+
+// Smooth scroll for internal links
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function(e) {
+        e.preventDefault();
+        const target = document.querySelector(this.getAttribute('href'));
+        if (target) {
+            target.scrollIntoView({
+                behavior: 'smooth',
+                block: 'start'
+            });
+        }
+    });
+});
@@ -0,0 +1,100 @@
+const dashboardEvents = document.currentScript.dataset.events;
+// Keep at most this many live rows above the page that was rendered
+const LIVE_DONATION_ROWS = 50;
+
+// Functions for quick actions
+function showProfile() {
+    // Create a more stylish alert
+    const modal = document.createElement('div');
+    modal.style.cssText = `
+        position: fixed;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background: rgba(0,0,0,0.5);
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        z-index: 10000;
+        backdrop-filter: blur(5px);
+    `;
+
+    modal.innerHTML = `
+        <div style="
+            background: white;
+            padding: 2rem;
+            border-radius: 15px;
+            text-align: center;
+            max-width: 400px;
+            box-shadow: 0 20px 40px rgba(0,0,0,0.3);
+        ">
+            <div style="font-size: 3rem; margin-bottom: 1rem;">👤</div>
+            <h3 style="color: #2c3e50; margin-bottom: 1rem;">Profile Management</h3>
+            <p style="color: #666; margin-bottom: 2rem;">This feature will be available soon! You'll be able to update your organization details, add team members, and more.</p>
+            <button onclick="this.closest('div').parentElement.remove()" style="
+                background: linear-gradient(45deg, #667eea, #764ba2);
+                color: white;
+                border: none;
+                padding: 10px 25px;
+                border-radius: 25px;
+                cursor: pointer;
+            ">Got it!</button>
+        </div>
+    `;
+
+    document.body.appendChild(modal);
+}
+
+// Entrance animations
+document.addEventListener('DOMContentLoaded', function() {
+    const cards = document.querySelectorAll('.card');
+
+    cards.forEach((card, index) => {
+        card.style.opacity = '0';
+        card.style.transform = 'translateY(30px)';
+        card.style.transition = 'all 0.8s ease';
+
+        setTimeout(() => {
+            card.style.opacity = '1';
+            card.style.transform = 'translateY(0)';
+        }, index * 200);
+    });
+
+    // New donations arrive over /events
+    openEvents(dashboardEvents, {donation: showDonation});
+});
+
+function addToStat(id, amount) {
+    const stat = document.getElementById(id);
+    stat.dataset.value = Number(stat.dataset.value) + amount;
+    return Number(stat.dataset.value);
+}
+
+function showDonation(donation) {
+    document.getElementById('stat-total-amount').textContent = '₹' + Math.trunc(addToStat('stat-total-amount', donation.amount));
+    document.getElementById('stat-donation-count').textContent = addToStat('stat-donation-count', 1);
+
+    // Older pages of the table stay as they are
+    if (new URLSearchParams(location.search).has('cursor')) {
+        return;
+    }
+    const body = document.getElementById('donations-body');
+    if (!body) {
+        // First donation: there is no table to add it to yet
+        location.reload();
+        return;
+    }
+    const row = document.getElementById('donation-row').content.firstElementChild.cloneNode(true);
+    const name = donation.donor_email.split('@')[0];
+    row.querySelector('[data-field="donor"]').textContent = name.charAt(0).toUpperCase() + name.slice(1).toLowerCase();
+    row.querySelector('[data-field="amount"]').textContent = '₹' + Math.trunc(donation.amount);
+    row.querySelector('[data-field="date"]').textContent = donation.created_at.slice(0, 10);
+    body.insertBefore(row, body.firstChild);
+    if (!body.dataset.rendered) {
+        body.dataset.rendered = body.rows.length - 1;
+    }
+    while (body.rows.length > Number(body.dataset.rendered) + LIVE_DONATION_ROWS) {
+        body.deleteRow(-1);
+    }
+}
@@ -0,0 +1,138 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Password visibility toggle
+    document.getElementById('togglePassword').addEventListener('click', function() {
+        const password = document.getElementById('password');
+        const icon = this;
+
+        if (password.type === 'password') {
+            password.type = 'text';
+            icon.classList.remove('fa-eye');
+            icon.classList.add('fa-eye-slash');
+        } else {
+            password.type = 'password';
+            icon.classList.remove('fa-eye-slash');
+            icon.classList.add('fa-eye');
+        }
+    });
+    // Password strength checker
+    document.getElementById('password').addEventListener('input', function() {
+        const password = this.value;
+        const strengthFill = document.getElementById('strengthFill');
+        const requirements = {
+            length: password.length >= 8,
+            uppercase: /[A-Z]/.test(password),
+            lowercase: /[a-z]/.test(password),
+            number: /\d/.test(password),
+            special: /[!@#$%^&*()_+\-=\[\]{};':"\|,.<>\/?]/.test(password)
+        };
+        // Update requirement indicators
+        Object.keys(requirements).forEach(req => {
+            const element = document.getElementById(req);
+            const icon = element.querySelector('i');
+
+            if (requirements[req]) {
+                element.classList.add('valid');
+                element.style.color = '#0d7338';
+                icon.classList.remove('fa-times');
+                icon.classList.add('fa-check');
+            } else {
+                element.classList.remove('valid');
+                element.style.color = '#666';
+                icon.classList.remove('fa-check');
+                icon.classList.add('fa-times');
+                icon.style.color = '#e74c3c';
+            }
+        });
+        // Calculate strength
+        const validCount = Object.values(requirements).filter(Boolean).length;
+        strengthFill.className = 'strength-fill';
+
+        if (validCount === 0) {
+            strengthFill.style.width = '0%';
+        } else if (validCount <= 2) {
+            strengthFill.classList.add('weak');
+        } else if (validCount <= 3) {
+            strengthFill.classList.add('fair');
+        } else if (validCount <= 4) {
+            strengthFill.classList.add('good');
+        } else {
+            strengthFill.classList.add('strong');
+        }
+    });
+    // Confirm password checker
+    document.getElementById('confirmPassword').addEventListener('input', function() {
+        const password = document.getElementById('password').value;
+        const confirmPassword = this.value;
+        const feedback = document.getElementById('confirm-feedback');
+
+        if (confirmPassword === '') {
+            feedback.innerHTML = '';
+            return;
+        }
+
+        if (password === confirmPassword) {
+            feedback.innerHTML = '<span style="color: #0d7338;"><i class="fas fa-check"></i> Passwords match</span>';
+        } else {
+            feedback.innerHTML = '<span style="color: #e74c3c;"><i class="fas fa-times"></i> Passwords do not match</span>';
+        }
+    });
+    // Email validation
+    document.getElementById('email').addEventListener('input', function() {
+        const email = this.value;
+        const feedback = document.getElementById('email-feedback');
+        const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+
+        if (email === '') {
+            feedback.innerHTML = '';
+            return;
+        }
+
+        if (emailRegex.test(email)) {
+            feedback.innerHTML = '<span style="color: #0d7338;"><i class="fas fa-check"></i> Valid email format</span>';
+        } else {
+            feedback.innerHTML = '<span style="color: #e74c3c;"><i class="fas fa-times"></i> Invalid email format</span>';
+        }
+    });
+    // Form submission validation
+    document.getElementById('registerForm').addEventListener('submit', function(e) {
+        const password = document.getElementById('password').value;
+        const confirmPassword = document.getElementById('confirmPassword').value;
+        const email = document.getElementById('email').value;
+        const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+
+        // Check email
+        if (!emailRegex.test(email)) {
+            e.preventDefault();
+            alert('Please enter a valid email address.');
+            return;
+        }
+
+        // Check password strength
+        const requirements = {
+            length: password.length >= 8,
+            uppercase: /[A-Z]/.test(password),
+            lowercase: /[a-z]/.test(password),
+            number: /\d/.test(password),
+            special: /[!@#$%^&*()_+\-=\[\]{};':"\|,.<>\/?]/.test(password)
+        };
+
+        const validCount = Object.values(requirements).filter(Boolean).length;
+        if (validCount < 4) {
+            e.preventDefault();
+            alert('Password must meet at least 4 out of 5 requirements.');
+            return;
+        }
+
+        // Check password match
+        if (password !== confirmPassword) {
+            e.preventDefault();
+            alert('Passwords do not match.');
+            return;
+        }
+
+        // Add loading state
+        const submitBtn = document.getElementById('submitBtn');
+        submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Creating Account...';
+        submitBtn.disabled = true;
+    });
+});
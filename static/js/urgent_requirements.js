@@ -0,0 +1,19 @@
+const requirementEvents = document.currentScript.dataset.events;
+
+// Funding progress arrives over /events
+document.addEventListener('DOMContentLoaded', function() {
+    if (document.querySelector('[data-requirement]')) {
+        openEvents(requirementEvents, {funding: showFunding});
+    }
+});
+
+function showFunding(requirement) {
+    const card = document.querySelector(`[data-requirement="${requirement.id}"]`);
+    if (!card) {
+        return;
+    }
+    const percent = Math.round(requirement.amount_raised / requirement.amount_needed * 10000) / 100;
+    card.querySelector('[data-field="raised"]').textContent = `₹${requirement.amount_raised} raised`;
+    card.querySelector('[data-field="progress"]').textContent = requirement.is_active
+        ? `${percent}% Complete` : 'Goal reached!';
+}
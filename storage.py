@@ -0,0 +1,558 @@
+# Storage backends
+# DATABASE is either a SQLite file path or a postgresql:// URL; connect_db()
+# opens it through the matching backend and every connection carries it as
+# conn.backend. Application SQL is written once, with ? placeholders and syntax
+# both engines accept. A backend owns what cannot be shared: the schema and its
+# triggers, full-text search, query plans, write locks and bulk-load tuning.
+# PostgreSQL connections behave like the sqlite3 ones: reads run outside any
+# transaction, and a write (or an explicit BEGIN) opens one that lasts until
+# commit() or rollback().
+import sqlite3
+import itertools
+import json
+import os
+import re
+import select
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import psycopg2
+    import psycopg2.extras
+except ImportError:  # only needed when DATABASE is a postgresql:// URL
+    psycopg2 = None
+
+from migrations import MIGRATIONS, POSTGRES_MIGRATIONS
+
+# Statement timing
+# Every connection, whatever its backend, times its statements. While a request
+# is being handled request_timer.current is its timer: the time and count of each
+# statement are charged to it, and a statement slower than its slow_query_ms is
+# passed once to its slow_query().
+request_timer = threading.local()
+
+class TimedCursor:
+    """Cursor mixin that times execution and fetching of each statement."""
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+    _reported = False
+
+    def _charge(self, started):
+        took = time.perf_counter() - started
+        self._elapsed += took
+        timer = getattr(request_timer, 'current', None)
+        if timer is None:
+            return
+        timer.db += took
+        if not self._reported and self._elapsed * 1000 >= timer.slow_query_ms:
+            self._reported = True
+            timer.slow_query(self.connection, self._sql, self._params, self._elapsed)
+
+    def _start(self, sql, params):
+        self._sql, self._params, self._elapsed, self._reported = sql, params, 0.0, False
+        timer = getattr(request_timer, 'current', None)
+        if timer is not None:
+            timer.queries += 1
+        return time.perf_counter()
+
+    def execute(self, sql, parameters=()):
+        started = self._start(sql, parameters)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._charge(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = self._start(sql, None)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._charge(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._charge(started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._charge(started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._charge(started)
+
+class InstrumentedCursor(TimedCursor, sqlite3.Cursor):
+    pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts would otherwise bypass cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Events
+# What receive() returns. SQLite deletes expired events every
+# EVENT_PRUNE_EVERY publishes.
+Event = namedtuple('Event', 'id channel event data')
+
+EVENT_PRUNE_EVERY = 100
+
+# Backends
+DATABASE_ERRORS = (sqlite3.Error,) + ((psycopg2.Error,) if psycopg2 else ())
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + ((psycopg2.IntegrityError,) if psycopg2 else ())
+
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\?|%")
+
+@lru_cache(maxsize=1024)
+def postgres_sql(sql):
+    """Rewrite a statement for psycopg2: ? placeholders become %s and a literal % is doubled."""
+    if sql.lstrip().upper().startswith('BEGIN'):
+        return 'BEGIN'
+    return _SQL_TOKENS.sub(lambda m: '%s' if m.group() == '?' else m.group().replace('%', '%%'), sql)
+
+class PostgresCursorBase:
+    """A psycopg2 cursor with the parts of the sqlite3 cursor API the app uses."""
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self._cursor = cursor
+        self.row_factory = None
+
+    @property
+    def arraysize(self):
+        return self._cursor.arraysize
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        """The id the last INSERT took from its identity column, read with lastval()."""
+        with self.connection.raw.cursor() as cursor:
+            cursor.execute('SELECT lastval()')
+            return cursor.fetchone()[0]
+
+    def execute(self, sql, parameters=()):
+        self.connection._begin_for(sql)
+        if self.connection.trace_callback:
+            self.connection.trace_callback(sql)
+        self._cursor.execute(postgres_sql(sql), tuple(parameters))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection._begin_for(sql)
+        if self.connection.trace_callback:
+            seq_of_parameters = list(seq_of_parameters)
+            for _ in seq_of_parameters:
+                self.connection.trace_callback(sql)
+        psycopg2.extras.execute_batch(self._cursor, postgres_sql(sql), seq_of_parameters, page_size=1000)
+        return self
+
+    def _rows(self, rows):
+        factory = self.row_factory
+        return rows if factory is None else [factory(self, row) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return row if row is None or self.row_factory is None else self.row_factory(self, row)
+
+    def fetchmany(self, size=None):
+        return self._rows(self._cursor.fetchmany(self.arraysize if size is None else size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+class PostgresCursor(TimedCursor, PostgresCursorBase):
+    pass
+
+class PostgresConnection:
+    """
+    psycopg2 connection in autocommit mode that opens transactions the way
+    sqlite3 does: implicitly before INSERT/UPDATE/DELETE, or on BEGIN.
+    """
+    def __init__(self, raw, backend):
+        raw.autocommit = True
+        self.raw = raw
+        self.backend = backend
+        self.in_transaction = False
+        self.trace_callback = None
+        self._streams = 0
+
+    def _begin_for(self, sql):
+        verb = sql.lstrip()[:7].upper()
+        if verb.startswith('BEGIN'):
+            self.in_transaction = True
+        elif not self.in_transaction and verb.startswith(('INSERT', 'UPDATE', 'DELETE', 'REPLACE')):
+            self.begin()
+
+    def begin(self):
+        with self.raw.cursor() as cursor:
+            cursor.execute('BEGIN')
+        self.in_transaction = True
+
+    def set_trace_callback(self, callback):
+        """Like sqlite3's: callback(sql) for every statement run."""
+        self.trace_callback = callback
+
+    def cursor(self):
+        return PostgresCursor(self, self.raw.cursor())
+
+    def server_cursor(self):
+        """A server-side cursor, which sends rows as they are fetched. It needs a transaction."""
+        if not self.in_transaction:
+            self.begin()
+        self._streams += 1
+        # psycopg2 only allows WITH HOLD cursors in autocommit mode; inside our
+        # transaction one still streams, and is only materialized at commit
+        return PostgresCursor(self, self.raw.cursor(name=f'stream_{self._streams}', withhold=True))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def _end(self, statement):
+        if self.in_transaction:
+            self.in_transaction = False
+            with self.raw.cursor() as cursor:
+                cursor.execute(statement)
+
+    def commit(self):
+        self._end('COMMIT')
+
+    def rollback(self):
+        self._end('ROLLBACK')
+
+    def close(self):
+        self.raw.close()
+
+class SQLiteBackend:
+    name = 'sqlite'
+    # FTS5 ranks with bm25(), lower is better; snippets mark matches with \x02 and \x03
+    search_key = 'rowid'
+    search_sql = '''SELECT si.kind, si.ref_id, si.title,
+                 snippet(search_index, -1, char(2), char(3), '…', 24),
+                 n.org_name, n.location, n.id, si.rank, si.rowid
+                 FROM search_index si
+                 LEFT JOIN stories s ON si.kind = 'story' AND s.id = si.ref_id
+                 LEFT JOIN urgent_requirements ur ON si.kind = 'urgent' AND ur.id = si.ref_id
+                 JOIN ngos n ON n.id = CASE si.kind WHEN 'ngo' THEN si.ref_id
+                                                    WHEN 'story' THEN s.ngo_id ELSE ur.ngo_id END
+                 WHERE search_index MATCH ?
+                   AND (si.kind = 'ngo' AND n.is_verified = TRUE OR s.is_approved = TRUE OR ur.is_active = TRUE)
+                   {where}
+                 ORDER BY si.rank, si.rowid LIMIT ?'''
+
+    def __init__(self):
+        # Set after a write in this process publishes, so its listener need not
+        # wait out the poll interval
+        self.wakeup = threading.Event()
+        self._published = itertools.count(1)
+
+    def connect(self, database):
+        """
+        Open a SQLite connection with the pragmas every worker should use.
+        WAL lets readers run alongside the single writer.
+        """
+        conn = sqlite3.connect(database, timeout=30, check_same_thread=False, cached_statements=256,
+                               factory=InstrumentedConnection)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA cache_size=-20000')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.backend = self
+        return conn
+
+    def exists(self, database):
+        return os.path.exists(database)
+
+    @property
+    def migrations(self):
+        return MIGRATIONS
+
+    def schema_version(self, conn):
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def set_schema_version(self, conn, version):
+        conn.execute(f'PRAGMA user_version = {version}')
+
+    def optimize(self, conn):
+        conn.execute('PRAGMA optimize')
+
+    def lock(self, conn, key):
+        """Serialize write transactions on key. BEGIN IMMEDIATE already serializes every SQLite writer."""
+
+    def durable(self, conn):
+        """
+        Make conn's commits survive a power loss. Under WAL, synchronous=NORMAL
+        only syncs at checkpoints; FULL syncs the WAL on every commit.
+        """
+        conn.execute('PRAGMA synchronous=FULL')
+
+    def publish(self, conn, events, retention):
+        """
+        Append (channel, event, data) rows to the events table, which stands in for
+        a broker. Writers are serialized, so ids follow commit order. Now and then
+        events older than retention seconds are deleted.
+        """
+        now = time.time()
+        conn.execute('INSERT INTO events (channel, event, payload, created_at) VALUES '
+                     + ', '.join(['(?, ?, ?, ?)'] * len(events)),
+                     [value for channel, event, data in events for value in (channel, event, data, now)])
+        if next(self._published) % EVENT_PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - retention,))
+
+    def listen(self, conn):
+        """Start receiving the events published from now on; returns the position for receive()."""
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def receive(self, conn, position, timeout, limit):
+        """
+        Up to limit events after position, and the new position. With none yet,
+        wait up to timeout (less if this process publishes) and return none.
+        """
+        rows = conn.execute('SELECT id, channel, event, payload FROM events WHERE id > ? ORDER BY id LIMIT ?',
+                            (position, limit)).fetchall()
+        if not rows:
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+            return [], position
+        return [Event(*row) for row in rows], rows[-1][0]
+
+    def explain(self, conn, sql, params):
+        # A plain cursor, so the EXPLAIN is not itself timed and counted
+        return [row[3] for row in conn.cursor(sqlite3.Cursor).execute('EXPLAIN QUERY PLAN ' + sql, params or ())]
+
+    def stream(self, conn, sql, params=()):
+        """Cursor for a result too large to hold; SQLite produces rows as they are fetched."""
+        return conn.execute(sql, params)
+
+    def search_match(self, words, places):
+        """
+        An FTS5 query: every word must match, as a prefix, in any column. Quoting
+        each word keeps FTS5 syntax in user input from being parsed.
+        """
+        terms = [f'"{word}"*' for word in words]
+        if places:
+            terms.append('location : (' + ' '.join(f'"{place}"' for place in places) + ')')
+        return ' AND '.join(terms)
+
+    def optimize_search_index(self, conn):
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+    def check_constraints(self, conn):
+        """Foreign keys are not enforced (PRAGMA foreign_keys is off), so none are deferred."""
+
+    def derived_objects(self, conn, tables):
+        """(kind, drop, create) statements for the triggers and indexes on tables."""
+        placeholders = ', '.join('?' * len(tables))
+        return [(kind, f'DROP {kind.upper()} {name}', sql) for kind, name, sql in conn.execute(
+            f'''SELECT type, name, sql FROM sqlite_master
+                WHERE type IN ('trigger', 'index') AND sql IS NOT NULL
+                AND tbl_name IN ({placeholders})''', tables)]
+
+    @contextmanager
+    def bulk_load(self, conn, tables):
+        """Keep the journal in memory during a load, then refresh the planner statistics."""
+        conn.execute('PRAGMA journal_mode=MEMORY')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA cache_size=-262144')
+        try:
+            yield
+        finally:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA analysis_limit=1000')
+        conn.execute('ANALYZE')
+
+class PostgresBackend:
+    name = 'postgresql'
+    # Documents are ranked with ts_rank() over the weighted tsvector, negated so
+    # that, as with FTS5, lower is better and the (rank, rowid) cursor is shared.
+    # The snippet is computed only for the rows on the page.
+    search_key = 'doc_id'
+    search_sql = '''WITH hits AS (
+                     SELECT si.doc_id AS rowid, si.kind, si.ref_id, si.title, si.body, q.query,
+                            -ts_rank('{{0.1, 0.1, 0.4, 1.0}}', si.document, q.query)::double precision AS rank
+                     FROM search_index si, to_tsquery('simple', ?) AS q (query)
+                     WHERE si.document @@ q.query)
+                 SELECT si.kind, si.ref_id, si.title,
+                        ts_headline('simple', CASE WHEN si.body <> '' THEN si.body ELSE si.title END, si.query,
+                                    'StartSel=' || chr(2) || ', StopSel=' || chr(3)
+                                    || ', MaxWords=24, MinWords=12, ShortWord=0'),
+                        n.org_name, n.location, n.id, si.rank, si.rowid
+                 FROM hits si
+                 LEFT JOIN stories s ON si.kind = 'story' AND s.id = si.ref_id
+                 LEFT JOIN urgent_requirements ur ON si.kind = 'urgent' AND ur.id = si.ref_id
+                 JOIN ngos n ON n.id = CASE si.kind WHEN 'ngo' THEN si.ref_id
+                                                    WHEN 'story' THEN s.ngo_id ELSE ur.ngo_id END
+                 WHERE (si.kind = 'ngo' AND n.is_verified = TRUE OR s.is_approved = TRUE OR ur.is_active = TRUE)
+                   {where}
+                 ORDER BY si.rank, si.rowid LIMIT ?'''
+
+    def connect(self, database):
+        if psycopg2 is None:
+            raise RuntimeError('DATABASE is a PostgreSQL URL but psycopg2 is not installed')
+        if cooperative():
+            # Wait for the server through gevent's select, so other greenlets keep running
+            psycopg2.extensions.set_wait_callback(psycopg2.extras.wait_select)
+        return PostgresConnection(psycopg2.connect(database), self)
+
+    def exists(self, database):
+        conn = self.connect(database)
+        try:
+            return self.schema_version(conn) > 0
+        finally:
+            conn.close()
+
+    @property
+    def migrations(self):
+        return POSTGRES_MIGRATIONS
+
+    def schema_version(self, conn):
+        # pg_tables rather than to_regclass(), whose cached catalog lookup can
+        # miss a table committed while we waited for the migrate lock
+        if not conn.execute("""SELECT EXISTS (SELECT 1 FROM pg_tables WHERE schemaname = current_schema()
+                                              AND tablename = 'schema_version')""").fetchone()[0]:
+            return 0
+        return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+    def set_schema_version(self, conn, version):
+        conn.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)')
+        conn.execute('INSERT INTO schema_version (version) VALUES (?)', (version,))
+
+    def optimize(self, conn):
+        conn.execute('ANALYZE')
+
+    def lock(self, conn, key):
+        """Serialize write transactions on key, until the current one ends."""
+        conn.execute('SELECT pg_advisory_xact_lock(hashtext(?))', (key,))
+
+    def durable(self, conn):
+        """Commits already wait for the WAL flush (synchronous_commit is on)."""
+
+    def publish(self, conn, events, retention):
+        """
+        NOTIFY every listening connection of the (channel, event, data) tuples. The
+        server delivers them when the transaction commits, in commit order, so ids
+        from the sequence may arrive out of order. Nothing is stored, so there is
+        nothing to expire after retention.
+        """
+        conn.execute('''SELECT pg_notify('events', json_build_object('id', nextval('events_id_seq'),
+                        'channel', channel, 'event', event, 'data', data)::text)
+                        FROM (VALUES ''' + ', '.join(['(?, ?, ?)'] * len(events)) + ') AS e (channel, event, data)',
+                     [value for event in events for value in event])
+
+    def listen(self, conn):
+        conn.execute('LISTEN events')
+
+    def receive(self, conn, position, timeout, limit):
+        """
+        The notifications that have arrived, waiting up to timeout for the first.
+        They are already in memory, so all of them are returned whatever limit is.
+        """
+        raw = conn.raw
+        if not raw.notifies and select.select([raw], [], [], timeout)[0]:
+            raw.poll()
+        events = [Event(**json.loads(notify.payload)) for notify in raw.notifies]
+        raw.notifies.clear()
+        return events, position
+
+    def explain(self, conn, sql, params):
+        # Straight on the psycopg2 connection, so the EXPLAIN is not itself timed
+        # and counted; a savepoint keeps a failure from aborting the transaction
+        with conn.raw.cursor() as cursor:
+            if conn.in_transaction:
+                cursor.execute('SAVEPOINT explain')
+            try:
+                cursor.execute('EXPLAIN ' + postgres_sql(sql), tuple(params or ()))
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                if conn.in_transaction:
+                    cursor.execute('ROLLBACK TO SAVEPOINT explain')
+
+    def stream(self, conn, sql, params=()):
+        """Server-side cursor for a result too large to hold in memory."""
+        return conn.server_cursor().execute(sql, params)
+
+    def search_match(self, words, places):
+        """A tsquery: every word as a prefix in any column, every place in the location (weight B)."""
+        return ' & '.join([f"'{word}':*" for word in words] + [f"'{place}':B" for place in places])
+
+    def optimize_search_index(self, conn):
+        pass
+
+    def check_constraints(self, conn):
+        """Check the deferred foreign keys now rather than at commit."""
+        conn.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def derived_objects(self, conn, tables):
+        """
+        (kind, drop, create) statements for the secondary indexes and triggers on
+        tables. Indexes behind constraints stay; triggers are disabled, not dropped.
+        """
+        placeholders = ', '.join('?' * len(tables))
+        indexes = conn.execute(f'''SELECT indexname, indexdef FROM pg_indexes
+                                   WHERE schemaname = current_schema() AND tablename IN ({placeholders})
+                                   AND indexname NOT IN (SELECT conname FROM pg_constraint)''', tables)
+        return ([('index', f'DROP INDEX {name}', sql) for name, sql in indexes]
+                + [('trigger', f'ALTER TABLE {table} DISABLE TRIGGER USER',
+                    f'ALTER TABLE {table} ENABLE TRIGGER USER') for table in tables])
+
+    @contextmanager
+    def bulk_load(self, conn, tables):
+        """
+        Skip waiting for the WAL flush during a load. Afterwards move the identity
+        sequences past the ids the load wrote and refresh the planner statistics.
+        """
+        conn.execute('SET synchronous_commit = off')
+        try:
+            yield
+        finally:
+            conn.execute('RESET synchronous_commit')
+        for table in tables:
+            conn.execute(f"SELECT setval(pg_get_serial_sequence(?, 'id'), MAX(id)) FROM {table} HAVING COUNT(*) > 0",
+                         (table,))
+        conn.execute('ANALYZE')
+
+SQLITE = SQLiteBackend()
+POSTGRES = PostgresBackend()
+
+def cooperative():
+    """True under gunicorn's gevent worker, where blocking waits must yield to other greenlets."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('select')
+
+def backend_for(database):
+    return POSTGRES if database.startswith(('postgresql://', 'postgres://')) else SQLITE
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import app as donate
+from storage import psycopg2
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database(request, tmp_path):
+    """
+    A scratch database for one test. Every test that uses it runs on SQLite, and
+    again on PostgreSQL when TEST_POSTGRES_URL names a database the suite may wipe.
+    """
+    if request.param == 'sqlite':
+        return str(tmp_path / 'test.db')
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url or psycopg2 is None:
+        pytest.skip('set TEST_POSTGRES_URL (and install psycopg2) to run on PostgreSQL')
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute('DROP SCHEMA public CASCADE; CREATE SCHEMA public')
+    conn.close()
+    return url
+
+@pytest.fixture
+def app(database, tmp_path):
+    """The application on a freshly migrated database holding the demo accounts."""
+    saved = dict(donate.app.config)
+    # Hashing and jobs run inline, and a cheap KDF keeps logins fast
+    donate.app.config.update(TESTING=True, DATABASE=database, JOB_WORKERS=0, PASSWORD_HASH_WORKERS=0,
+                             RECEIPT_WORKERS=0, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+                             UPLOAD_DIR=str(tmp_path / 'uploads'), RECEIPT_DIR=str(tmp_path / 'receipts'))
+    donate.init_db()
+    donate.create_sample_data()
+    # Cache keys carry tag versions, which start over on every new database
+    donate.get_cache().clear()
+    yield donate.app
+    donate.get_pool().close()
+    donate.app.config.clear()
+    donate.app.config.update(saved)
+
+@pytest.fixture
+def other_ngo(app):
+    """A second verified NGO, with its own receiver account, next to the demo one."""
+    conn = donate.connect_db()
+    user_id = conn.execute("INSERT INTO users (email, password, user_type) VALUES (?, ?, 'receiver')",
+                           ('other-ngo@example.com', donate.hash_password('password123'))).lastrowid
+    ngo_id = conn.execute('''INSERT INTO ngos (user_id, org_name, location, contact_number, email, bank_name,
+                                               account_number, niti_aayog_id, is_verified)
+                             VALUES (?, 'Other Trust', 'Pune, Maharashtra', '+91-9000000000',
+                                     'other-ngo@example.com', 'Bank of Baroda', '9876543210',
+                                     'MH/2021/0654321', TRUE)''', (user_id,)).lastrowid
+    conn.commit()
+    conn.close()
+    return ngo_id
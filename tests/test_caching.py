@@ -0,0 +1,30 @@
+from app import SQLiteCache, connect_db, record_donation
+
+LISTINGS = ['/', '/urgent_requirements', '/api/urgent_requirements']
+
+def validators(client):
+    return {path: client.get(path).headers['ETag'] for path in LISTINGS}
+
+def test_only_funding_changes_the_listing_validators(app):
+    client = app.test_client()
+    conn = connect_db()
+    before = validators(client)
+    record_donation(conn, 'donor@example.com', 1, 100, 'upi')
+    assert validators(client) == before
+    record_donation(conn, 'donor@example.com', 1, 100, 'upi', 1)
+    after = validators(client)
+    assert all(after[path] != before[path] for path in LISTINGS)
+    assert '₹15100.0 raised' in client.get('/urgent_requirements').get_data(as_text=True)
+    conn.close()
+
+def test_sqlite_cache_hits_are_reads(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'))
+    cache.set('key', [1, 2])
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    assert cache.get('key') == cache.get('key') == [1, 2]
+    assert not [sql for sql in statements if sql.startswith('UPDATE')]
+    # An entry not touched for TOUCH_INTERVAL gets its used_at refreshed
+    cache.TOUCH_INTERVAL = 0
+    cache.get('key')
+    assert [sql for sql in statements if sql.startswith('UPDATE')]
@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timezone
+
+from werkzeug.http import http_date
+
+from app import connect_db, invalidate_tags
+
+def test_etag_revalidation(app):
+    client = app.test_client()
+    etag = client.get('/stories').headers['ETag']
+    assert client.get('/stories', headers={'If-None-Match': etag}).status_code == 304
+    conn = connect_db()
+    invalidate_tags(conn, 'stories')
+    conn.commit()
+    conn.close()
+    assert client.get('/stories', headers={'If-None-Match': etag}).status_code == 200
+
+def test_last_modified_waits_for_its_second_to_pass(app):
+    client = app.test_client()
+    conn = connect_db()
+    # Start early in a second, so the checks below run within it
+    while datetime.now(timezone.utc).microsecond > 500000:
+        time.sleep(0.01)
+    invalidate_tags(conn, 'stories')
+    conn.commit()
+    # Changed this second: another write may still follow within it
+    response = client.get('/stories')
+    assert response.last_modified is None
+    since = {'If-Modified-Since': http_date(datetime.now(timezone.utc))}
+    assert client.get('/stories', headers=since).status_code == 200
+
+    conn.execute("UPDATE cache_tags SET updated_at = '2024-01-01 00:00:00' WHERE tag = 'stories'")
+    conn.commit()
+    conn.close()
+    response = client.get('/stories')
+    assert response.headers['Last-Modified'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    since = {'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get('/stories', headers=since).status_code == 304
+
+def test_invalid_requests_are_not_answered_with_304(app):
+    client = app.test_client()
+    response = client.get('/api/stories', query_string={'cursor': 'bogus'}, headers={'If-None-Match': '*'})
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import connect_db, record_donation, record_money_usage, verify_ngo_stats
+
+def add_requirement(conn, amount_needed, ngo_id=1):
+    requirement_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description, amount_needed)
+                                     VALUES (?, 'Test need', 'Test need', ?)''', (ngo_id, amount_needed)).lastrowid
+    conn.commit()
+    return requirement_id
+
+def requirement_state(conn, requirement_id):
+    raised, is_active = conn.execute('SELECT amount_raised, is_active FROM urgent_requirements WHERE id = ?',
+                                     (requirement_id,)).fetchone()
+    total = conn.execute('SELECT COALESCE(SUM(amount), 0) FROM donations WHERE urgent_requirement_id = ?',
+                         (requirement_id,)).fetchone()[0]
+    return raised, total, bool(is_active)
+
+def test_concurrent_donations_fund_a_requirement_exactly(app):
+    donors, donations = 16, 10
+    conn = connect_db()
+    # The goal is met halfway through, so the rest land on a closed requirement
+    requirement_id = add_requirement(conn, donors * donations * 10 / 2)
+
+    def donor(n):
+        donor_conn = connect_db()
+        try:
+            for _ in range(donations):
+                record_donation(donor_conn, f'donor{n}@example.com', 1, 10.0, 'upi', requirement_id)
+        finally:
+            donor_conn.close()
+
+    with ThreadPoolExecutor(donors) as executor:
+        list(executor.map(donor, range(donors)))
+    count = conn.execute("SELECT COUNT(*) FROM donations WHERE donor_email LIKE 'donor_%@example.com'").fetchone()[0]
+    assert count == donors * donations
+    assert requirement_state(conn, requirement_id) == (donors * donations * 10 / 2,) * 2 + (False,)
+    assert verify_ngo_stats(conn) == []
+    conn.close()
+
+def test_donation_to_a_closed_requirement_goes_to_the_ngo(app):
+    conn = connect_db()
+    requirement_id = add_requirement(conn, 100)
+    record_donation(conn, 'first@example.com', 1, 100, 'upi', requirement_id)
+    transaction_id = record_donation(conn, 'late@example.com', 1, 50, 'upi', requirement_id)
+    assert conn.execute('SELECT urgent_requirement_id FROM donations WHERE transaction_id = ?',
+                        (transaction_id,)).fetchone()[0] is None
+    assert requirement_state(conn, requirement_id) == (100, 100, False)
+    conn.close()
+
+@pytest.mark.parametrize('amount', ['0', '-5', 'nan', 'inf', 'ten', None])
+def test_invalid_amounts_are_rejected(app, amount):
+    conn = connect_db()
+    with pytest.raises(ValueError):
+        record_donation(conn, 'donor@example.com', 1, amount, 'upi')
+    assert conn.execute('SELECT COUNT(*) FROM donations').fetchone()[0] == 0
+    conn.close()
+
+def test_unknown_and_unverified_ngos_are_rejected(app):
+    conn = connect_db()
+    conn.execute('UPDATE ngos SET is_verified = FALSE WHERE id = 1')
+    conn.commit()
+    for ngo_id in (1, 999):
+        with pytest.raises(ValueError, match='NGO not found'):
+            record_donation(conn, 'donor@example.com', ngo_id, 100, 'upi')
+    conn.close()
+
+def test_ngo_stats_drift_is_detected_and_rebuilt(app):
+    conn = connect_db()
+    for amount, method in ((100, 'upi'), (250, 'card'), (500, 'upi')):
+        record_donation(conn, 'donor@example.com', 1, amount, method)
+    record_money_usage(conn, 1, 'Winter blankets', 300)
+    assert verify_ngo_stats(conn) == []
+
+    conn.execute('UPDATE ngo_stats SET total_amount = total_amount + 1 WHERE ngo_id = 1')
+    conn.commit()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['verify-ngo-stats'])
+    assert result.exit_code != 0
+    assert verify_ngo_stats(conn) == [1]
+
+    assert runner.invoke(args=['rebuild-ngo-stats']).exit_code == 0
+    assert verify_ngo_stats(conn) == []
+    assert runner.invoke(args=['verify-ngo-stats']).exit_code == 0
+    conn.close()
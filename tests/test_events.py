@@ -0,0 +1,118 @@
+import json
+import time
+
+import pytest
+
+import app as donate
+from app import EventHub, connect_db, get_event_hub, record_donation
+from storage import Event
+
+@pytest.fixture
+def live(app):
+    """A fresh hub for this process, listening to this test's database."""
+    app.config.update(EVENT_POLL_INTERVAL=0.05, EVENT_HEARTBEAT=0.1, EVENT_MAX_STREAMS=2)
+    donate._event_hub = None
+    yield app
+    hub = donate._event_hub
+    donate._event_hub = None
+    if hub is not None:
+        assert hub.stats()['streams'] == 0
+
+def donate_to(ngo_id, amount=100, urgent_requirement_id=None):
+    conn = connect_db()
+    transaction_id = record_donation(conn, 'donor@example.com', ngo_id, amount, 'upi', urgent_requirement_id)
+    conn.close()
+    return transaction_id
+
+def next_events(stream, count, timeout=5):
+    """Read count events off an /events body, skipping the retry line and keep-alives."""
+    events, deadline = [], time.monotonic() + timeout
+    while len(events) < count:
+        assert time.monotonic() < deadline, f'only {len(events)} of {count} events arrived'
+        chunk = next(stream).decode()
+        if chunk.startswith('id:'):
+            fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def open_stream(client):
+    response = client.get('/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    stream = response.iter_encoded()
+    assert next(stream) == b'retry: 3000\n\n'
+    return response, stream
+
+def test_subscribers_get_the_events_of_their_channels(live):
+    hub = EventHub(10)
+    everyone, ngo = hub.subscribe(['urgent'])[0], hub.subscribe(['urgent', 'ngo:1'])[0]
+    events = [Event(1, 'urgent', 'funding', '{}'), Event(2, 'ngo:1', 'donation', '{}'),
+              Event(3, 'ngo:2', 'donation', '{}')]
+    hub.publish(events)
+    assert [everyone.queue.get_nowait().id] == [1] and everyone.queue.empty()
+    assert [ngo.queue.get_nowait().id for _ in range(2)] == [1, 2] and ngo.queue.empty()
+    # A reconnecting client catches up from the buffer, on its own channels only
+    other, backlog = hub.subscribe(['urgent', 'ngo:2'], last_id=1)
+    assert backlog == events[2:]
+    for subscription in (everyone, ngo, other):
+        hub.unsubscribe(subscription)
+
+def test_subscriptions_are_released(live):
+    hub = EventHub(2)
+    first, second = hub.subscribe(['urgent'])[0], hub.subscribe(['urgent'])[0]
+    assert hub.subscribe(['urgent']) == (None, [])
+    hub.unsubscribe(first)
+    # Closing twice does not free a second slot
+    hub.unsubscribe(first)
+    assert hub.stats()['streams'] == 1
+    third = hub.subscribe(['urgent'])[0]
+    assert third is not None and hub.subscribe(['urgent'])[0] is None
+    # A subscriber too far behind is cut off
+    hub.publish([Event(n, 'urgent', 'funding', '{}') for n in range(donate.EVENT_QUEUE_SIZE + 1)])
+    assert second.closed and third.closed
+    assert hub.stats()['streams'] == 0
+
+def test_published_donations_reach_open_subscriptions(live):
+    subscription, _ = get_event_hub().subscribe(['urgent', 'ngo:1'])
+    transaction_id = donate_to(1, 500, urgent_requirement_id=1)
+    received = [subscription.queue.get(timeout=5) for _ in range(2)]
+    assert sorted((event.channel, event.event) for event in received) == [('ngo:1', 'donation'),
+                                                                         ('urgent', 'funding')]
+    data = {event.event: json.loads(event.data) for event in received}
+    assert data['donation']['transaction_id'] == transaction_id
+    assert data['funding'] == {'id': 1, 'amount_raised': 15500, 'amount_needed': 50000, 'is_active': True}
+    get_event_hub().unsubscribe(subscription)
+
+def test_streams_carry_donations_only_to_their_ngo(live, other_ngo):
+    ngo_client = live.test_client()
+    ngo_client.post('/process_login', data={'email': 'ngo@example.com', 'password': 'password123'})
+    ngo_response, ngo_stream = open_stream(ngo_client)
+    public_response, public_stream = open_stream(live.test_client())
+    donate_to(other_ngo)
+    own = donate_to(1)
+    donate_to(1, 100, urgent_requirement_id=1)
+
+    # The other NGO's donation went to neither stream
+    (event, data), *rest = next_events(ngo_stream, 3)
+    assert (event, data['transaction_id']) == ('donation', own)
+    assert sorted(event for event, _ in rest) == ['donation', 'funding']
+    assert next_events(public_stream, 1) == [('funding', {'id': 1, 'amount_raised': 15100,
+                                                          'amount_needed': 50000, 'is_active': True})]
+    ngo_response.close()
+    public_response.close()
+
+def test_disconnected_streams_are_unsubscribed(live):
+    client = live.test_client()
+    first, stream = open_stream(client)
+    second, _ = open_stream(client)
+    # EVENT_MAX_STREAMS are open
+    refused = client.get('/events')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '30'
+    assert get_event_hub().stats()['streams'] == 2
+    assert next(stream) == b': keep-alive\n\n'
+    first.close()
+    second.close()
+    assert get_event_hub().stats()['streams'] == 0
+    third, _ = open_stream(client)
+    third.close()
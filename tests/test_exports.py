@@ -0,0 +1,125 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app import EXPORT_BATCH_SIZE, connect_db, export_batches
+
+TOKEN = 'test-export-token'
+
+def add_donations(conn, rows):
+    conn.executemany('''INSERT INTO donations (transaction_id, donor_email, ngo_id, amount, payment_method, status,
+                                               created_at) VALUES (?, ?, ?, ?, 'upi', 'completed', ?)''', rows)
+    conn.commit()
+
+@pytest.fixture
+def exports(app, other_ngo):
+    app.config['EXPORT_TOKEN'] = TOKEN
+    conn = connect_db()
+    add_donations(conn, [('E-1', 'a@example.com', 1, 100, '2024-01-31 23:59:59'),
+                         ('E-2', 'b@example.com', other_ngo, 200, '2024-02-01 00:00:00'),
+                         ('E-3', 'c@example.com', 1, 300.5, '2024-02-15 12:00:00'),
+                         ('E-4', 'd@example.com', 1, 400, '2024-03-01 00:00:00')])
+    conn.close()
+    return app
+
+def auditor(app):
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {TOKEN}'
+    return client
+
+def logged_in(app, email):
+    client = app.test_client()
+    client.post('/process_login', data={'email': email, 'password': 'password123'})
+    return client
+
+def csv_rows(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+def ndjson_rows(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_csv_export(exports):
+    response = auditor(exports).get('/export/donations')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="donations.csv"'
+    assert response.headers['Cache-Control'] == 'no-store'
+    header = response.get_data(as_text=True).splitlines()[0]
+    assert header == ('id,transaction_id,donor_email,ngo_id,amount,payment_method,status,'
+                      'urgent_requirement_id,created_at')
+    rows = csv_rows(response)
+    assert [row['transaction_id'] for row in rows] == ['E-1', 'E-2', 'E-3', 'E-4']
+    assert (rows[2]['amount'], rows[2]['created_at'], rows[2]['urgent_requirement_id']) == (
+        '300.5', '2024-02-15 12:00:00', '')
+
+def test_ndjson_export_matches_csv(exports):
+    client = auditor(exports)
+    response = client.get('/export/donations?format=ndjson&ngo_id=1')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="donations-ngo1.ndjson"'
+    rows = ndjson_rows(response)
+    assert [(row['transaction_id'], row['amount'], row['ngo_id']) for row in rows] == [
+        ('E-1', 100, 1), ('E-3', 300.5, 1), ('E-4', 400, 1)]
+    assert rows[0]['urgent_requirement_id'] is None
+    assert [{key: str(value) if value is not None else '' for key, value in row.items()} for row in rows] == \
+        csv_rows(client.get('/export/donations?ngo_id=1'))
+
+def test_gzipped_export(exports):
+    client = auditor(exports)
+    response = client.get('/export/donations?format=ndjson&gzip=1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="donations.ndjson.gz"'
+    assert gzip.decompress(response.data) == client.get('/export/donations?format=ndjson').data
+
+def test_date_range_includes_both_days(exports):
+    rows = ndjson_rows(auditor(exports).get('/export/donations?format=ndjson&from=2024-02-01&to=2024-02-29'))
+    assert [row['transaction_id'] for row in rows] == ['E-2', 'E-3']
+
+@pytest.mark.parametrize('query', ['format=xml', 'from=2024-13-01', 'to=yesterday'])
+def test_malformed_requests_are_refused(exports, query):
+    assert auditor(exports).get(f'/export/donations?{query}').status_code == 400
+
+def test_exports_need_the_token_or_an_ngo_login(exports):
+    assert exports.test_client().get('/export/donations').status_code == 403
+    wrong = exports.test_client()
+    wrong.environ_base['HTTP_AUTHORIZATION'] = 'Bearer not-the-token'
+    assert wrong.get('/export/donations').status_code == 403
+    assert logged_in(exports, 'donor@example.com').get('/export/donations').status_code == 403
+    assert auditor(exports).get('/export/payments').status_code == 404
+    exports.config['EXPORT_TOKEN'] = None
+    unset = exports.test_client()
+    unset.environ_base['HTTP_AUTHORIZATION'] = 'Bearer None'
+    assert unset.get('/export/donations').status_code == 403
+
+def test_ngos_export_only_their_own_rows(exports, other_ngo):
+    client = logged_in(exports, 'ngo@example.com')
+    rows = ndjson_rows(client.get(f'/export/donations?format=ndjson&ngo_id={other_ngo}'))
+    assert [row['transaction_id'] for row in rows] == ['E-1', 'E-3', 'E-4']
+    rows = ndjson_rows(logged_in(exports, 'other-ngo@example.com').get('/export/donations?format=ndjson'))
+    assert [row['transaction_id'] for row in rows] == ['E-2']
+
+def test_exports_stream_in_batches(exports):
+    conn = connect_db()
+    add_donations(conn, [(f'S-{n:05}', 'bulk@example.com', 1, 1, '2024-05-01 00:00:00')
+                         for n in range(2 * EXPORT_BATCH_SIZE + 5)])
+    batches = [len(rows) for rows in export_batches(conn, 'donations', ngo_id=1, batch_size=EXPORT_BATCH_SIZE)]
+    conn.close()
+    assert batches == [EXPORT_BATCH_SIZE, EXPORT_BATCH_SIZE, 8]
+
+    response = auditor(exports).get('/export/donations?ngo_id=1', buffered=False)
+    assert response.is_streamed and 'Content-Length' not in response.headers
+    chunks = list(response.iter_encoded())
+    response.close()
+    # The header goes out on its own, then one chunk per batch of rows
+    assert chunks[0].decode().count('\n') == 1
+    assert [chunk.decode().count('\n') for chunk in chunks[1:]] == batches
+
+def test_export_command_writes_the_same_rows(exports, tmp_path):
+    target = tmp_path / 'donations.ndjson'
+    result = exports.test_cli_runner().invoke(args=['export', 'donations', '--ngo-id', '1', '--format', 'ndjson',
+                                                    '--from', '2024-02-01', '-o', str(target)])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)['transaction_id'] for line in target.read_text().splitlines()] == ['E-3', 'E-4']
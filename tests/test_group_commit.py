@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from werkzeug.exceptions import ServiceUnavailable
+
+from app import (DonationWriter, connect_db, get_donation_writer, group_commit_metrics, record_donation,
+                 verify_ngo_stats)
+
+@pytest.fixture
+def group_commit(app):
+    app.config.update(GROUP_COMMIT=True, GROUP_COMMIT_WINDOW=0.05, GROUP_COMMIT_TIMEOUT=5)
+    return app
+
+def test_concurrent_donations_are_committed_in_groups(group_commit):
+    donors, donations = 16, 10
+    conn = connect_db()
+    requirement_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description, amount_needed)
+                                     VALUES (1, 'Spike', 'Spike', 1000000)''').lastrowid
+    conn.commit()
+    commits = group_commit_metrics()['count']
+
+    def donor(n):
+        donor_conn = connect_db()
+        try:
+            # Every other donation also funds the requirement
+            return [record_donation(donor_conn, f'donor{n}@example.com', 1, 10.0, 'upi',
+                                    requirement_id if i % 2 else None) for i in range(donations)]
+        finally:
+            donor_conn.close()
+
+    with ThreadPoolExecutor(donors) as executor:
+        ids = [tid for batch in executor.map(donor, range(donors)) for tid in batch]
+    commits = group_commit_metrics()['count'] - commits
+    stored = {row[0] for row in conn.execute('SELECT transaction_id FROM donations')}
+    assert len(set(ids)) == len(stored) == donors * donations
+    assert stored == set(ids)
+    assert 0 < commits < donors * donations
+    raised = conn.execute('SELECT amount_raised FROM urgent_requirements WHERE id = ?',
+                          (requirement_id,)).fetchone()[0]
+    assert raised == donors * donations * 10 / 2
+    assert verify_ngo_stats(conn) == []
+    conn.close()
+
+def test_a_dead_writer_answers_503_and_is_replaced(group_commit, monkeypatch):
+    group_commit.config['GROUP_COMMIT_TIMEOUT'] = 0.2
+    monkeypatch.setattr(DonationWriter, 'run', lambda self: None)
+    dead = get_donation_writer()
+    dead.thread.join()
+    conn = connect_db()
+    with pytest.raises(ServiceUnavailable):
+        record_donation(conn, 'donor@example.com', 1, 100, 'upi')
+    monkeypatch.undo()
+    writer = get_donation_writer()
+    assert writer is not dead and writer.thread.is_alive()
+    transaction_id = record_donation(conn, 'donor@example.com', 1, 100, 'upi')
+    assert [row[0] for row in conn.execute('SELECT transaction_id FROM donations')] == [transaction_id]
+    conn.close()
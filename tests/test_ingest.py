@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from app import connect_db
+
+TOKEN = 'test-ingest-token'
+
+def donation(transaction_id, **fields):
+    record = {'donor_email': 'partner@example.com', 'ngo_id': 1, 'amount': 100, 'payment_method': 'upi',
+              'transaction_id': transaction_id}
+    record.update(fields)
+    return record
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+def ingest(client, body, token=TOKEN, **query):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return client.post('/api/donations/bulk', query_string={'format': 'ndjson', **query}, data=body,
+                       headers=headers)
+
+@pytest.fixture
+def client(app):
+    app.config['INGEST_TOKEN'] = TOKEN
+    return app.test_client()
+
+def stored(*columns):
+    conn = connect_db()
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM donations ORDER BY transaction_id").fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+@pytest.mark.parametrize('token', [None, 'wrong-token', TOKEN[:-1]])
+def test_requests_without_the_token_are_refused(client, token):
+    assert ingest(client, ndjson(donation('T-1')), token).status_code == 403
+    assert stored('transaction_id') == []
+
+def test_nothing_is_accepted_while_no_token_is_configured(app):
+    app.config['INGEST_TOKEN'] = None
+    assert ingest(app.test_client(), ndjson(donation('T-1')), token='None').status_code == 403
+
+def test_duplicate_transaction_ids_are_skipped(client):
+    body = ndjson(donation('T-1'), donation('T-2'), donation('T-1'))
+    report = ingest(client, body).get_json()
+    assert (report['inserted'], report['duplicates']) == (2, 1)
+    # Running the same import again changes nothing
+    report = ingest(client, body).get_json()
+    assert (report['inserted'], report['duplicates']) == (0, 3)
+    assert stored('transaction_id') == [('T-1',), ('T-2',)]
+
+def test_invalid_rows_are_reported_and_the_rest_stored(client, other_ngo):
+    conn = connect_db()
+    other_ngo_requirement = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description,
+                                             amount_needed) VALUES (?, 'Other', 'Other', 10)''',
+                                         (other_ngo,)).lastrowid
+    conn.commit()
+    conn.close()
+    body = ndjson(donation('T-1'), donation('T-2', donor_email='nobody'), donation('T-3', amount='-1'),
+                  donation('T-4', amount='NaN'), donation('T-5', ngo_id=999), donation('T-6', status='refunded'),
+                  donation('T-7', created_at='yesterday'), donation('T-8', urgent_requirement_id=other_ngo_requirement),
+                  donation(''), donation('T-9')) + '{not json\n'
+    report = ingest(client, body).get_json()
+    assert (report['read'], report['inserted'], report['rejected']) == (11, 2, 9)
+    reasons = {reject['record']: reject['reason'] for reject in report['rejects']}
+    assert reasons == {2: 'invalid donor_email', 3: 'amount must be a positive number',
+                       4: 'amount must be a positive number', 5: 'unknown ngo_id',
+                       6: 'status must be one of pending, completed, failed',
+                       7: 'created_at must be an ISO date/time',
+                       8: 'urgent_requirement_id does not belong to ngo_id', 9: 'missing transaction_id',
+                       11: 'invalid JSON'}
+    assert stored('transaction_id') == [('T-1',), ('T-9',)]
+
+def test_partial_chunks_are_written(client):
+    # Seven rows in chunks of three: two full chunks and a partial one
+    body = ndjson(*[donation(f'T-{n}') for n in range(6)], donation('T-bad', amount='x'))
+    report = ingest(client, body, chunk_size=3).get_json()
+    assert (report['read'], report['inserted'], report['rejected']) == (7, 6, 1)
+    assert len(stored('transaction_id')) == 6
+
+def test_imports_credit_their_requirement(client):
+    body = ndjson(donation('T-1', amount=500, urgent_requirement_id=1),
+                  donation('T-2', amount=700, urgent_requirement_id=1, status='pending'))
+    assert ingest(client, body).get_json()['inserted'] == 2
+    conn = connect_db()
+    assert conn.execute('SELECT amount_raised FROM urgent_requirements WHERE id = 1').fetchone()[0] == 15500
+    conn.close()
+
+def test_created_at_is_stored_in_utc(client):
+    body = ndjson(donation('T-1', created_at='2024-03-01T10:30:00+05:30'),
+                  donation('T-2', created_at='2024-03-01T10:30:00'))
+    ingest(client, body)
+    assert stored('transaction_id', 'created_at') == [('T-1', '2024-03-01 05:00:00'), ('T-2', '2024-03-01 10:30:00')]
+
+def test_import_command_reads_csv(app, tmp_path):
+    source = tmp_path / 'donations.csv'
+    source.write_text('donor_email,ngo_id,amount,payment_method,transaction_id\n'
+                      'a@example.com,1,100,upi,T-1\n'
+                      'b@example.com,1,abc,upi,T-2\n'
+                      'a@example.com,1,100,upi,T-1\n')
+    result = app.test_cli_runner().invoke(args=['import-donations', str(source)])
+    assert result.exit_code == 0, result.output
+    assert '1 inserted, 1 duplicates, 1 rejected' in result.output
+    assert stored('transaction_id') == [('T-1',)]
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app import claim_job, connect_db, enqueue_job, work_jobs
+
+class NitiAayogStub(ThreadingHTTPServer):
+    """A local stand-in for the NITI Aayog API that records the IDs it is asked about."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), NitiAayogHandler)
+        self.verified_ids = {'MH/2020/0123456'}
+        self.failures = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/verify'
+
+class NitiAayogHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        self.server.requests.append(query)
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({'verified': query.get('id') in self.server.verified_ids}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def niti(app):
+    stub = NitiAayogStub()
+    thread = threading.Thread(target=stub.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    app.config.update(NITI_AAYOG_API_URL=stub.url, NITI_AAYOG_TIMEOUT=5, JOB_RETRY_BASE=30, JOB_MAX_ATTEMPTS=3)
+    conn = connect_db()
+    conn.execute('UPDATE ngos SET is_verified = FALSE')
+    conn.commit()
+    conn.close()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+def queue_verification(*ngo_ids):
+    conn = connect_db()
+    enqueue_job(conn, 'verify_ngos', {'ngo_ids': list(ngo_ids)})
+    conn.commit()
+    conn.close()
+
+def job_state():
+    conn = connect_db()
+    row = conn.execute('SELECT status, attempts, run_after, last_error FROM jobs').fetchone()
+    conn.close()
+    return tuple(row)
+
+def ngo_verified(ngo_id):
+    conn = connect_db()
+    is_verified = conn.execute('SELECT is_verified FROM ngos WHERE id = ?', (ngo_id,)).fetchone()[0]
+    conn.close()
+    return bool(is_verified)
+
+def test_verification_updates_ngos_and_caches_results(niti, other_ngo):
+    queue_verification(1, other_ngo)
+    assert work_jobs(burst=True) == (1, 0)
+    assert (ngo_verified(1), ngo_verified(other_ngo)) == (True, False)
+    assert sorted((query['id'], query['name']) for query in niti.requests) == [
+        ('MH/2020/0123456', 'Hope Foundation'), ('MH/2021/0654321', 'Other Trust')]
+    assert job_state()[:2] == ('done', 1)
+    # A second job answers from the cached results without calling the API
+    queue_verification(1, other_ngo)
+    assert work_jobs(burst=True) == (1, 0)
+    assert len(niti.requests) == 2
+
+def test_failed_verification_is_retried_with_backoff(app, niti):
+    niti.failures = 1
+    queue_verification(1)
+    started = time.time()
+    assert work_jobs(burst=True) == (0, 1)
+    status, attempts, run_after, last_error = job_state()
+    assert (status, attempts) == ('queued', 1)
+    assert started + 30 <= run_after <= time.time() + 30 * 1.5
+    assert '503' in last_error
+    assert not ngo_verified(1)
+    # Nothing runs before the backoff has passed
+    assert work_jobs(burst=True) == (0, 0)
+
+    conn = connect_db()
+    conn.execute('UPDATE jobs SET run_after = ?', (time.time(),))
+    conn.commit()
+    conn.close()
+    assert work_jobs(burst=True) == (1, 0)
+    assert job_state()[:2] == ('done', 2)
+    assert ngo_verified(1)
+
+def test_backoff_doubles_until_the_job_fails(app, niti):
+    niti.failures = 3
+    queue_verification(1)
+    conn = connect_db()
+    for attempt in range(1, 4):
+        started = time.time()
+        assert work_jobs(burst=True) == (0, 1)
+        status, attempts, run_after, _ = job_state()
+        assert attempts == attempt
+        if attempt < 3:
+            backoff = 30 * 2 ** (attempt - 1)
+            assert status == 'queued'
+            assert started + backoff <= run_after <= time.time() + backoff * 1.5
+            conn.execute('UPDATE jobs SET run_after = ?', (time.time(),))
+            conn.commit()
+    conn.close()
+    # JOB_MAX_ATTEMPTS is spent: the job stays failed
+    assert job_state()[0] == 'failed'
+    assert work_jobs(burst=True) == (0, 0)
+    assert len(niti.requests) == 3
+
+def test_jobs_of_a_crashed_worker_are_picked_up_after_the_lease(app, niti):
+    app.config['JOB_LEASE'] = 600
+    queue_verification(1)
+    # A worker claims the job and dies before finishing it
+    conn = connect_db()
+    assert claim_job(conn) is not None
+    conn.close()
+    assert job_state()[:2] == ('running', 1)
+    assert work_jobs(burst=True) == (0, 0)
+    assert niti.requests == []
+
+    conn = connect_db()
+    conn.execute('UPDATE jobs SET updated_at = ?', (time.time() - 601,))
+    conn.commit()
+    conn.close()
+    assert work_jobs(burst=True) == (1, 0)
+    assert job_state()[:2] == ('done', 2)
+    assert ngo_verified(1)
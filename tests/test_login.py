@@ -0,0 +1,95 @@
+import pytest
+from werkzeug.security import check_password_hash
+
+from app import connect_db, needs_rehash
+
+def log_in(client, email='donor@example.com', password='password123'):
+    """Post the login form; returns True when the session is logged in."""
+    client.post('/process_login', data={'email': email, 'password': password})
+    with client.session_transaction() as session:
+        logged_in = 'user_id' in session
+        session.clear()
+    return logged_in
+
+def stored_hash(email='donor@example.com'):
+    conn = connect_db()
+    password = conn.execute('SELECT password FROM users WHERE email = ?', (email,)).fetchone()[0]
+    conn.close()
+    return password
+
+def age_failures(seconds):
+    conn = connect_db()
+    conn.execute('UPDATE login_failures SET window_start = window_start - ?', (seconds,))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def client(app):
+    app.config.update(LOGIN_MAX_FAILURES=3, LOGIN_MAX_FAILURES_PER_IP=50, LOGIN_FAILURE_WINDOW=900)
+    return app.test_client()
+
+def test_repeated_failures_lock_the_account(client):
+    for _ in range(3):
+        assert not log_in(client, password='wrong')
+    # Even the right password is refused now, without being checked
+    client.post('/process_login', data={'email': 'donor@example.com', 'password': 'password123'})
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+        assert session['_flashes'][-1][1].startswith('Too many failed login attempts')
+    # Other accounts are not affected
+    assert log_in(client, 'ngo@example.com')
+
+def test_lockout_ends_with_the_window(client):
+    for _ in range(3):
+        log_in(client, password='wrong')
+    assert not log_in(client)
+    age_failures(901)
+    assert log_in(client)
+
+def test_failures_outside_the_window_start_a_new_count(client):
+    for _ in range(2):
+        log_in(client, password='wrong')
+    age_failures(901)
+    # Two old failures and one new one are not enough for a lockout
+    log_in(client, password='wrong')
+    assert log_in(client)
+
+def test_a_successful_login_resets_the_count(client):
+    for _ in range(2):
+        log_in(client, password='wrong')
+    assert log_in(client)
+    for _ in range(2):
+        log_in(client, password='wrong')
+    assert log_in(client)
+
+def test_failures_from_one_address_are_throttled(app, client):
+    app.config['LOGIN_MAX_FAILURES_PER_IP'] = 4
+    for n in range(4):
+        log_in(client, f'user{n}@example.com', 'wrong')
+    assert not log_in(client)
+    other_address = app.test_client()
+    other_address.environ_base['REMOTE_ADDR'] = '192.0.2.10'
+    assert log_in(other_address)
+
+def test_outdated_hashes_are_upgraded_on_login(app, client):
+    old = stored_hash()
+    assert old.startswith('pbkdf2:sha256:1000$')
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+    # A failed login leaves the hash alone
+    assert not log_in(client, password='wrong')
+    assert stored_hash() == old
+    assert log_in(client)
+    new = stored_hash()
+    assert new.startswith('pbkdf2:sha256:2000$')
+    assert check_password_hash(new, 'password123')
+    # A current hash is kept as it is
+    assert log_in(client)
+    assert stored_hash() == new
+
+def test_hash_methods_compare_with_their_defaults_filled_in(app):
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2'
+    assert not needs_rehash('pbkdf2:sha256:600000$salt$hash')
+    assert needs_rehash('pbkdf2:sha256:1000$salt$hash')
+    assert needs_rehash('scrypt:32768:8:1$salt$hash')
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+    assert not needs_rehash('scrypt:32768:8:1$salt$hash')
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from app import (connect_db, fund_balance, rebuild_fund_utilization, record_donation, record_money_usage,
+                 utilization_report, verify_ngo_stats)
+
+def add_donation(conn, transaction_id, amount, created_at, status='completed', ngo_id=1):
+    conn.execute('''INSERT INTO donations (donor_email, ngo_id, amount, payment_method, transaction_id, status,
+                                           created_at) VALUES ('donor@example.com', ?, ?, 'upi', ?, ?, ?)''',
+                 (ngo_id, amount, transaction_id, status, created_at))
+
+def add_usage(conn, amount, created_at, ngo_id=1):
+    return conn.execute('''INSERT INTO money_usage (ngo_id, description, amount_used, created_at)
+                             VALUES (?, 'Supplies', ?, ?)''', (ngo_id, amount, created_at)).lastrowid
+
+def ledger_totals(conn, ngo_id):
+    received = conn.execute('''SELECT COALESCE(SUM(amount), 0) FROM donations
+                               WHERE ngo_id = ? AND status = 'completed' ''', (ngo_id,)).fetchone()[0]
+    used = conn.execute('SELECT COALESCE(SUM(amount_used), 0) FROM money_usage WHERE ngo_id = ?',
+                        (ngo_id,)).fetchone()[0]
+    return round(received, 2), round(used, 2), round(received - used, 2)
+
+@pytest.fixture
+def conn(app):
+    conn = connect_db()
+    yield conn
+    conn.close()
+
+def test_spending_more_than_the_balance_is_refused(conn):
+    with pytest.raises(ValueError, match='Only ₹0.00'):
+        record_money_usage(conn, 1, 'Blankets', 1)
+    record_donation(conn, 'donor@example.com', 1, 1000, 'upi')
+    record_money_usage(conn, 1, 'Blankets', 600)
+    with pytest.raises(ValueError, match='Only ₹400.00'):
+        record_money_usage(conn, 1, 'Rice', 400.01)
+    record_money_usage(conn, 1, 'Rice', 400)
+    assert fund_balance(conn.cursor(), 1) == (1000, 1000, 0)
+    assert conn.execute('SELECT COUNT(*) FROM money_usage').fetchone()[0] == 2
+
+def test_spending_against_a_donation_is_limited_to_that_donation(conn):
+    record_donation(conn, 'donor@example.com', 1, 1000, 'upi')
+    small = record_donation(conn, 'donor@example.com', 1, 500, 'upi')
+    add_donation(conn, 'PENDING-1', 800, '2024-01-01 10:00:00', status='pending')
+    conn.commit()
+    with pytest.raises(ValueError, match='Only ₹500.00 of that donation'):
+        record_money_usage(conn, 1, 'Medicines', 700, small)
+    record_money_usage(conn, 1, 'Medicines', 300, small)
+    with pytest.raises(ValueError, match='Only ₹200.00 of that donation'):
+        record_money_usage(conn, 1, 'Medicines', 300, small)
+    for transaction_id in ('PENDING-1', 'UNKNOWN'):
+        with pytest.raises(ValueError, match='No completed donation'):
+            record_money_usage(conn, 1, 'Medicines', 10, transaction_id)
+    assert fund_balance(conn.cursor(), 1) == (1500, 300, 1200)
+
+def test_concurrent_spending_cannot_overdraw(app, conn):
+    record_donation(conn, 'donor@example.com', 1, 1000, 'upi')
+
+    def spend(n):
+        spend_conn = connect_db()
+        try:
+            return record_money_usage(spend_conn, 1, f'Expense {n}', 100)
+        except ValueError:
+            return None
+        finally:
+            spend_conn.close()
+
+    with ThreadPoolExecutor(8) as executor:
+        recorded = [usage_id for usage_id in executor.map(spend, range(20)) if usage_id]
+    assert len(recorded) == 10
+    assert fund_balance(conn.cursor(), 1) == ledger_totals(conn, 1) == (1000, 1000, 0)
+
+def test_api_refuses_an_overdraft(app, conn):
+    record_donation(conn, 'donor@example.com', 1, 250, 'upi')
+    client = app.test_client()
+    client.post('/process_login', data={'email': 'ngo@example.com', 'password': 'password123'})
+    response = client.post('/api/money_usage', json={'description': 'Tents', 'amount_used': 300})
+    assert response.status_code == 400
+    assert 'Only ₹250.00' in response.get_json()['error']
+    response = client.post('/api/money_usage', json={'description': 'Tents', 'amount_used': 200})
+    assert response.status_code == 201
+    assert response.get_json()['balance'] == 50
+
+def test_reports_carry_a_running_balance(app, conn):
+    add_donation(conn, 'JAN-1', 1000, '2024-01-05 09:00:00')
+    add_donation(conn, 'JAN-2', 200, '2024-01-20 09:00:00', status='failed')
+    add_usage(conn, 200, '2024-01-25 12:00:00')
+    add_donation(conn, 'FEB-1', 500, '2024-02-10 09:00:00')
+    add_usage(conn, 900, '2024-02-11 12:00:00')
+    add_usage(conn, 100, '2024-04-02 12:00:00')
+    conn.commit()
+    report = utilization_report(conn.cursor(), 1, 'month')
+    assert [tuple(row) for row in report] == [('2024-01', 1000, 1, 200, 1, 0.2, 800),
+                                              ('2024-02', 500, 1, 900, 1, 1.8, 400),
+                                              ('2024-04', 0, 0, 100, 1, None, 300)]
+    # A report that starts later opens with the balance carried over
+    later = utilization_report(conn.cursor(), 1, 'month', start=date(2024, 2, 1), end=date(2024, 2, 29))
+    assert [(row.period, row.balance) for row in later] == [('2024-02', 400)]
+    yearly = app.test_client().get('/api/ngos/1/utilization?period=year').get_json()
+    assert (yearly['received'], yearly['used'], yearly['balance']) == (1500, 1200, 300)
+    assert [(row['period'], row['balance']) for row in yearly['periods']] == [('2024', 300)]
+
+def test_rollups_agree_with_the_ledger(conn, other_ngo):
+    for n in range(12):
+        add_donation(conn, f'T-{n}', 100 + n, f'2024-0{n % 3 + 1}-1{n % 7} 10:00:00',
+                     status=('completed', 'completed', 'pending', 'failed')[n % 4], ngo_id=(1, other_ngo)[n % 2])
+    usage_ids = [add_usage(conn, 10 + n, f'2024-0{n % 3 + 1}-2{n} 10:00:00', ngo_id=(1, other_ngo)[n % 2])
+                 for n in range(6)]
+    conn.commit()
+    # Status changes, corrections and deletions go through the same triggers
+    conn.execute("UPDATE donations SET status = 'completed' WHERE transaction_id = 'T-2'")
+    conn.execute("UPDATE donations SET status = 'failed', amount = 1 WHERE transaction_id = 'T-1'")
+    conn.execute("UPDATE donations SET created_at = '2024-03-30 10:00:00' WHERE transaction_id = 'T-5'")
+    conn.execute('UPDATE money_usage SET amount_used = 5, created_at = ? WHERE id = ?',
+                 ('2024-03-01 10:00:00', usage_ids[0]))
+    conn.execute('DELETE FROM money_usage WHERE id = ?', (usage_ids[1],))
+    conn.execute("DELETE FROM donations WHERE transaction_id = 'T-4'")
+    conn.commit()
+
+    assert verify_ngo_stats(conn) == []
+    for ngo_id in (1, other_ngo):
+        totals = ledger_totals(conn, ngo_id)
+        assert fund_balance(conn.cursor(), ngo_id) == totals
+        report = utilization_report(conn.cursor(), ngo_id, 'day')
+        assert round(sum(row.received for row in report), 2) == totals[0]
+        assert round(sum(row.used for row in report), 2) == totals[1]
+        assert report[-1].balance == totals[2]
+
+    rollups = 'SELECT * FROM ngo_daily_stats WHERE donation_count > 0 OR usage_count > 0 ORDER BY ngo_id, day'
+    before = [tuple(row) for row in conn.execute(rollups)]
+    rebuild_fund_utilization(conn)
+    conn.commit()
+    assert [tuple(row) for row in conn.execute(rollups)] == before
@@ -0,0 +1,35 @@
+import pytest
+
+from app import connect_db, encode_cursor, invalidate_tags
+
+PAGED = ['/stories', '/api/stories', '/urgent_requirements', '/api/urgent_requirements']
+
+def test_cursors_page_through_a_listing(app):
+    conn = connect_db()
+    conn.executemany('INSERT INTO stories (ngo_id, title, content, is_approved) VALUES (1, ?, ?, TRUE)',
+                     [(f'Story {n}', 'Content') for n in range(4)])
+    invalidate_tags(conn, 'stories')
+    conn.commit()
+    conn.close()
+    client = app.test_client()
+    seen, cursor = [], None
+    while True:
+        page = client.get('/api/stories', query_string={'limit': 2, 'cursor': cursor or ''}).get_json()
+        seen += [item['id'] for item in page['items']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 json', encode_cursor(1), encode_cursor(1, 2, 3), encode_cursor([1], {'a': 2}),
+    encode_cursor('2024-01-01', 'x'), encode_cursor('2024-01-01', True), encode_cursor('2024-01-01', 2 ** 64),
+])
+@pytest.mark.parametrize('path', PAGED)
+def test_malformed_cursors_are_rejected(app, path, cursor):
+    assert app.test_client().get(path, query_string={'cursor': cursor}).status_code == 400
+
+def test_search_cursors_need_a_numeric_rank(app):
+    client = app.test_client()
+    for cursor, status in ((encode_cursor(-1.5, 1), 200), (encode_cursor('best', 1), 400)):
+        assert client.get('/api/search', query_string={'q': 'water', 'cursor': cursor}).status_code == status
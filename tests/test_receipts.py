@@ -0,0 +1,90 @@
+import os
+import re
+
+import pytest
+
+from app import connect_db, pdf_canvas, receipt_path
+
+DONATIONS = [
+    # transaction_id, donor, ngo, amount, status, created_at
+    ('R-1', 'donor@example.com', 1, 1000, 'completed', '2023-01-15 10:00:00'),
+    ('R-2', 'donor@example.com', 1, 250.5, 'completed', '2023-06-30 23:59:59'),
+    ('R-3', 'donor@example.com', 2, 0.1, 'completed', '2023-07-01 08:00:00'),
+    ('R-4', 'donor@example.com', 2, 0.2, 'completed', '2023-12-31 23:59:59'),
+    ('R-5', 'donor@example.com', 1, 999, 'pending', '2023-03-01 10:00:00'),
+    ('R-6', 'donor@example.com', 1, 777, 'failed', '2023-03-02 10:00:00'),
+    ('R-7', 'donor@example.com', 1, 5000, 'completed', '2022-12-31 23:59:59'),
+    ('R-8', 'donor@example.com', 1, 6000, 'completed', '2024-01-01 00:00:00'),
+    ('R-9', 'someone@example.com', 1, 300, 'completed', '2023-05-05 10:00:00'),
+]
+
+@pytest.fixture
+def donations(app, other_ngo):
+    assert other_ngo == 2
+    app.config['RECEIPT_FORMATS'] = ('html', 'pdf') if pdf_canvas else ('html',)
+    conn = connect_db()
+    conn.executemany('''INSERT INTO donations (transaction_id, donor_email, ngo_id, amount, payment_method, status,
+                                               created_at) VALUES (?, ?, ?, ?, 'upi', ?, ?)''', DONATIONS)
+    conn.commit()
+    conn.close()
+    return app
+
+def receipt_files(app):
+    """Every rendered file under RECEIPT_DIR with its contents and modification time."""
+    root = app.config['RECEIPT_DIR']
+    files = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, root)] = (f.read(), os.stat(path).st_mtime_ns)
+    return files
+
+def generate(app, *args):
+    result = app.test_cli_runner().invoke(args=['generate-receipts', '--year', '2023', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+def test_a_year_end_run_renders_each_receipt_once(donations):
+    generate(donations, '--batch-size', '2')
+    files = receipt_files(donations)
+    # Four completed donations by donor@, one by someone@, and a statement each
+    expected = [receipt_path('donation', '2023', tid) for tid in ('R-1', 'R-2', 'R-3', 'R-4', 'R-9')]
+    expected += [receipt_path('annual', 2023, donor) for donor in ('donor@example.com', 'someone@example.com')]
+    assert sorted(files) == sorted(f'{path}.{fmt}' for path in expected
+                                   for fmt in donations.config['RECEIPT_FORMATS'])
+
+    # A second run leaves every file alone
+    generate(donations)
+    assert receipt_files(donations) == files
+    # A forced run writes them again, byte for byte the same
+    generate(donations, '--force')
+    again = receipt_files(donations)
+    assert {path: data for path, (data, _) in again.items()} == {path: data for path, (data, _) in files.items()}
+    assert all(again[path][1] >= files[path][1] for path in files)
+
+def test_annual_statement_totals(donations):
+    client = donations.test_client()
+    client.post('/process_login', data={'email': 'donor@example.com', 'password': 'password123'})
+    html = client.get('/receipts/annual/2023').get_data(as_text=True)
+    rows = re.findall(r'<tr><td>([^<]+)</td><td>[^<]+</td><td>(\d+)</td><td class="money">₹([\d.]+)</td></tr>', html)
+    assert rows == [('Hope Foundation', '2', '1250.50'), ('Other Trust', '2', '0.30')]
+    assert re.search(r'<td colspan="2">Total</td><td>(\d+)</td><td class="money">₹([\d.]+)</td>',
+                     html).groups() == ('4', '1250.80')
+    for transaction_id in ('R-1', 'R-2', 'R-3', 'R-4'):
+        assert transaction_id in html
+    for transaction_id in ('R-5', 'R-6', 'R-7', 'R-8', 'R-9'):
+        assert transaction_id not in html
+    # The statement served on request is the one a year-end run keeps
+    generate(donations, '--kind', 'annual')
+    assert client.get('/receipts/annual/2023').get_data(as_text=True) == html
+
+def test_receipts_are_only_served_to_their_donor(donations):
+    client = donations.test_client()
+    client.post('/process_login', data={'email': 'donor@example.com', 'password': 'password123'})
+    response = client.get('/receipts/R-1')
+    assert response.status_code == 200
+    assert 'R-1' in response.get_data(as_text=True)
+    assert response.cache_control.private
+    for path in ('/receipts/R-9', '/receipts/R-5', '/receipts/UNKNOWN', '/receipts/annual/2021'):
+        assert client.get(path).status_code == 404
@@ -0,0 +1,20 @@
+import pytest
+
+@pytest.mark.parametrize('path', ['/', '/stories', '/urgent_requirements', '/api/stories',
+                                  '/api/urgent_requirements', '/search?q=hope', '/api/search?q=hope',
+                                  '/api/ngos/1/money_usage', '/api/ngos/1/utilization?period=month'])
+def test_public_pages(app, path):
+    assert app.test_client().get(path).status_code == 200
+
+def test_donor_and_ngo_pages(app):
+    client = app.test_client()
+    client.post('/process_login', data={'email': 'donor@example.com', 'password': 'password123'})
+    response = client.post('/process_donation', data={'ngo_id': '1', 'amount': '500', 'payment_method': 'upi'})
+    assert response.status_code == 302
+    for path in ['/donor_dashboard', '/ngo_details/1', '/donate/1', '/receipts']:
+        assert client.get(path).status_code == 200, path
+    client.get('/logout')
+    client.post('/process_login', data={'email': 'ngo@example.com', 'password': 'password123'})
+    for path in ['/ngo_dashboard', '/api/donations', '/export/donations']:
+        assert client.get(path).status_code == 200, path
+    assert b'500' in client.get('/api/donations').data
@@ -0,0 +1,19 @@
+import pytest
+
+from app import connect_db, migrate
+
+def test_migrations_apply_once(database):
+    conn = connect_db(database)
+    try:
+        old, new = migrate(conn)
+        assert (old, new) == (0, len(conn.backend.migrations))
+        assert migrate(conn) == (new, new)
+    finally:
+        conn.close()
+
+# check-query-plans reads SQLite's query plans
+@pytest.mark.parametrize('database', ['sqlite'], indirect=True)
+def test_route_queries_use_an_index(app):
+    result = app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 0, result.output
+    assert 'All route queries use an index' in result.output
@@ -0,0 +1,100 @@
+import pytest
+
+from app import connect_db, rebuild_search_index
+
+def search(app, q=None, location=None, kinds=()):
+    response = app.test_client().get('/api/search', query_string={'q': q, 'location': location, 'type': kinds})
+    assert response.status_code == 200
+    return sorted((item['type'], item['id']) for item in response.get_json()['items'])
+
+@pytest.fixture
+def conn(app):
+    conn = connect_db()
+    yield conn
+    conn.close()
+
+def test_new_rows_are_indexed(app, conn, other_ngo):
+    assert search(app, 'trust') == [('ngo', other_ngo)]
+    story_id = conn.execute('''INSERT INTO stories (ngo_id, title, content, is_approved)
+                               VALUES (?, 'Solar lanterns', 'Lanterns for night classes', TRUE)''',
+                            (other_ngo,)).lastrowid
+    urgent_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description, amount_needed)
+                                VALUES (?, 'Lantern batteries', 'Spare batteries', 1000)''',
+                             (other_ngo,)).lastrowid
+    conn.commit()
+    assert search(app, 'lantern') == [('story', story_id), ('urgent', urgent_id)]
+    assert search(app, 'lantern', kinds=['urgent']) == [('urgent', urgent_id)]
+    # Stories and requirements are found by their NGO's location
+    assert search(app, 'lantern', 'pune') == [('story', story_id), ('urgent', urgent_id)]
+    assert search(app, 'lantern', 'mumbai') == []
+
+def test_updates_replace_the_indexed_text(app, conn):
+    conn.execute("UPDATE stories SET title = 'Wells dug in Latur', content = 'Three new borewells' WHERE id = 1")
+    conn.execute("UPDATE urgent_requirements SET description = 'Tarpaulins and blankets' WHERE id = 1")
+    conn.execute("UPDATE ngos SET org_name = 'Hope Trust', location = 'Nashik, Maharashtra' WHERE id = 1")
+    conn.commit()
+    assert search(app, 'water') == []
+    assert search(app, 'borewells') == [('story', 1)]
+    assert search(app, 'tarpaulins') == [('urgent', 1)]
+    assert search(app, 'foundation') == []
+    assert search(app, 'hope trust') == [('ngo', 1)]
+    # A new location reaches the NGO's stories and requirements too
+    assert search(app, location='nashik') == [('ngo', 1), ('story', 1), ('urgent', 1)]
+    assert search(app, location='mumbai') == []
+
+def test_deleted_rows_leave_the_index(app, conn, other_ngo):
+    conn.execute('DELETE FROM stories WHERE id = 1')
+    conn.execute('DELETE FROM ngos WHERE id = ?', (other_ngo,))
+    conn.commit()
+    assert search(app, 'purification') == []
+    assert search(app, 'trust') == []
+    assert search(app, 'water') == [('urgent', 1)]
+
+def test_hidden_rows_stay_indexed_but_are_not_found(app, conn):
+    conn.execute('UPDATE stories SET is_approved = FALSE')
+    conn.execute('UPDATE urgent_requirements SET is_active = FALSE')
+    conn.execute('UPDATE ngos SET is_verified = FALSE')
+    conn.commit()
+    assert search(app, location='mumbai') == []
+    conn.execute('UPDATE stories SET is_approved = TRUE')
+    conn.commit()
+    assert search(app, location='mumbai') == [('story', 1)]
+
+def test_rebuild_matches_the_triggers(app, conn, other_ngo):
+    conn.execute("UPDATE ngos SET location = 'Nagpur' WHERE id = 1")
+    conn.execute("UPDATE urgent_requirements SET title = 'Flood relief kits' WHERE id = 1")
+    conn.commit()
+    queries = [('kits', None), (None, 'nagpur'), ('water', None), ('trust', 'pune'), ('relief', 'nagpur')]
+    before = [search(app, q, location) for q, location in queries]
+    rebuild_search_index(conn)
+    conn.commit()
+    assert [search(app, q, location) for q, location in queries] == before
+    assert before[0] == before[4] == [('urgent', 1)]
+
+def test_words_match_as_prefixes(app):
+    assert search(app, 'purif') == search(app, 'PURIFICATION') == [('story', 1)]
+    assert search(app, 'wat') == [('story', 1), ('urgent', 1)]
+    assert search(app, 'clean fam') == [('story', 1), ('urgent', 1)]
+    assert search(app, 'clean water purif') == [('story', 1)]
+    assert search(app, 'clean drought') == []
+
+@pytest.mark.parametrize('q', ['"', '*', '()', ':', '^', '-', '+', "'", '\\', '{}', 'AND', 'OR', 'NOT',
+                               'NEAR', 'AND OR NOT', 'NEAR(water families)', '"water', 'water"*', 'title:water',
+                               'water OR flood', 'water -clean', "water's", '_', 'water_', 'NULL', '💧'])
+def test_query_syntax_is_taken_literally(app, q):
+    client = app.test_client()
+    for path in ('/api/search', '/search'):
+        for params in ({'q': q}, {'location': q}, {'q': 'water', 'location': q}):
+            assert client.get(path, query_string=params).status_code in (200, 400)
+    client.post('/process_login', data={'email': 'donor@example.com', 'password': 'password123'})
+    assert client.get('/donor_dashboard', query_string={'q': q}).status_code == 200
+
+@pytest.mark.parametrize('q', ['"', '*()', ' -+^ ', '\'\''])
+def test_queries_without_words_are_refused(app, q):
+    assert app.test_client().get('/api/search', query_string={'q': q}).status_code == 400
+    assert app.test_client().get('/search', query_string={'q': q}).status_code == 200
+
+@pytest.mark.parametrize('q, expected', [('"purification', [('story', 1)]), ('title:water', []),
+                                         ('water OR flood', []), ('NEAR(water families)', [])])
+def test_operators_are_searched_as_words(app, q, expected):
+    assert search(app, q) == expected
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import tooling
+from app import connect_db
+
+def count(table):
+    conn = connect_db()
+    total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    return total
+
+def test_app_does_not_load_tooling():
+    """Web workers import app only; the benchmark and seed code stays out of them."""
+    code = 'import sys, app; print("tooling" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+def test_tooling_registers_its_commands(app):
+    for name in ('seed', 'bench-routes', 'bench-login', 'bench-rows', 'stress-donations'):
+        assert name in app.cli.commands
+    assert app.cli.commands['seed'] is tooling.synthetic.cli.commands['seed']
+
+def test_seed_adds_synthetic_rows(app):
+    ngos, donations = count('ngos'), count('donations')
+    result = app.test_cli_runner().invoke(args=['seed', '--ngos', '5', '--donations', '200', '--stories', '10',
+                                                '--requirements', '5', '--no-demo'])
+    assert result.exit_code == 0, result.output
+    assert count('ngos') == ngos + 5
+    assert count('donations') == donations + 200
@@ -0,0 +1,43 @@
+import multiprocessing
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import TransactionIdGenerator, new_transaction_id
+
+TRANSACTION_ID = re.compile(r'[0-9A-HJKMNP-TV-Z]{26}')
+
+def generate(count):
+    return [new_transaction_id() for _ in range(count)]
+
+def test_ids_are_well_formed_and_sorted():
+    ids = generate(1000)
+    assert all(TRANSACTION_ID.fullmatch(tid) for tid in ids)
+    assert ids == sorted(ids)
+
+def test_ids_are_unique_across_threads_and_processes():
+    with ThreadPoolExecutor(8) as executor:
+        batches = list(executor.map(generate, [5000] * 8))
+    # Forked, like gunicorn workers: each child must take its own node
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        batches += pool.map(generate, [5000] * 4)
+    ids = [tid for batch in batches for tid in batch]
+    assert len(set(ids)) == len(ids)
+
+def test_ids_keep_increasing_when_the_clock_steps_back(monkeypatch):
+    generator = TransactionIdGenerator()
+    first = generator.next_id()
+    monkeypatch.setattr(time, 'time_ns', lambda: 0)
+    assert generator.next_id() > first
+
+def test_node_id_replaces_the_host_hash():
+    ids = [TransactionIdGenerator(host='app-server', node_id=node).next_id() for node in (1, 2)]
+    # Characters 10-18 are the node and pid
+    assert ids[0][10:19] != ids[1][10:19]
+
+@pytest.mark.parametrize('node_id', [-1, 1 << 23])
+def test_node_id_must_fit_in_23_bits(node_id):
+    with pytest.raises(ValueError):
+        TransactionIdGenerator(node_id=node_id)
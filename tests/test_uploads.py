@@ -0,0 +1,106 @@
+import io
+import os
+
+import pytest
+
+from app import Image, connect_db, store_upload, thumbnail_key, work_jobs
+
+def png(width=1200, height=800, color=(200, 40, 40)):
+    if Image is None:
+        pytest.skip('Pillow is not installed')
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(out, 'PNG')
+    return out.getvalue()
+
+def stored_files(app):
+    root = app.config['UPLOAD_DIR']
+    return sorted(os.path.relpath(os.path.join(folder, name), root)
+                  for folder, _, names in os.walk(root) for name in names)
+
+def queued_thumbnails():
+    conn = connect_db()
+    count = conn.execute("SELECT COUNT(*) FROM jobs WHERE kind = 'thumbnails' AND status = 'queued'").fetchone()[0]
+    conn.close()
+    return count
+
+@pytest.fixture
+def client(app):
+    app.config.update(UPLOAD_MAX_BYTES=1024 * 1024, THUMBNAIL_SIZES=(320, 960))
+    client = app.test_client()
+    client.post('/process_login', data={'email': 'ngo@example.com', 'password': 'password123'})
+    return client
+
+def test_uploads_need_a_login(app):
+    response = app.test_client().post('/api/uploads', data=png())
+    assert response.status_code == 302
+    assert stored_files(app) == []
+
+def test_identical_content_is_stored_once(app, client):
+    image = png()
+    first = client.post('/api/uploads', data=image)
+    second = client.post('/api/uploads', data=image, content_type='image/jpeg')
+    assert first.status_code == second.status_code == 201
+    key = first.get_json()['key']
+    assert second.get_json()['key'] == key
+    assert key.endswith('.png') and key[:2] == key[3:5]
+    assert stored_files(app) == [key]
+    other = client.post('/api/uploads', data=png(color=(0, 0, 255))).get_json()['key']
+    assert other != key
+    assert stored_files(app) == sorted([key, other])
+
+def test_files_over_the_size_limit_are_refused(app, client):
+    too_big = png(10, 10) + b'\0' * (1024 * 1024)
+    response = client.post('/api/uploads', data=too_big)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Files must be at most 1 MB.'
+    # Nothing is kept, not even the partly written staging file
+    assert stored_files(app) == []
+    assert client.post('/api/uploads', data=too_big[:1024 * 1024]).status_code == 201
+
+@pytest.mark.parametrize('body, error', [
+    (b'', 'The uploaded file is empty.'),
+    (b'<html><script>alert(1)</script></html>', 'Upload a PNG, JPG, GIF, WEBP or PDF file.'),
+    (b'MZ\x90\x00 not really an image', 'Upload a PNG, JPG, GIF, WEBP or PDF file.'),
+])
+def test_the_type_comes_from_the_content(app, client, body, error):
+    # The client's Content-Type is not trusted
+    response = client.post('/api/uploads', data=body, content_type='image/png')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert stored_files(app) == []
+
+def test_documents_are_refused_where_only_images_are_allowed(app):
+    with pytest.raises(ValueError, match='Upload a PNG, JPG, GIF or WEBP file.'):
+        store_upload(io.BytesIO(b'%PDF-1.4 receipt'))
+    assert store_upload(io.BytesIO(b'%PDF-1.4 receipt'), ('pdf',)).endswith('.pdf')
+
+def test_thumbnails_are_made_in_the_background(app, client):
+    key = client.post('/api/uploads', data=png()).get_json()['key']
+    assert queued_thumbnails() == 1
+    # Until the job has run, a thumbnail URL serves the original uncached
+    response = client.get(f'/uploads/{thumbnail_key(key, 320)}')
+    assert response.status_code == 200
+    assert response.data[:8] == b'\x89PNG\r\n\x1a\n'
+    assert response.cache_control.no_cache
+
+    assert work_jobs(burst=True) == (1, 0)
+    for size in (320, 960):
+        response = client.get(f'/uploads/{thumbnail_key(key, size)}')
+        assert response.cache_control.immutable
+        with Image.open(io.BytesIO(response.data)) as thumbnail:
+            assert thumbnail.format == 'WEBP'
+            assert thumbnail.size == (size, size * 2 // 3)
+    # Uploading the image again queues nothing new
+    client.post('/api/uploads', data=png())
+    assert queued_thumbnails() == 0
+
+def test_small_images_are_not_enlarged(app, client):
+    key = client.post('/api/uploads', data=png(200, 100)).get_json()['key']
+    work_jobs(burst=True)
+    with Image.open(os.path.join(app.config['UPLOAD_DIR'], thumbnail_key(key, 960))) as thumbnail:
+        assert thumbnail.size == (200, 100)
+
+@pytest.mark.parametrize('path', ['/uploads/../app.py', '/uploads/ab/abc.png', '/uploads/tmp/x',
+                                  f'/uploads/00/{"0" * 64}.png'])
+def test_unknown_upload_paths_are_not_found(app, path):
+    assert app.test_client().get(path).status_code == 404
@@ -0,0 +1,16 @@
+# Benchmarks, stress tests and synthetic data
+# The bench-*, stress-* and seed commands drive the application from the outside
+# (test clients, scratch databases, gunicorn subprocesses). app.py does not import
+# this package, so web workers never load it; run the commands with
+# `flask --app tooling <command>`, which registers them on app.cli next to the
+# application's own commands.
+from app import app
+from tooling import bench_routes, benchmarks, stress, synthetic
+
+def register_commands(app):
+    """Add the commands of every tooling module to app.cli."""
+    for module in (synthetic, bench_routes, benchmarks, stress):
+        for command in module.cli.commands.values():
+            app.cli.add_command(command)
+
+register_commands(app)
@@ -0,0 +1,301 @@
+# Route benchmarks
+# `flask --app tooling bench-routes` seeds a scratch database with synthetic
+# data, drives every route and reports throughput, latency percentiles and SQL
+# statements per request. Results can be saved as a baseline; a later run that
+# is slower than the baseline (beyond the tolerance) or issues more queries
+# exits non-zero.
+import requests
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import click
+from flask.cli import AppGroup
+
+from app import (app, asset_manifest, backend_for, connect_db, create_sample_data, get_db, get_pool, init_db,
+                 new_transaction_id)
+from tooling.synthetic import seed_synthetic_data
+
+cli = AppGroup('bench-routes')
+
+BENCH_INGEST_TOKEN = 'bench-ingest-token'
+BENCH_OPS_TOKEN = 'bench-ops-token'
+
+def bench_routes():
+    """
+    (endpoint, method, path, role, form) for every route worth measuring. form
+    may be a callable taking the iteration number, for routes that create rows;
+    a callable returning bytes is sent as the raw request body.
+    """
+    return [
+        ('index', 'GET', '/', None, None),
+        ('about', 'GET', '/about', None, None),
+        ('contact', 'GET', '/contact', None, None),
+        ('choose_role', 'GET', '/choose_role', None, None),
+        ('register', 'GET', '/register/donor', None, None),
+        ('login', 'GET', '/login', None, None),
+        ('stories', 'GET', '/stories', None, None),
+        ('api_stories', 'GET', '/api/stories', None, None),
+        ('urgent_requirements', 'GET', '/urgent_requirements', None, None),
+        ('api_urgent_requirements', 'GET', '/api/urgent_requirements', None, None),
+        ('search', 'GET', '/search?q=water', None, None),
+        ('api_search', 'GET', '/api/search?q=relief&location=mumbai', None, None),
+        ('db_stats', 'GET', '/db_stats', 'ops', None),
+        ('cache_stats', 'GET', '/cache_stats', 'ops', None),
+        ('asset', 'GET', '/assets/' + asset_manifest()['css/base.css'], None, None),
+        ('process_login', 'POST', '/process_login', None,
+         {'email': 'donor@example.com', 'password': 'password123'}),
+        ('process_register', 'POST', '/process_register', None,
+         lambda n: {'email': f'bench{n}-{time.time_ns()}@example.com', 'password': 'password123',
+                    'user_type': 'donor'}),
+        ('donor_dashboard', 'GET', '/donor_dashboard', 'donor', None),
+        ('donor_dashboard', 'GET', '/donor_dashboard?q=hope', 'donor', None),
+        ('ngo_details', 'GET', '/ngo_details/1', 'donor', None),
+        ('donate', 'GET', '/donate/1', 'donor', None),
+        ('process_donation', 'POST', '/process_donation', 'donor',
+         {'ngo_id': '1', 'amount': '500', 'payment_method': 'upi'}),
+        ('ngo_dashboard', 'GET', '/ngo_dashboard', 'receiver', None),
+        ('api_donations', 'GET', '/api/donations', 'receiver', None),
+        ('api_money_usage', 'GET', '/api/ngos/1/money_usage', None, None),
+        ('api_utilization', 'GET', '/api/ngos/1/utilization?period=month', None, None),
+        ('process_money_usage', 'POST', '/process_money_usage', 'receiver',
+         {'description': 'Benchmark expense', 'amount_used': '1'}),
+        ('api_record_money_usage', 'POST', '/api/money_usage', 'receiver',
+         {'description': 'Benchmark expense', 'amount_used': '1'}),
+        ('export', 'GET', '/export/donations', 'receiver', None),
+        ('ngo_registration', 'GET', '/ngo_registration', 'receiver', None),
+        ('add_story', 'GET', '/add_story', 'receiver', None),
+        ('add_urgent_requirement', 'GET', '/add_urgent_requirement', 'receiver', None),
+        ('process_story', 'POST', '/process_story', 'receiver',
+         lambda n: {'title': f'Benchmark story {n}', 'content': 'Benchmark story content.'}),
+        ('process_urgent_requirement', 'POST', '/process_urgent_requirement', 'receiver',
+         lambda n: {'title': f'Benchmark need {n}', 'description': 'Benchmark need.',
+                    'amount_needed': '10000', 'deadline': '2030-01-01'}),
+        ('process_ngo_registration', 'POST', '/process_ngo_registration', 'receiver',
+         {'org_name': 'Benchmark Trust', 'location': 'Pune, Maharashtra', 'contact_number': '+91-9000000000',
+          'email': 'ngo@example.com', 'bank_name': 'State Bank of India', 'account_number': '1234567890',
+          'niti_aayog_id': 'MH/2020/0123456'}),
+        ('api_bulk_donations', 'POST', '/api/donations/bulk?format=ndjson', 'ingest',
+         lambda n: ''.join(json.dumps({'donor_email': 'bulk@example.com', 'ngo_id': 1, 'amount': 100,
+                                       'payment_method': 'upi', 'transaction_id': new_transaction_id()}) + '\n'
+                           for _ in range(100)).encode()),
+        ('api_upload', 'POST', '/api/uploads', 'receiver',
+         lambda n: b'%PDF-1.4\n% benchmark receipt ' + str(time.time_ns()).encode() + b'\n%%EOF\n'),
+        ('logout', 'GET', '/logout', 'donor', None),
+    ]
+
+def _bench_headers(role):
+    token = {'ingest': BENCH_INGEST_TOKEN, 'ops': BENCH_OPS_TOKEN}.get(role)
+    return {'Authorization': f'Bearer {token}'} if token else {}
+
+_BENCH_ACCOUNTS = {'donor': 'donor@example.com', 'receiver': 'ngo@example.com'}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def _bench_summary(latencies, elapsed, queries=None):
+    latencies = sorted(latencies)
+    return {'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries': None if queries is None else round(queries / len(latencies), 1)}
+
+def bench_test_client(requests_per_route):
+    """Run every route in-process, one request at a time, counting SQL per request."""
+    results = {}
+    statements = []
+    # Test requests reuse the pushed app context, so one traced connection sees
+    # every statement the routes run
+    with app.app_context():
+        get_db().set_trace_callback(statements.append)
+        clients = {role: app.test_client() for role in (None, 'ingest', 'ops')}
+        sessions = {}
+        for role, email in _BENCH_ACCOUNTS.items():
+            user_id = get_db().execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()[0]
+            sessions[role] = {'user_id': user_id, 'email': email, 'user_type': role}
+            clients[role] = app.test_client()
+            with clients[role].session_transaction() as sess:
+                sess.update(sessions[role])
+        for endpoint, method, path, role, form in bench_routes():
+            client = clients[role]
+            latencies, queries = [], 0
+            for n in range(requests_per_route + 1):
+                data = form(n) if callable(form) else form
+                del statements[:]
+                started = time.perf_counter()
+                response = client.open(path, method=method, data=data, headers=_bench_headers(role))
+                response.close()
+                took = time.perf_counter() - started
+                if endpoint == 'logout':
+                    with client.session_transaction() as sess:
+                        sess.update(sessions[role])
+                if n:  # the first request warms caches and pools
+                    latencies.append(took)
+                    # Trigger bodies and FTS5's own shadow-table reads are part of a statement
+                    queries += sum(1 for sql in statements
+                                   if not sql.startswith('--') and "'search_index_" not in sql)
+            results[f'{method} {path}'] = _bench_summary(latencies, sum(latencies), queries)
+        get_db().set_trace_callback(None)
+    return results
+
+def bench_http(base_url, requests_per_route, concurrency):
+    """Run every route against a live server with concurrent clients."""
+    from concurrent.futures import ThreadPoolExecutor
+    results = {}
+
+    def session_for(role):
+        http = requests.Session()
+        http.headers.update(_bench_headers(role))
+        if role in _BENCH_ACCOUNTS:
+            http.post(f'{base_url}/process_login', allow_redirects=False,
+                      data={'email': _BENCH_ACCOUNTS[role], 'password': 'password123'})
+        return http
+
+    for endpoint, method, path, role, form in bench_routes():
+        # Log the clients in before the clock starts
+        pool = queue.Queue()
+        for _ in range(concurrency):
+            pool.put(session_for(role))
+
+        def run(n):
+            http = pool.get()
+            data = form(n) if callable(form) else form
+            started = time.perf_counter()
+            response = http.request(method, base_url + path, data=data, allow_redirects=False)
+            took = time.perf_counter() - started
+            pool.put(session_for(role) if endpoint == 'logout' else http)
+            timing = re.search(r'desc="(\d+) queries"', response.headers.get('Server-Timing', ''))
+            return took, timing and int(timing.group(1))
+
+        run(0)
+        with ThreadPoolExecutor(concurrency) as executor:
+            started = time.perf_counter()
+            outcomes = list(executor.map(run, range(1, requests_per_route + 1)))
+            elapsed = time.perf_counter() - started
+        counts = [queries for _, queries in outcomes if queries is not None]
+        results[f'{method} {path}'] = _bench_summary([took for took, _ in outcomes], elapsed,
+                                                     sum(counts) if counts else None)
+    return results
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@cli.command('bench-routes')
+@click.option('--ngos', default=1000, show_default=True)
+@click.option('--donations', default=100000, show_default=True)
+@click.option('--stories', default=10000, show_default=True)
+@click.option('--requirements', default=2000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Seed for the synthetic data.')
+@click.option('--database', type=click.Path(dir_okay=False),
+              help='Seed (or reuse, if it exists) this database instead of a scratch one.')
+@click.option('--requests', 'requests_per_route', default=50, show_default=True, help='Requests per route.')
+@click.option('--server', type=click.Choice(['test-client', 'gunicorn']), default='test-client', show_default=True)
+@click.option('--url', help='Benchmark an already running server instead.')
+@click.option('--workers', default=4, show_default=True, help='gunicorn workers.')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent clients for HTTP runs.')
+@click.option('--baseline', type=click.Path(dir_okay=False), help='Compare against this baseline file.')
+@click.option('--save-baseline', is_flag=True, help='Write the results to --baseline instead of comparing.')
+@click.option('--tolerance', default=0.5, show_default=True, help='Allowed p95 slowdown as a fraction.')
+@click.option('--slack-ms', default=2.0, show_default=True, help='p95 slowdown always allowed, in ms.')
+def bench_routes_command(ngos, donations, stories, requirements, seed, database, requests_per_route,
+                         server, url, workers, concurrency, baseline, save_baseline, tolerance, slack_ms):
+    """Benchmark every route on synthetic data and check against a baseline."""
+    scale = {'ngos': ngos, 'donations': donations, 'stories': stories, 'requirements': requirements,
+             'seed': seed}
+    saved = {key: app.config[key] for key in ('DATABASE', 'JOB_WORKERS', 'INGEST_TOKEN', 'OPS_TOKEN', 'UPLOAD_DIR')}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = database or os.path.join(tmp, 'bench.db')
+        app.config['DATABASE'] = path
+        app.config['UPLOAD_DIR'] = os.path.join(tmp, 'uploads')
+        # Queued jobs would otherwise run alongside the measurements
+        app.config['JOB_WORKERS'] = 0
+        app.config['INGEST_TOKEN'] = BENCH_INGEST_TOKEN
+        app.config['OPS_TOKEN'] = BENCH_OPS_TOKEN
+        try:
+            seeded = backend_for(path).exists(path)
+            init_db()
+            if not seeded:
+                create_sample_data()
+                started = time.perf_counter()
+                conn = connect_db()
+                seed_synthetic_data(conn, ngos, donations=donations, stories=stories,
+                                    requirements=requirements, seed=seed)
+                conn.close()
+                print(f"Seeded {path} in {time.perf_counter() - started:.1f}s")
+
+            if url:
+                results = bench_http(url.rstrip('/'), requests_per_route, concurrency)
+            elif server == 'gunicorn':
+                port = free_port()
+                env = dict(os.environ, DATABASE=os.path.abspath(path), JOB_WORKERS='0',
+                           INGEST_TOKEN=BENCH_INGEST_TOKEN, OPS_TOKEN=BENCH_OPS_TOKEN,
+                           UPLOAD_DIR=app.config['UPLOAD_DIR'])
+                process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                                            '--bind', f'127.0.0.1:{port}', 'app:app'],
+                                           cwd=app.root_path, env=env)
+                try:
+                    base_url = f'http://127.0.0.1:{port}'
+                    for _ in range(100):
+                        if process.poll() is not None:
+                            raise SystemExit("gunicorn exited; is it installed?")
+                        try:
+                            requests.get(base_url + '/about', timeout=1)
+                            break
+                        except requests.ConnectionError:
+                            time.sleep(0.1)
+                    results = bench_http(base_url, requests_per_route, concurrency)
+                finally:
+                    process.terminate()
+                    process.wait()
+            else:
+                results = bench_test_client(requests_per_route)
+            get_pool().close()
+        finally:
+            app.config.update(saved)
+
+    print(f"{'route':<52}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for route, result in results.items():
+        queries = '-' if result['queries'] is None else result['queries']
+        print(f"{route:<52}{result['rps']:>9}{result['p50_ms']:>9}{result['p95_ms']:>9}"
+              f"{result['p99_ms']:>9}{queries:>9}")
+    benchmarked = {endpoint for endpoint, *_ in bench_routes()}
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - benchmarked - {'static'})
+    if missing:
+        print(f"Not benchmarked: {', '.join(missing)}")
+
+    if not baseline:
+        return
+    mode = url and 'url' or server
+    if save_baseline:
+        with open(baseline, 'w') as f:
+            json.dump({'mode': mode, 'scale': scale, 'routes': results}, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {baseline}")
+        return
+    with open(baseline) as f:
+        expected = json.load(f)
+    if expected.get('mode') != mode or expected.get('scale') != scale:
+        print(f"Warning: baseline was recorded with {expected.get('mode')} {expected.get('scale')}")
+    regressions = []
+    for route, base in expected['routes'].items():
+        result = results.get(route)
+        if result is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance) + slack_ms:
+            regressions.append(f"{route}: p95 {result['p95_ms']} ms, baseline {base['p95_ms']} ms")
+        if None not in (result['queries'], base['queries']) and result['queries'] > base['queries']:
+            regressions.append(f"{route}: {result['queries']} queries, baseline {base['queries']}")
+    if regressions:
+        raise SystemExit("Performance regressions:\n  " + "\n  ".join(regressions))
+    print("No regressions against the baseline")
@@ -0,0 +1,386 @@
+# Benchmarks
+# Commands that each measure one part of the application on a scratch database.
+from datetime import datetime
+import sqlite3
+import requests
+import gzip
+import hashlib
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from jinja2 import FileSystemBytecodeCache
+import click
+from flask.cli import AppGroup
+
+from app import (app, DonationRow, asset_manifest, compile_templates, connect_db, create_sample_data, fetch_records,
+                 get_pool, hash_password, init_db, migrate, new_transaction_id, record_donation)
+from tooling.bench_routes import free_port, percentile
+from tooling.synthetic import seed_synthetic_data
+
+cli = AppGroup('benchmarks')
+
+# Login benchmark
+# Login throughput and the latency of other routes during a burst of logins,
+# with the password KDF run inline and in the hashing pool.
+@cli.command('bench-login')
+@click.option('--logins', default=200, show_default=True, help='Logins per mode.')
+@click.option('--concurrency', default=16, show_default=True, help='Concurrent login clients.')
+@click.option('--readers', default=4, show_default=True, help='Concurrent clients on other routes.')
+@click.option('--mode', type=click.Choice(['both', 'inline', 'pool']), default='both', show_default=True)
+def bench_login_command(logins, concurrency, readers, mode):
+    """
+    Measure login throughput and the p99 latency of non-login routes while
+    logins are running, with hashing inline and in the process pool.
+    """
+    saved = app.config['DATABASE'], app.config['PASSWORD_HASH_WORKERS']
+    workers = saved[1] or max(1, (os.cpu_count() or 2) // 2)
+    modes = {'inline': 0, 'pool': workers}
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        try:
+            init_db()
+            create_sample_data()
+            for name, pool_size in modes.items():
+                if mode not in ('both', name):
+                    continue
+                app.config['PASSWORD_HASH_WORKERS'] = pool_size
+                if pool_size:
+                    # Start the pool processes before timing
+                    hash_password('warm-up')
+                remaining = iter(range(logins))
+                remaining_lock = threading.Lock()
+                done = threading.Event()
+                latencies = []
+
+                def login_client():
+                    client = app.test_client()
+                    while True:
+                        with remaining_lock:
+                            if next(remaining, None) is None:
+                                return
+                        client.post('/process_login', data={'email': 'donor@example.com',
+                                                            'password': 'password123'})
+                        client.get('/logout')
+
+                def reader_client():
+                    client = app.test_client()
+                    while not done.is_set():
+                        for path in ('/about', '/api/stories'):
+                            started = time.perf_counter()
+                            client.get(path)
+                            latencies.append(time.perf_counter() - started)
+
+                reader_threads = [threading.Thread(target=reader_client) for _ in range(readers)]
+                login_threads = [threading.Thread(target=login_client) for _ in range(concurrency)]
+                for thread in reader_threads:
+                    thread.start()
+                started = time.perf_counter()
+                for thread in login_threads:
+                    thread.start()
+                for thread in login_threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+                done.set()
+                for thread in reader_threads:
+                    thread.join()
+
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+                p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+                label = f'pool ({pool_size} processes)' if pool_size else 'inline'
+                print(f"{label:>22}: {logins / elapsed:8.1f} logins/s, other routes "
+                      f"{len(latencies) / elapsed:8.1f} req/s p50 {p50:6.1f} ms p99 {p99:6.1f} ms")
+            get_pool().close()
+        finally:
+            app.config['DATABASE'], app.config['PASSWORD_HASH_WORKERS'] = saved
+
+# Asset benchmark
+# Pages with their CSS and JS inlined, as the templates used to be, against the
+# fingerprinted external assets.
+_ASSET_TAG = re.compile(r'''<link href="\{\{ asset_url\('([^']+)'\) \}\}" rel="stylesheet">'''
+                        r'''|<script src="\{\{ asset_url\('([^']+)'\) \}\}"></script>''')
+
+def inline_assets(source):
+    """Template source with its asset links replaced by the files' content, as the templates used to be."""
+    def inline(match):
+        name = match.group(1) or match.group(2)
+        with open(os.path.join(app.static_folder, name), encoding='utf-8', newline='') as f:
+            content = f.read()
+        return f'<style>\n{content}</style>' if match.group(1) else f'<script>\n{content}</script>'
+    return _ASSET_TAG.sub(inline, source)
+
+@cli.command('bench-assets')
+@click.option('--requests', 'requests_per_page', default=20, show_default=True, help='Requests per page.')
+def bench_assets_command(requests_per_page):
+    """
+    Compare every page with its CSS and JS inlined, as the templates used to
+    be, against the page with external assets: HTML bytes (raw and gzipped),
+    bytes on a first and a repeat visit, and template render time. Then time
+    compiling all templates with and without the bytecode cache.
+    """
+    from jinja2 import FunctionLoader
+    pages = [(None, path) for path in ['/', '/about', '/contact', '/choose_role', '/register/donor', '/login',
+                                       '/stories', '/urgent_requirements', '/search?q=water']]
+    pages += [('donor', path) for path in ['/donor_dashboard', '/ngo_details/1', '/donate/1']]
+    pages += [('receiver', path) for path in ['/ngo_dashboard', '/add_story', '/add_urgent_requirement']]
+    loader = app.jinja_loader
+    inlined = FunctionLoader(lambda name: inline_assets(loader.get_source(app.jinja_env, name)[0]))
+    manifest = asset_manifest()
+    asset_bytes = {f"/assets/{built}": (os.path.getsize(os.path.join(app.config['ASSET_DIR'], built)),
+                                         os.path.getsize(os.path.join(app.config['ASSET_DIR'], built + '.gz')))
+                   for built in manifest.values()}
+    results = {}
+    saved = app.config['DATABASE'], app.config['JOB_WORKERS']
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'], app.config['JOB_WORKERS'] = os.path.join(tmp, 'bench.db'), 0
+        try:
+            init_db()
+            create_sample_data()
+            for mode, jinja_loader in (('inline', inlined), ('assets', loader)):
+                app.jinja_env.loader = jinja_loader
+                app.jinja_env.cache.clear()
+                for role, path in pages:
+                    client = app.test_client()
+                    if role:
+                        with client.session_transaction() as sess:
+                            sess.update(user_id=1 if role == 'donor' else 2, user_type=role,
+                                        email='donor@example.com' if role == 'donor' else 'ngo@example.com')
+                    renders = []
+                    for n in range(requests_per_page + 1):
+                        response = client.get(path)
+                        timing = dict(re.findall(r'(\w+);dur=([\d.]+)', response.headers['Server-Timing']))
+                        if n:  # the first request compiles the templates
+                            renders.append(float(timing['tpl']))
+                    html = response.get_data()
+                    assets = re.findall(rb'(?:href|src)="(/assets/[^"]+)"', html)
+                    results[mode, path] = {
+                        'html': len(html), 'html_gz': len(gzip.compress(html, 6)),
+                        'assets_gz': sum(asset_bytes[url.decode()][1] for url in assets),
+                        'render_ms': percentile(sorted(renders), 0.5)}
+        finally:
+            app.jinja_env.loader = loader
+            app.jinja_env.cache.clear()
+            app.config['DATABASE'], app.config['JOB_WORKERS'] = saved
+            get_pool().close()
+
+    print(f"{'page':26} {'HTML before':>11} {'after':>7} {'gz before':>10} {'after':>7} "
+          f"{'1st visit gz':>13} {'repeat gz':>10} {'render ms':>10} {'after':>6}")
+    totals = [0] * 4
+    for _, path in pages:
+        before, after = results['inline', path], results['assets', path]
+        print(f"{path:26} {before['html']:>11,} {after['html']:>7,} {before['html_gz']:>10,} {after['html_gz']:>7,} "
+              f"{after['html_gz'] + after['assets_gz']:>13,} {after['html_gz']:>10,} "
+              f"{before['render_ms']:>10.2f} {after['render_ms']:>6.2f}")
+        for i, value in enumerate((before['html'], after['html'], before['html_gz'], after['html_gz'])):
+            totals[i] += value
+    print(f"{'total':26} {totals[0]:>11,} {totals[1]:>7,} {totals[2]:>10,} {totals[3]:>7,}")
+
+    # A new worker's first render of every template, from source and from bytecode
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for mode, cache in (('source', None), ('bytecode, cold', FileSystemBytecodeCache(tmp)),
+                            ('bytecode, warm', FileSystemBytecodeCache(tmp))):
+            env = app.create_jinja_environment()
+            env.bytecode_cache = cache
+            started = time.perf_counter()
+            count = compile_templates(env)
+            timings[mode] = time.perf_counter() - started
+        print(f"Loading {count} templates in a new worker: " +
+              ', '.join(f'{mode} {took * 1000:.1f} ms' for mode, took in timings.items()))
+
+# Transaction ID benchmark
+def _generate_ids(count):
+    return [new_transaction_id() for _ in range(count)]
+
+@cli.command('bench-transaction-ids')
+@click.option('--count', default=100000, show_default=True, help='IDs per thread/process.')
+@click.option('--threads', default=8, show_default=True)
+@click.option('--processes', default=4, show_default=True)
+def bench_transaction_ids_command(count, threads, processes):
+    """Benchmark transaction ID generation and check for collisions under concurrency."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    started = time.perf_counter()
+    for _ in range(count):
+        hashlib.md5(f"donor@example.com1100.0{datetime.now()}".encode()).hexdigest()
+    md5_rate = count / (time.perf_counter() - started)
+    started = time.perf_counter()
+    ids = _generate_ids(count)
+    rate = count / (time.perf_counter() - started)
+    print(f"single thread: {rate:,.0f} ids/s (md5 of email+ngo+amount+now: {md5_rate:,.0f}/s)")
+    if ids != sorted(ids):
+        raise SystemExit("IDs from one thread are not monotonic")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        batches = list(executor.map(_generate_ids, [count] * threads))
+    elapsed = time.perf_counter() - started
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        batches += pool.map(_generate_ids, [count] * processes)
+    all_ids = [tid for batch in batches for tid in batch]
+    collisions = len(all_ids) - len(set(all_ids))
+    print(f"{threads} threads: {threads * count / elapsed:,.0f} ids/s; "
+          f"{len(all_ids):,} ids across {threads} threads and {processes} processes, {collisions} collisions")
+    if collisions:
+        raise SystemExit("Transaction ID collision detected")
+
+# Live events benchmark
+@cli.command('bench-events')
+@click.option('--streams', default=200, show_default=True, help='Event streams to hold open.')
+@click.option('--updates', default=20, show_default=True, help='Funding updates to publish.')
+@click.option('--worker-class', default='gevent', show_default=True, help='gunicorn worker class.')
+@click.option('--workers', default=2, show_default=True, help='gunicorn workers.')
+@click.option('--database', help='Run against this database (e.g. a postgresql:// URL) instead of a scratch one.')
+def bench_events_command(streams, updates, worker_class, workers, database):
+    """
+    Serve a scratch database with gunicorn, hold many /events streams open and
+    report how long funding updates, written from this process, take to reach them.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    saved = app.config['DATABASE']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = app.config['DATABASE'] = database or os.path.join(tmp, 'events.db')
+        try:
+            init_db()
+            create_sample_data()
+            conn = connect_db()
+            requirement_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description,
+                                             amount_needed) VALUES (1, 'Live', 'Live', ?)''',
+                                          (updates * 100,)).lastrowid
+            conn.commit()
+
+            port = free_port()
+            env = dict(os.environ, DATABASE=path, JOB_WORKERS='0', EVENT_MAX_STREAMS=str(streams))
+            process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                                        '--worker-class', worker_class, '--worker-connections', str(streams + 100),
+                                        '--bind', f'127.0.0.1:{port}', 'app:app'],
+                                       cwd=app.root_path, env=env)
+            base_url = f'http://127.0.0.1:{port}'
+            connected = threading.Semaphore(0)
+            try:
+                for _ in range(100):
+                    if process.poll() is not None:
+                        raise SystemExit("gunicorn exited; is it installed (and gevent, for -k gevent)?")
+                    try:
+                        requests.get(base_url + '/about', timeout=1)
+                        break
+                    except requests.ConnectionError:
+                        time.sleep(0.1)
+
+                def listen(_):
+                    received = []
+                    try:
+                        with requests.get(base_url + '/events', stream=True, timeout=(5, 30)) as response:
+                            if response.status_code != 200:
+                                return received
+                            for line in response.iter_lines():
+                                if line.startswith(b'retry:'):
+                                    connected.release()
+                                elif line.startswith(b'data:'):
+                                    received.append(time.perf_counter())
+                                    if len(received) == updates:
+                                        break
+                    except requests.RequestException:
+                        pass
+                    return received
+
+                with ThreadPoolExecutor(streams) as executor:
+                    results = executor.map(listen, range(streams))
+                    deadline = time.monotonic() + 30
+                    open_streams = sum(connected.acquire(timeout=max(deadline - time.monotonic(), 0))
+                                       for _ in range(streams))
+                    sent = []
+                    for _ in range(updates):
+                        record_donation(conn, 'bench@example.com', 1, 100.0, 'upi', requirement_id)
+                        sent.append(time.perf_counter())
+                        time.sleep(0.05)
+                    received = list(results)
+            finally:
+                process.terminate()
+                process.wait()
+            conn.close()
+        finally:
+            app.config['DATABASE'] = saved
+    latencies = sorted(times[i] - sent[i] for times in received for i in range(len(times)))
+    delivered = len(latencies)
+    print(f"{open_streams}/{streams} streams open on {workers} {worker_class} workers")
+    print(f"{delivered}/{streams * updates} updates delivered")
+    if latencies:
+        print(f"latency p50={percentile(latencies, 0.5) * 1000:.1f}ms "
+              f"p95={percentile(latencies, 0.95) * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms")
+    if delivered < streams * updates:
+        raise SystemExit("Not every stream received every update")
+
+# Row representation benchmark
+# Fetch time, memory and render time of the ways a donations listing can be
+# handed to a view, on one NGO with a large history.
+def row_representations():
+    """(name, fetch, template) for each way of handing a donations listing to a view."""
+    sql = '''SELECT id, donor_email, amount, created_at, status, payment_method, transaction_id
+             FROM donations WHERE ngo_id = ? ORDER BY created_at DESC, id DESC'''
+    by_name = '{% for d in rows %}{{ d.donor_email }} {{ d.amount }} {{ d.created_at[:10] }} {{ d.status }}\n{% endfor %}'
+
+    def fetch_tuples(c, ngo_id):
+        return c.execute(sql, (ngo_id,)).fetchall()
+
+    def fetch_dicts(c, ngo_id):
+        return [dict(zip(DonationRow._fields, row)) for row in c.execute(sql, (ngo_id,))]
+
+    def fetch_sqlite_rows(c, ngo_id):
+        c.row_factory = sqlite3.Row
+        try:
+            return c.execute(sql, (ngo_id,)).fetchall()
+        finally:
+            c.row_factory = None
+
+    def fetch_donation_records(c, ngo_id):
+        return fetch_records(c, DonationRow, sql, (ngo_id,))
+
+    return [
+        ('tuple', fetch_tuples, '{% for d in rows %}{{ d[1] }} {{ d[2] }} {{ d[3][:10] }} {{ d[4] }}\n{% endfor %}'),
+        ('dict per row', fetch_dicts, by_name),
+        ('sqlite3.Row', fetch_sqlite_rows, by_name),
+        ('record', fetch_donation_records, by_name),
+    ]
+
+@cli.command('bench-rows')
+@click.option('--rows', default=100000, show_default=True, help='Donations in the listing.')
+@click.option('--repeat', default=5, show_default=True, help='Runs per representation; the best is kept.')
+@click.option('--seed', default=0, show_default=True, help='Seed for the synthetic data.')
+def bench_rows_command(rows, repeat, seed):
+    """Compare fetch time, memory and render time of row representations on a large listing."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rows.db')
+        conn = connect_db(path)
+        migrate(conn)
+        seed_synthetic_data(conn, 1, donations=rows, stories=0, requirements=0, usage=0, seed=seed)
+        ngo_id = conn.execute('SELECT id FROM ngos').fetchone()[0]
+
+        print(f"{'representation':<16}{'fetch ms':>10}{'rows/s':>12}{'retained MB':>13}"
+              f"{'peak MB':>10}{'render ms':>11}")
+        for name, fetch, source in row_representations():
+            template = app.jinja_env.from_string(source)
+            fetch_ms = render_ms = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = fetch(conn.cursor(), ngo_id)
+                fetch_ms = min(fetch_ms, (time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                template.render(rows=result)
+                render_ms = min(render_ms, (time.perf_counter() - started) * 1000)
+                del result
+            # Measured on its own run: tracing slows the fetch down several times over
+            tracemalloc.start()
+            result = fetch(conn.cursor(), ngo_id)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del result
+            print(f"{name:<16}{fetch_ms:>10.1f}{rows / fetch_ms * 1000:>12,.0f}{retained / 2**20:>13.1f}"
+                  f"{peak / 2**20:>10.1f}{render_ms:>11.1f}")
+        conn.close()
@@ -0,0 +1,162 @@
+# Stress tests
+# Concurrent writers on a scratch database, checked against what was stored.
+import multiprocessing
+import os
+import tempfile
+import time
+import click
+from flask.cli import AppGroup
+
+from app import app, DATABASE_ERRORS, connect_db, create_sample_data, group_commit_metrics, init_db, record_donation
+
+cli = AppGroup('stress')
+
+# Funding stress test
+# Many donors funding one urgent requirement at once must leave amount_raised
+# equal to what the donations table says was given to it.
+@cli.command('stress-urgent-funding')
+@click.option('--donors', default=32, show_default=True, help='Concurrent donor threads.')
+@click.option('--donations', default=50, show_default=True, help='Donations per donor.')
+@click.option('--database', help='Run against this database (e.g. a postgresql:// URL) instead of a scratch one.')
+def stress_urgent_funding_command(donors, donations, database):
+    """
+    Fund one urgent requirement from many threads at once on a scratch database
+    and check amount_raised and auto-deactivation against the donations table.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    saved = app.config['DATABASE']
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = database or os.path.join(tmp, 'stress.db')
+        try:
+            init_db()
+            create_sample_data()
+            conn = connect_db()
+            # Goal is reached halfway through, so later donations land on a closed requirement
+            goal = donors * donations * 10 / 2
+            requirement_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description,
+                                             amount_needed) VALUES (1, 'Stress test', 'Stress test', ?)''',
+                                          (goal,)).lastrowid
+            conn.commit()
+
+            def donor(n):
+                donor_conn = connect_db()
+                try:
+                    for _ in range(donations):
+                        record_donation(donor_conn, f'donor{n}@example.com', 1, 10.0, 'upi', requirement_id)
+                finally:
+                    donor_conn.close()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(donors) as executor:
+                list(executor.map(donor, range(donors)))
+            elapsed = time.perf_counter() - started
+
+            raised, is_active = conn.execute('SELECT amount_raised, is_active FROM urgent_requirements WHERE id = ?',
+                                             (requirement_id,)).fetchone()
+            total, attributed = conn.execute('''SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM donations
+                                                WHERE urgent_requirement_id = ?''', (requirement_id,)).fetchone()
+            count = conn.execute("SELECT COUNT(*) FROM donations WHERE donor_email LIKE 'donor_%@example.com'"
+                                 ).fetchone()[0]
+            conn.close()
+        finally:
+            app.config['DATABASE'] = saved
+    print(f"{count} donations from {donors} threads in {elapsed:.2f}s ({count / elapsed:,.0f}/s), "
+          f"{attributed} of them before the requirement closed")
+    print(f"amount_raised={raised:.2f} donations total={total:.2f} goal={goal:.2f} active={bool(is_active)}")
+    # Donations made after the goal was met go to the NGO, not to the closed requirement
+    if count != donors * donations or raised != total or raised != goal or bool(is_active):
+        raise SystemExit("Funding counter does not match the donations table")
+    print("Funding counter matches the donations table")
+
+# Donation spike
+# A burst of donations from several processes, as under gunicorn, with
+# per-request commits and with group commit.
+def _donation_spike(mode, threads, donations, requirement_id):
+    """
+    One process of stress-donations: threads that each record donations back to
+    back. Returns (latencies, errors, group commit metrics).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    app.config['GROUP_COMMIT'] = mode == 'group-commit'
+    latencies, errors = [], []
+
+    def donor(n):
+        conn = connect_db()
+        if mode == 'per-request-durable':
+            conn.backend.durable(conn)
+        try:
+            for i in range(donations):
+                started = time.perf_counter()
+                try:
+                    # Every tenth donation also funds the requirement
+                    record_donation(conn, f'donor{os.getpid()}-{n}@example.com', 1, 10.0, 'upi',
+                                    requirement_id if i % 10 == 0 else None)
+                except DATABASE_ERRORS as e:
+                    errors.append(repr(e))
+                    continue
+                latencies.append(time.perf_counter() - started)
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(donor, range(threads)))
+    return latencies, errors, group_commit_metrics()
+
+@cli.command('stress-donations')
+@click.option('--processes', default=4, show_default=True, help='Worker processes, as under gunicorn.')
+@click.option('--threads', default=16, show_default=True, help='Donor threads per process.')
+@click.option('--donations', default=50, show_default=True, help='Donations per thread.')
+@click.option('--mode', 'modes', multiple=True, default=['per-request', 'per-request-durable', 'group-commit'],
+              type=click.Choice(['per-request', 'per-request-durable', 'group-commit']), show_default=True)
+@click.option('--database', help='Run against this database (e.g. a postgresql:// URL) instead of a scratch one.')
+def stress_donations_command(processes, threads, donations, modes, database):
+    """
+    Record a spike of donations from many processes and threads at once, with
+    per-request commits (as configured, and durable) and with group commit, and
+    compare donations/s, request latency and errors.
+    """
+    saved = app.config['DATABASE'], app.config['GROUP_COMMIT']
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['DATABASE'] = database or os.path.join(tmp, 'spike.db')
+        try:
+            init_db()
+            create_sample_data()
+            conn = connect_db()
+            requirement_id = conn.execute('''INSERT INTO urgent_requirements (ngo_id, title, description,
+                                             amount_needed) VALUES (1, 'Spike test', 'Spike test', 1e12)''').lastrowid
+            conn.commit()
+            for mode in modes:
+                before = conn.execute('SELECT COUNT(*) FROM donations').fetchone()[0]
+                started = time.perf_counter()
+                # fork, so each process starts its own writer as a gunicorn worker would
+                with multiprocessing.get_context('fork').Pool(processes) as pool:
+                    spikes = pool.starmap(_donation_spike, [(mode, threads, donations, requirement_id)] * processes)
+                elapsed = time.perf_counter() - started
+                stored = conn.execute('SELECT COUNT(*) FROM donations').fetchone()[0] - before
+                latencies = sorted(latency for spike in spikes for latency in spike[0])
+                errors = [error for spike in spikes for error in spike[1]]
+                commits = sum(spike[2]['count'] for spike in spikes)
+                commit_seconds = sum(spike[2]['seconds'] for spike in spikes)
+                results.append((mode, stored, elapsed, latencies, errors, commits, commit_seconds))
+                if stored != len(latencies):
+                    raise SystemExit(f"{mode}: {len(latencies)} donations acknowledged but {stored} stored")
+            conn.close()
+        finally:
+            app.config['DATABASE'], app.config['GROUP_COMMIT'] = saved
+
+    print(f"{processes} processes x {threads} threads x {donations} donations")
+    print(f"{'mode':<22}{'donations/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'commits':>9}"
+          f"{'per commit':>12}{'commit ms':>11}")
+    for mode, stored, elapsed, latencies, errors, commits, commit_seconds in results:
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        if mode == 'group-commit':
+            per_commit = f'{stored / commits:.1f}' if commits else '-'
+            commit_ms = f'{commit_seconds / commits * 1000:.2f}' if commits else '-'
+        else:
+            per_commit, commit_ms = '1', '-'
+        print(f"{mode:<22}{stored / elapsed:>12,.0f}{p50:>9.1f}{p99:>9.1f}{len(errors):>8}"
+              f"{commits if mode == 'group-commit' else stored:>9}{per_commit:>12}{commit_ms:>11}")
+        for error in sorted(set(errors))[:3]:
+            print(f"    {error}")
@@ -0,0 +1,217 @@
+# Synthetic data
+# seed_synthetic_data() generates a realistic dataset across all six tables for
+# benchmarks and staging. The same seed on the same starting database gives the
+# same rows. Rows are written with executemany in one transaction. While it
+# runs, the triggers and secondary indexes on the seeded tables are dropped
+# (on PostgreSQL the triggers are disabled).
+# They are recreated at the end, and the aggregates and search index are
+# rebuilt in one pass, which is far cheaper than maintaining them row by row.
+from datetime import date, datetime, timedelta, timezone
+from werkzeug.security import generate_password_hash
+import random
+import time
+import click
+from flask.cli import AppGroup
+
+from app import (app, CROCKFORD_PAIRS, connect_db, create_sample_data, init_db, invalidate_tags,
+                 rebuild_fund_utilization, rebuild_ngo_stats, rebuild_search_index)
+
+cli = AppGroup('synthetic')
+
+_ORG_WORDS = ['Hope', 'Seva', 'Asha', 'Jeevan', 'Prakash', 'Sahyog', 'Udaan', 'Disha', 'Roshni', 'Sankalp',
+              'Kiran', 'Navjeevan', 'Ujala', 'Sneh', 'Aadhar', 'Samarth']
+_ORG_KINDS = ['Foundation', 'Trust', 'Society', 'Welfare Association', 'Sansthan', 'Initiative']
+_CITIES = ['Mumbai, Maharashtra', 'Pune, Maharashtra', 'New Delhi, Delhi', 'Bengaluru, Karnataka',
+           'Chennai, Tamil Nadu', 'Kolkata, West Bengal', 'Hyderabad, Telangana', 'Jaipur, Rajasthan',
+           'Lucknow, Uttar Pradesh', 'Ahmedabad, Gujarat', 'Bhopal, Madhya Pradesh', 'Patna, Bihar']
+_CAUSES = ['clean drinking water', 'school supplies', 'flood relief', 'free medical camps', 'mid-day meals',
+           'skilling for women', 'tree plantation', 'winter blankets', 'college scholarships', 'elder care']
+_USAGE_ITEMS = ['Purchased {}', 'Transport for {}', 'Volunteer stipends for {}', 'Supplies for {}',
+                'Venue hire for {}']
+_PAYMENT_METHODS = ['upi', 'card', 'netbanking', 'wallet']
+_DONATION_AMOUNTS = [100, 250, 500, 1000, 2000, 5000]
+SEED_TABLES = ('users', 'ngos', 'donations', 'stories', 'urgent_requirements', 'money_usage')
+SEED_EPOCH = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+SEED_SPAN = 730 * 86400
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(SEED_EPOCH + seconds))
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def seed_synthetic_data(conn, ngos=1000, donors=None, donations=100000, stories=10000, requirements=2000,
+                        usage=None, seed=0, batch_size=20000):
+    """
+    Add a synthetic dataset on top of whatever is already in the database.
+
+    donors defaults to one per 20 donations. usage (money_usage rows) defaults
+    to one per 10 donations; each spends part of one completed donation. Every
+    seeded account's password is password123. Returns the row counts written.
+    Run it while nothing else is using the database: the journal is kept in
+    memory for the duration of the load.
+    """
+    donors = max(1, donations // 20) if donors is None else max(1, donors)
+    usage = donations // 10 if usage is None else usage
+    first = {table: conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}').fetchone()[0]
+             for table in SEED_TABLES}
+    rng = random.Random(f"{seed}/{first['users']}/{first['donations']}")
+    password = generate_password_hash('password123', app.config['PASSWORD_HASH_METHOD'])
+    first_donor = first['users'] + ngos
+    counts = dict.fromkeys(SEED_TABLES, 0)
+
+    def write(table, columns, rows):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        for batch in _batches(rows, batch_size):
+            conn.executemany(sql, batch)
+            counts[table] += len(batch)
+
+    def user_rows():
+        for i in range(ngos):
+            yield first['users'] + i, f"ngo{first['users'] + i}@seed.example", password, 'receiver'
+        for i in range(donors):
+            yield first_donor + i, f'donor{first_donor + i}@seed.example', password, 'donor'
+
+    def ngo_rows():
+        for i in range(ngos):
+            ngo_id = first['ngos'] + i
+            yield (ngo_id, first['users'] + i,
+                   f'{rng.choice(_ORG_WORDS)} {rng.choice(_ORG_WORDS)} {rng.choice(_ORG_KINDS)}',
+                   rng.choice(_CITIES), f'+91-9{rng.randrange(10 ** 9):09d}',
+                   f"ngo{first['users'] + i}@seed.example",
+                   f'https://ngo{ngo_id}.example.org' if rng.random() < 0.6 else '', 'State Bank of India',
+                   f'{rng.randrange(10 ** 11):011d}', f'ngo{ngo_id}@upi', f'MH/2020/{ngo_id:07d}',
+                   rng.random() < 0.9, _timestamp(rng.randrange(SEED_SPAN)))
+
+    def story_rows():
+        for _ in range(stories):
+            yield (first['ngos'] + rng.randrange(ngos),
+                   f"{rng.choice(['Provided', 'Delivered', 'Funded'])} {rng.choice(_CAUSES)} "
+                   f"for {rng.randrange(10, 500)} families",
+                   f'Thanks to our donors we arranged {rng.choice(_CAUSES)} and {rng.choice(_CAUSES)} '
+                   f'in {rng.choice(_CITIES)}, reaching {rng.randrange(50, 5000)} people this season.',
+                   rng.random() < 0.8, _timestamp(rng.randrange(SEED_SPAN)))
+
+    requirement_ngos = [first['ngos'] + rng.randrange(ngos) for _ in range(requirements)]
+    raised = [0.0] * requirements
+
+    def donation_rows():
+        # Hot loop, once per donation: bound methods and int(random() * n)
+        # instead of randrange/choice, which cost several times as much
+        random_, getrandbits, timestamp, pairs = rng.random, rng.getrandbits, _timestamp, CROCKFORD_PAIRS
+        first_ngo, first_requirement, first_donation = first['ngos'], first['urgent_requirements'], first['donations']
+        amounts, methods = _DONATION_AMOUNTS, _PAYMENT_METHODS
+        usage_rate = usage / donations if donations else 0
+        # Donations arrive in time order, like real ones: ids and transaction
+        # ids then grow together and the unique index is appended to, not
+        # split all over
+        gap, moment = 2 * SEED_SPAN / max(donations, 1), 0.0
+        for i in range(donations):
+            moment += random_() * gap
+            seconds = min(int(moment), SEED_SPAN - 1)
+            amount = float(amounts[int(random_() * 6)] + int(random_() * 100))
+            if requirements and random_() < 0.1:
+                requirement = int(random_() * requirements)
+                ngo_id, requirement_id = requirement_ngos[requirement], first_requirement + requirement
+                raised[requirement] += amount
+            else:
+                ngo_id, requirement_id = first_ngo + int(random_() * ngos), None
+            status = 'completed' if random_() < 0.95 else 'pending'
+            # Same layout as new_transaction_id(): 48 bits of creation time in
+            # milliseconds, then 80 bits (here random), as 26 base32 characters
+            value = (((SEED_EPOCH + seconds) * 1000 + int(random_() * 1000)) << 80) | getrandbits(80)
+            transaction_id = ''.join([pairs[(value >> shift) & 0x3FF] for shift in range(120, -1, -10)])
+            donation_id = first_donation + i
+            yield ('donations', (donation_id, f'donor{first_donor + int(random_() * donors)}@seed.example',
+                                 ngo_id, amount, methods[int(random_() * 4)], transaction_id, status,
+                                 timestamp(seconds), requirement_id))
+            if status == 'completed' and random_() < usage_rate:
+                spent = min(seconds + int(random_() * 60 * 86400), SEED_SPAN - 1)
+                yield ('money_usage', (donation_id, ngo_id, rng.choice(_USAGE_ITEMS).format(rng.choice(_CAUSES)),
+                                       round(amount * (0.2 + 0.8 * random_()), 2), timestamp(spent)))
+
+    def requirement_rows():
+        for i in range(requirements):
+            needed = max(rng.randrange(10, 500) * 1000, raised[i])
+            deadline = None if rng.random() < 0.1 else (date(2025, 1, 1) + timedelta(days=rng.randrange(730)))
+            yield (first['urgent_requirements'] + i, requirement_ngos[i], f'Urgent: {rng.choice(_CAUSES)}',
+                   f'We need funds for {rng.choice(_CAUSES)} in {rng.choice(_CITIES)} before the season ends.',
+                   needed, raised[i], deadline and deadline.isoformat(),
+                   raised[i] < needed and rng.random() < 0.7, _timestamp(rng.randrange(SEED_SPAN)))
+
+    derived = conn.backend.derived_objects(conn, SEED_TABLES)
+    with conn.backend.bulk_load(conn, SEED_TABLES):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for _, drop, _ in derived:
+                conn.execute(drop)
+            write('users', ('id', 'email', 'password', 'user_type'), user_rows())
+            write('ngos', ('id', 'user_id', 'org_name', 'location', 'contact_number', 'email', 'website', 'bank_name',
+                           'account_number', 'upi_id', 'niti_aayog_id', 'is_verified', 'created_at'), ngo_rows())
+            write('stories', ('ngo_id', 'title', 'content', 'is_approved', 'created_at'), story_rows())
+            donation_sql = '''INSERT INTO donations (id, donor_email, ngo_id, amount, payment_method, transaction_id,
+                              status, created_at, urgent_requirement_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+            usage_sql = '''INSERT INTO money_usage (donation_id, ngo_id, description, amount_used, created_at)
+                           VALUES (?, ?, ?, ?, ?)'''
+            pending = {'donations': [], 'money_usage': []}
+            for table, row in donation_rows():
+                rows = pending[table]
+                rows.append(row)
+                if len(rows) == batch_size:
+                    conn.executemany(donation_sql if table == 'donations' else usage_sql, rows)
+                    counts[table] += len(rows)
+                    rows.clear()
+            for table, rows in pending.items():
+                if rows:
+                    conn.executemany(donation_sql if table == 'donations' else usage_sql, rows)
+                    counts[table] += len(rows)
+            # Written after the donations so amount_raised matches what they gave
+            write('urgent_requirements', ('id', 'ngo_id', 'title', 'description', 'amount_needed', 'amount_raised',
+                                          'deadline', 'is_active', 'created_at'), requirement_rows())
+            # Donations reference requirements written after them; PostgreSQL
+            # will not build an index while their checks are still pending
+            conn.backend.check_constraints(conn)
+            # Indexes are built in one sorted pass; triggers come back before the
+            # rebuilds so both see the complete tables
+            for _, _, create in sorted(derived, key=lambda item: item[0] != 'index'):
+                conn.execute(create)
+            rebuild_ngo_stats(conn)
+            rebuild_fund_utilization(conn)
+            rebuild_search_index(conn)
+            invalidate_tags(conn, 'stories', 'urgent', 'donations', 'usage')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return counts
+
+@cli.command('seed')
+@click.option('--ngos', default=1000, show_default=True)
+@click.option('--donors', type=int, help='Donor accounts.  [default: donations / 20]')
+@click.option('--donations', default=100000, show_default=True)
+@click.option('--stories', default=10000, show_default=True)
+@click.option('--requirements', default=2000, show_default=True)
+@click.option('--usage', type=int, help='money_usage rows.  [default: donations / 10]')
+@click.option('--seed', default=0, show_default=True, help='Same seed, same data.')
+@click.option('--batch-size', default=20000, show_default=True)
+@click.option('--demo/--no-demo', default=True, show_default=True,
+              help='Also create the demo accounts (donor@example.com, ngo@example.com).')
+def seed_command(ngos, donors, donations, stories, requirements, usage, seed, batch_size, demo):
+    """Fill DATABASE with synthetic data for benchmarks and staging."""
+    init_db()
+    if demo:
+        create_sample_data()
+    conn = connect_db()
+    started = time.perf_counter()
+    counts = seed_synthetic_data(conn, ngos, donors, donations, stories, requirements, usage, seed, batch_size)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(', '.join(f'{count:,} {table}' for table, count in counts.items()))
+    print(f"Seeded in {elapsed:.1f}s ({sum(counts.values()) / elapsed:,.0f} rows/s)")